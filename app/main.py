@@ -1,27 +1,64 @@
+import asyncio
+import atexit
 import logging
+import mmap
 import os
+import queue
 import shutil
+import signal
+import stat
 import zipfile
 import subprocess
 import uuid # Import uuid for generating unique names
 import json
 import csv
+import functools
+import io
+import re
 import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 try:
     csv.field_size_limit(sys.maxsize)
 except OverflowError:
     csv.field_size_limit(2**31 - 1)
+import orjson
 import pandas as pd
-from fastapi import FastAPI, Request, UploadFile, File, Form
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+from fastapi import FastAPI, Request, UploadFile, File, Form, BackgroundTasks, WebSocket
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
 # Import Zotero utilities
 from app.utils import zotero_client, llm_note_generator, zotero_parser
 
+# Optional: only used by /stop_all_scripts to find scripts started by another server process
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# Optional: count items of large chunk files without materializing them
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
+# Optional: zstd-compress text artifacts on download for clients that accept it
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
 # --- Path Definitions ---
 APP_DIR = os.path.dirname(os.path.abspath(__file__))  # Should be /.../__RAG/ragpy/app
 RAGPY_DIR = os.path.dirname(APP_DIR)                  # Should be /.../__RAG/ragpy
@@ -29,20 +66,54 @@ LOG_DIR = os.path.join(RAGPY_DIR, "logs")
 UPLOAD_DIR = os.path.join(RAGPY_DIR, "uploads")
 STATIC_DIR = os.path.join(APP_DIR, "static")
 TEMPLATES_DIR = os.path.join(APP_DIR, "templates")
+ENV_PATH = os.path.join(RAGPY_DIR, ".env")
+RAD_DATAFRAME_SCRIPT = os.path.join(RAGPY_DIR, "scripts", "rad_dataframe.py")
 
 # Ensure LOG_DIR and UPLOAD_DIR exist
 os.makedirs(LOG_DIR, exist_ok=True)
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+NORMALIZED_UPLOAD_DIR = Path(UPLOAD_DIR).resolve()  # Symlink-free root for download path checks
 
 # --- Logging Configuration ---
+_log_rollover_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-rollover")
+
+
+class AsyncRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that renames log files on a dedicated worker thread."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._rollover_future = None
+
+    def shouldRollover(self, record):
+        # Keep writing to the current file while a rollover is already in flight
+        if self._rollover_future is not None and not self._rollover_future.done():
+            return False
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        self._rollover_future = _log_rollover_executor.submit(self._locked_rollover)
+
+    def _locked_rollover(self):
+        # Hold the handler lock so no record is emitted to a stream being closed
+        with self.lock:
+            super().doRollover()
+
+
 log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
 # Console Handler (keeps default FastAPI/Uvicorn console logging)
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(log_formatter)
 # File Handler for app.log
 app_log_file = os.path.join(LOG_DIR, "app.log")
-file_handler = RotatingFileHandler(app_log_file, maxBytes=10*1024*1024, backupCount=5) # 10MB per file, 5 backups
+file_handler = AsyncRotatingFileHandler(app_log_file, maxBytes=10*1024*1024, backupCount=5) # 10MB per file, 5 backups
 file_handler.setFormatter(log_formatter)
+# Request handlers only enqueue records; a background listener thread does the file I/O and rotation
+log_queue = queue.SimpleQueue()
+queue_handler = QueueHandler(log_queue)
+log_listener = QueueListener(log_queue, file_handler)
+log_listener.start()
+atexit.register(log_listener.stop)  # Flush pending records on interpreter shutdown
 # Get root logger and add handlers
 root_logger = logging.getLogger()
 root_logger.setLevel(logging.INFO)
@@ -50,19 +121,318 @@ root_logger.setLevel(logging.INFO)
 if root_logger.hasHandlers():
     root_logger.handlers.clear()
 root_logger.addHandler(console_handler) # Keep console output
-root_logger.addHandler(file_handler)    # Add file output
+root_logger.addHandler(queue_handler)   # Add file output (via the background listener)
 
 logger = logging.getLogger(__name__) # Get logger for this module
 
-logger.info(f"APP_DIR initialized to: {APP_DIR}")
-logger.info(f"RAGPY_DIR initialized to: {RAGPY_DIR}")
-logger.info(f"LOG_DIR initialized to: {LOG_DIR}")
-logger.info(f"UPLOAD_DIR initialized to: {UPLOAD_DIR}")
-logger.info(f"Application log file: {app_log_file}")
+logger.info("APP_DIR initialized to: %s", APP_DIR)
+logger.info("RAGPY_DIR initialized to: %s", RAGPY_DIR)
+logger.info("LOG_DIR initialized to: %s", LOG_DIR)
+logger.info("UPLOAD_DIR initialized to: %s", UPLOAD_DIR)
+logger.info("Application log file: %s", app_log_file)
 # --- End Logging and Path Setup ---
 
+# Uploads are streamed to disk in large chunks to keep syscalls and Python-level copies low
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # 4 MiB
+
+
+SENDFILE_CHUNK_SIZE = 1 << 24  # 16 MiB per os.sendfile call
+
+
+def _upload_fileno(file: UploadFile):
+    """Return the OS-level fd backing an upload, or None if it only lives in memory."""
+    src = file.file
+    # Asking a SpooledTemporaryFile for its fileno() would force it to roll over to disk
+    if isinstance(src, tempfile.SpooledTemporaryFile) and not getattr(src, "_rolled", False):
+        return None
+    try:
+        return src.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def _open_upload_dest(dest_path: str):
+    """Open dest_path for writing an upload (blocking)."""
+    f = open(dest_path, "wb", buffering=UPLOAD_CHUNK_SIZE)
+    if hasattr(os, "posix_fadvise"):  # Linux only: hint sequential access to the page cache
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    return f
+
+
+def _sendfile_upload(src_fd: int, offset: int, dest_path: str) -> None:
+    """Copy src_fd from offset to dest_path in the kernel, without a userland copy (blocking)."""
+    with _open_upload_dest(dest_path) as f:
+        while sent := os.sendfile(f.fileno(), src_fd, offset, SENDFILE_CHUNK_SIZE):
+            offset += sent
+
+
+async def _save_upload(file: UploadFile, dest_path: str) -> None:
+    """Stream an UploadFile to dest_path, zero-copy via os.sendfile when it is disk-backed."""
+    src_fd = _upload_fileno(file) if hasattr(os, "sendfile") else None
+    if src_fd is not None:
+        # A multi-GB copy must not hold the event loop: run it in a worker thread
+        await asyncio.to_thread(_sendfile_upload, src_fd, file.file.tell(), dest_path)
+        return
+
+    with _open_upload_dest(dest_path) as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            f.write(chunk)
+
+
+# Signatures a ZIP file can start with: local file header, empty archive, spanned archive
+ZIP_MAGIC_LOCAL_HEADER = b"PK\x03\x04"
+ZIP_MAGIC_NUMBERS = (ZIP_MAGIC_LOCAL_HEADER, b"PK\x05\x06", b"PK\x07\x08")
+
+
+def _extract_one(zip_path: str, info: zipfile.ZipInfo, target: str) -> None:
+    """Decompress a single archive member; each worker uses its own ZipFile handle."""
+    with zipfile.ZipFile(zip_path, 'r') as z, z.open(info) as src, open(target, "wb") as dst:
+        shutil.copyfileobj(src, dst, length=1 << 20)
+
+
+def _extract_zip(zip_path: str, dst_dir: str) -> dict:
+    """Extract a ZIP archive into dst_dir, decompressing members in parallel.
+
+    zlib releases the GIL, so several deflate streams and their write() calls can overlap.
+    Raises zipfile.BadZipFile if the archive is invalid or a member escapes dst_dir.
+
+    Returns the top-level entries of the archive as {name: is_dir}, read from the central
+    directory so callers don't need to list dst_dir afterwards.
+    """
+    dst_root = os.path.realpath(dst_dir)
+    with zipfile.ZipFile(zip_path, 'r') as z:
+        infos = z.infolist()
+
+    top_level = {}
+    jobs = []
+    for info in infos:
+        root_name, sep, _ = info.filename.partition('/')
+        if root_name:
+            # A member below a top-level name means that name is a directory
+            top_level[root_name] = top_level.get(root_name, False) or bool(sep)
+        target = os.path.realpath(os.path.join(dst_root, info.filename))
+        if os.path.commonpath([dst_root, target]) != dst_root:
+            raise zipfile.BadZipFile(f"Archive member escapes extraction directory: {info.filename}")
+        if info.is_dir():
+            os.makedirs(target, exist_ok=True)
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        jobs.append((info, target))
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        futures = [pool.submit(_extract_one, zip_path, info, target) for info, target in jobs]
+        for future in futures:
+            future.result()  # Re-raise the first extraction error, if any
+
+    return top_level
+
+
+def _build_tree(base: str) -> list:
+    """List every entry under base as a relative path, directories suffixed with '/'."""
+    tree: list = []
+    append = tree.append
+
+    def _walk(path: str, prefix: str) -> None:
+        # The relative prefix is carried down the recursion, so no os.path.join/relpath per entry
+        with os.scandir(path) as it:
+            for entry in it:
+                # DirEntry caches the d_type from readdir, so no extra stat per entry
+                if entry.is_dir(follow_symlinks=False):
+                    dir_prefix = prefix + entry.name + '/'
+                    append(dir_prefix)
+                    _walk(entry.path, dir_prefix)
+                else:
+                    append(prefix + entry.name)
+
+    _walk(base, "")
+    return tree
+
+
+def _remove_upload_artifacts(dst_dir: str, zip_path: str) -> None:
+    """Delete a failed upload's extraction directory and archive (run as a background task)."""
+    shutil.rmtree(dst_dir, ignore_errors=True)
+    try:
+        os.remove(zip_path)
+    except OSError:
+        pass
+
+
+# PIDs of pipeline scripts launched by this process, so /stop_all_scripts can signal them directly
+_RUNNING_PIDS = set()
+_RUNNING_PIDS_LOCK = threading.Lock()
+
+
+async def _run_script(cmd: list, check: bool = False, timeout=None, capture_output: bool = False) -> subprocess.CompletedProcess:
+    """
+    Async subprocess.run equivalent that records the child PID while the script runs.
+
+    The event loop keeps serving other requests while the script executes.
+    Raises subprocess.TimeoutExpired / CalledProcessError like subprocess.run.
+    """
+    pipe = asyncio.subprocess.PIPE if capture_output else None
+    process = await asyncio.create_subprocess_exec(*cmd, stdout=pipe, stderr=pipe)
+    with _RUNNING_PIDS_LOCK:
+        _RUNNING_PIDS.add(process.pid)
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    finally:
+        with _RUNNING_PIDS_LOCK:
+            _RUNNING_PIDS.discard(process.pid)
+    if capture_output:
+        stdout = stdout.decode("utf-8", errors="replace")
+        stderr = stderr.decode("utf-8", errors="replace")
+    if check and process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+# --- In-process chunking pipeline ---
+# scripts/rad_chunk.py phases run in a resident worker pool: the spaCy model and API
+# clients are loaded once per worker instead of once per request.
+CHUNK_WORKERS = 2
+CHUNK_PHASE_TIMEOUT = 3600  # 1 hour per phase
+_chunk_executor = None
+_chunk_jobs = 0
+_CHUNK_EXECUTOR_LOCK = threading.Lock()
+
+
+def _init_chunk_worker() -> None:
+    # Forked workers have no log listener thread draining log_queue; keep their records on the console
+    logging.getLogger().removeHandler(queue_handler)
+
+
+def _run_chunk_phase(phase: str, *args):
+    """Runs inside a pool worker; rad_chunk is imported once per worker."""
+    from scripts import rad_chunk
+    return getattr(rad_chunk, f"run_{phase}")(*args)
+
+
+def _get_chunk_executor() -> ProcessPoolExecutor:
+    global _chunk_executor
+    with _CHUNK_EXECUTOR_LOCK:
+        if _chunk_executor is None:
+            _chunk_executor = ProcessPoolExecutor(max_workers=CHUNK_WORKERS, initializer=_init_chunk_worker)
+        return _chunk_executor
+
+
+def _reset_chunk_executor(terminate: bool = False) -> list:
+    """
+    Drop the current worker pool; the next phase starts fresh workers.
+
+    With terminate=True, running workers are killed and their PIDs returned.
+    Otherwise running phases are left to finish (e.g. after a credentials change).
+    """
+    global _chunk_executor
+    with _CHUNK_EXECUTOR_LOCK:
+        executor, _chunk_executor = _chunk_executor, None
+    if executor is None:
+        return []
+    terminated = []
+    if terminate:
+        for process in list((executor._processes or {}).values()):
+            if process.is_alive():
+                process.terminate()
+                terminated.append(process.pid)
+    executor.shutdown(wait=False, cancel_futures=True)
+    return terminated
+
+
+async def _run_chunk_job(phase: str, *args):
+    """Run a rad_chunk phase in the worker pool without blocking the event loop."""
+    global _chunk_jobs
+    loop = asyncio.get_running_loop()
+    with _CHUNK_EXECUTOR_LOCK:
+        _chunk_jobs += 1
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(_get_chunk_executor(), _run_chunk_phase, phase, *args),
+            CHUNK_PHASE_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        # The worker keeps running after the await is cancelled; kill the pool to stop it
+        _reset_chunk_executor(terminate=True)
+        raise
+    finally:
+        with _CHUNK_EXECUTOR_LOCK:
+            _chunk_jobs -= 1
+
+
+atexit.register(_reset_chunk_executor, terminate=True)
+
+
+# Dense embedding requests are coalesced: one worker drains the queue and embeds the
+# chunks of several in-flight requests in shared API batches (run_dense_batch).
+EMBED_QUEUE_SIZE = 32         # Bounded: further requests wait for room (backpressure)
+EMBED_BATCH_REQUESTS = 8      # Max requests merged into one dense phase
+EMBED_BATCH_MAX_BYTES = 150_000  # Stop merging once the chunk files reach this size
+DenseEmbeddingJob = namedtuple("DenseEmbeddingJob", ["input_json", "output_dir", "size", "future"])
+_embed_queue = None
+_embed_worker_task = None
+
+
+async def _embed_worker(jobs_queue: asyncio.Queue) -> None:
+    while True:
+        jobs = [await jobs_queue.get()]
+        batch_bytes = jobs[0].size
+        while len(jobs) < EMBED_BATCH_REQUESTS and batch_bytes < EMBED_BATCH_MAX_BYTES and not jobs_queue.empty():
+            job = jobs_queue.get_nowait()
+            jobs.append(job)
+            batch_bytes += job.size
+        logger.debug("Dense embedding batch of %s request(s), %s bytes of chunks", len(jobs), batch_bytes)
+        try:
+            results = await _run_chunk_job("dense_batch", [(job.input_json, job.output_dir) for job in jobs])
+        except Exception as e:
+            results = [e] * len(jobs)
+        for job, result in zip(jobs, results):
+            if job.future.done():  # Request was cancelled (client went away)
+                continue
+            if isinstance(result, BaseException):
+                job.future.set_exception(result)
+            else:
+                job.future.set_result(result)
+
+
+async def _embed_dense(input_json: str, output_dir: str) -> str:
+    """Queue a dense embedding phase and wait for the batch that includes it."""
+    global _embed_queue, _embed_worker_task
+    loop = asyncio.get_running_loop()
+    if _embed_worker_task is None or _embed_worker_task.done() or _embed_worker_task.get_loop() is not loop:
+        _embed_queue = asyncio.Queue(maxsize=EMBED_QUEUE_SIZE)
+        _embed_worker_task = loop.create_task(_embed_worker(_embed_queue))
+    future = loop.create_future()
+    await _embed_queue.put(DenseEmbeddingJob(input_json, output_dir, os.path.getsize(input_json), future))
+    return await future
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson; the app's default response class."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+class DownloadFileResponse(FileResponse):
+    """
+    FileResponse for session downloads.
+
+    Servers implementing the ASGI pathsend extension send the file themselves; otherwise
+    1 MiB reads cut the number of thread hops compared to Starlette's 64 KiB default.
+    """
+    chunk_size = 1 << 20
+
+    def is_not_modified(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            return self.headers["etag"] in (tag.strip() for tag in if_none_match.split(","))
+        return request.headers.get("if-modified-since") == self.headers["last-modified"]
+
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 templates = Jinja2Templates(directory=TEMPLATES_DIR)
@@ -73,7 +443,7 @@ async def homepage(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 @app.post("/upload_zip")
-async def upload_zip(file: UploadFile = File(...)):
+async def upload_zip(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     # Generate a unique prefix for the filename
     unique_id = str(uuid.uuid4().hex)[:8] # Use first 8 chars of a UUID hex
     original_filename, file_extension = os.path.splitext(file.filename)
@@ -81,12 +451,18 @@ async def upload_zip(file: UploadFile = File(...)):
     
     zip_path = os.path.join(UPLOAD_DIR, unique_filename)
     
+    # Reject non-ZIP uploads from their first bytes, before anything is written to disk
+    magic = await file.read(len(ZIP_MAGIC_LOCAL_HEADER))
+    await file.seek(0)
+    if magic not in ZIP_MAGIC_NUMBERS:
+        logger.error("Rejected upload %s: missing ZIP signature", file.filename)
+        return ORJSONResponse(status_code=400, content={"error": "Uploaded file is not a valid ZIP archive."})
+
     # Ensure UPLOAD_DIR exists (it should from startup, but good practice)
     os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-    with open(zip_path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
-    logger.info(f"Uploaded ZIP saved to: {zip_path}")
+    await _save_upload(file, zip_path)
+    logger.debug("Uploaded ZIP saved to: %s", zip_path)
 
     # Extract ZIP contents to a directory named after the unique zip file (without extension)
     dst_dir_name = f"{unique_id}_{original_filename}"
@@ -95,53 +471,45 @@ async def upload_zip(file: UploadFile = File(...)):
     # Ensure dst_dir doesn't already exist, or handle as needed (e.g. clear or error)
     # For simplicity, let's assume it won't exist due to unique_id. If it could, add handling.
     if os.path.exists(dst_dir):
-        logger.warning(f"Extraction directory {dst_dir} already exists. Overwriting.")
+        logger.warning("Extraction directory %s already exists. Overwriting.", dst_dir)
         shutil.rmtree(dst_dir) # Example: remove if exists
     os.makedirs(dst_dir, exist_ok=True)
 
     try:
-        with zipfile.ZipFile(zip_path, 'r') as z:
-            z.extractall(dst_dir)
-        logger.info(f"ZIP content extracted to initial directory: {dst_dir}")
-    except zipfile.BadZipFile:
-        logger.error(f"Failed to extract ZIP: Bad ZIP file {zip_path}")
-        # Clean up the created dst_dir if extraction fails
-        if os.path.exists(dst_dir):
-            shutil.rmtree(dst_dir)
-        return JSONResponse(status_code=400, content={"error": "Uploaded file is not a valid ZIP archive."})
+        top_level = _extract_zip(zip_path, dst_dir)
+        logger.debug("ZIP content extracted to initial directory: %s", dst_dir)
+    except (zipfile.BadZipFile, zipfile.LargeZipFile):
+        logger.error("Failed to extract ZIP: Bad ZIP file %s", zip_path)
+        # Clean up the partial extraction and the archive after the response has been sent
+        background_tasks.add_task(_remove_upload_artifacts, dst_dir, zip_path)
+        return ORJSONResponse(status_code=400, content={"error": "Uploaded file is not a valid ZIP archive."}, background=background_tasks)
     except Exception as e:
-        logger.error(f"Failed to extract ZIP {zip_path} to {dst_dir}: {str(e)}")
-        if os.path.exists(dst_dir):
-            shutil.rmtree(dst_dir)
-        return JSONResponse(status_code=500, content={"error": "Failed to extract ZIP file.", "details": str(e)})
+        logger.error("Failed to extract ZIP %s to %s: %s", zip_path, dst_dir, e)
+        background_tasks.add_task(_remove_upload_artifacts, dst_dir, zip_path)
+        return ORJSONResponse(status_code=500, content={"error": "Failed to extract ZIP file.", "details": str(e)}, background=background_tasks)
 
     # Check if the ZIP extracted into a single root directory matching original_filename (common case)
     # or if it extracted into a single directory that might be different from original_filename
-    extracted_items = os.listdir(dst_dir)
+    # Top-level entries come from the archive's central directory, so no os.listdir/isdir here
     processing_path = dst_dir # Path to be used by subsequent pipeline steps
 
-    if len(extracted_items) == 1:
-        single_item_path = os.path.join(dst_dir, extracted_items[0])
-        if os.path.isdir(single_item_path):
-            logger.info(f"ZIP extracted to a single root folder: {extracted_items[0]}. Adjusting processing path.")
-            processing_path = single_item_path
+    if len(top_level) == 1:
+        (root_name, root_is_dir), = top_level.items()
+        if root_is_dir:
+            logger.debug("ZIP extracted to a single root folder: %s. Adjusting processing path.", root_name)
+            processing_path = os.path.join(dst_dir, root_name)
         else: # Single file extracted, not a directory - use dst_dir
-            logger.info(f"ZIP extracted a single file: {extracted_items[0]}. Processing path remains {dst_dir}.")
+            logger.debug("ZIP extracted a single file: %s. Processing path remains %s.", root_name, dst_dir)
     else: # Multiple items or no items at the root of extraction
-        logger.info(f"ZIP extracted multiple items or no items into {dst_dir}. Processing path remains {dst_dir}.")
+        logger.debug("ZIP extracted multiple items or no items into %s. Processing path remains %s.", dst_dir, dst_dir)
 
 
     # Build file tree relative to the actual processing_path
-    tree = []
-    for root, dirs, files in os.walk(processing_path):
-        for d in dirs:
-            tree.append(os.path.relpath(os.path.join(root, d), processing_path) + '/')
-        for fname in files:
-            tree.append(os.path.relpath(os.path.join(root, fname), processing_path))
-            
+    tree = _build_tree(processing_path)
+
     relative_processing_path = os.path.relpath(processing_path, UPLOAD_DIR)
-    logger.info(f"Returning relative processing path: {relative_processing_path} to client. (Absolute was: {processing_path})")
-    return JSONResponse({"path": relative_processing_path, "tree": tree})
+    logger.info("Returning relative processing path: %s to client. (Absolute was: %s)", relative_processing_path, processing_path)
+    return ORJSONResponse({"path": relative_processing_path, "tree": tree})
 
 @app.post("/upload_csv")
 async def upload_csv_endpoint(file: UploadFile = File(...)):
@@ -156,8 +524,8 @@ async def upload_csv_endpoint(file: UploadFile = File(...)):
 
     # Validate file extension
     if file_extension.lower() != ".csv":
-        logger.error(f"Invalid file extension for CSV upload: {file_extension}")
-        return JSONResponse(status_code=400, content={"error": "Only .csv files are accepted."})
+        logger.error("Invalid file extension for CSV upload: %s", file_extension)
+        return ORJSONResponse(status_code=400, content={"error": "Only .csv files are accepted."})
 
     dst_dir_name = f"{unique_id}_{original_filename}"
     dst_dir = os.path.join(UPLOAD_DIR, dst_dir_name)
@@ -167,14 +535,13 @@ async def upload_csv_endpoint(file: UploadFile = File(...)):
     # Save uploaded CSV temporarily
     temp_csv_path = os.path.join(dst_dir, f"{original_filename}.csv")
     try:
-        with open(temp_csv_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-        logger.info(f"Uploaded CSV saved to: {temp_csv_path}")
+        await _save_upload(file, temp_csv_path)
+        logger.debug("Uploaded CSV saved to: %s", temp_csv_path)
     except Exception as e:
-        logger.error(f"Failed to save CSV file: {e}")
+        logger.error("Failed to save CSV file: %s", e)
         if os.path.exists(dst_dir):
             shutil.rmtree(dst_dir)
-        return JSONResponse(status_code=500, content={"error": "Failed to save CSV file.", "details": str(e)})
+        return ORJSONResponse(status_code=500, content={"error": "Failed to save CSV file.", "details": str(e)})
 
     # Import ingestion module
     try:
@@ -183,18 +550,18 @@ async def upload_csv_endpoint(file: UploadFile = File(...)):
             sys.path.insert(0, RAGPY_DIR)
         from ingestion import ingest_csv_to_dataframe
     except ImportError as e:
-        logger.error(f"Failed to import ingestion module: {e}")
-        return JSONResponse(status_code=500, content={"error": "Server configuration error: CSV ingestion module not found.", "details": str(e)})
+        logger.error("Failed to import ingestion module: %s", e)
+        return ORJSONResponse(status_code=500, content={"error": "Server configuration error: CSV ingestion module not found.", "details": str(e)})
 
     # Convert CSV to DataFrame using ingestion module
     try:
-        logger.info(f"Converting CSV to DataFrame using ingestion module: {temp_csv_path}")
+        logger.debug("Converting CSV to DataFrame using ingestion module: %s", temp_csv_path)
         df = ingest_csv_to_dataframe(temp_csv_path)
 
         # Save as output.csv (compatible with pipeline)
         output_csv_path = os.path.join(dst_dir, "output.csv")
         df.to_csv(output_csv_path, index=False, encoding="utf-8-sig")
-        logger.info(f"DataFrame saved as output.csv: {output_csv_path}")
+        logger.debug("DataFrame saved as output.csv: %s", output_csv_path)
 
         # Delete temporary CSV
         os.remove(temp_csv_path)
@@ -203,210 +570,187 @@ async def upload_csv_endpoint(file: UploadFile = File(...)):
         tree = ["output.csv"]
 
         relative_processing_path = os.path.relpath(dst_dir, UPLOAD_DIR)
-        logger.info(f"CSV ingestion successful. Returning path: {relative_processing_path}")
+        logger.info("CSV ingestion successful. Returning path: %s", relative_processing_path)
 
-        return JSONResponse({
+        return ORJSONResponse({
             "path": relative_processing_path,
             "tree": tree,
             "message": f"CSV ingested successfully: {len(df)} rows processed."
         })
 
     except Exception as e:
-        logger.error(f"Failed to process CSV: {e}", exc_info=True)
+        logger.error("Failed to process CSV: %s", e, exc_info=True)
         if os.path.exists(dst_dir):
             shutil.rmtree(dst_dir)
-        return JSONResponse(status_code=500, content={"error": "Failed to process CSV file.", "details": str(e)})
+        return ORJSONResponse(status_code=500, content={"error": "Failed to process CSV file.", "details": str(e)})
 
 @app.post("/stop_all_scripts")
 async def stop_all_scripts():
-    command = 'pkill -SIGTERM -f "python3 scripts/rad_"'
-    action_taken = False
-    details = ""
-    status_message = "Attempting to stop scripts..."
     try:
-        # Using shell=True for pkill with pattern matching.
-        # pkill returns 0 if processes were signaled, 1 if no processes matched, >1 for errors.
-        process = subprocess.run(command, shell=True, capture_output=True, text=True, timeout=900)
-        
-        if process.returncode == 0:
-            logger.info(f"Successfully sent SIGTERM to processes matching 'python3 scripts/rad_'. stdout: {process.stdout.strip()}, stderr: {process.stderr.strip()}")
-            action_taken = True
-            details = f"SIGTERM signal sent. pkill stdout: '{process.stdout.strip()}', stderr: '{process.stderr.strip()}'"
-            status_message = "Stop signal sent to running scripts."
-        elif process.returncode == 1: # No processes matched
-            logger.info("No 'python3 scripts/rad_' processes found by pkill.")
-            details = "No matching script processes were found running."
-            status_message = "No relevant scripts found running."
-        else: # Other pkill errors
-            logger.error(f"pkill command failed with return code {process.returncode}. stderr: {process.stderr.strip()}")
-            details = f"pkill command error (code {process.returncode}): {process.stderr.strip()}"
-            status_message = "Error attempting to stop scripts."
-        
-        return JSONResponse({"status": status_message, "action_taken": action_taken, "details": details})
+        with _RUNNING_PIDS_LOCK:
+            pids = list(_RUNNING_PIDS)
+
+        if not pids and PSUTIL_AVAILABLE:
+            # Nothing launched by this process; look for pipeline scripts started elsewhere
+            for proc in psutil.process_iter(["cmdline"]):
+                cmdline = " ".join(proc.info.get("cmdline") or [])
+                if "python" in cmdline and "scripts/rad_" in cmdline:
+                    pids.append(proc.pid)
+
+        signaled = []
+        if _chunk_jobs:
+            # Chunking/embedding phases run in the worker pool, not as tracked scripts
+            signaled.extend(_reset_chunk_executor(terminate=True))
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                signaled.append(pid)
+            except ProcessLookupError:  # Exited between listing and signaling
+                pass
+
+        if signaled:
+            logger.info("Sent SIGTERM to pipeline script processes: %s", signaled)
+            return ORJSONResponse({
+                "status": "Stop signal sent to running scripts.",
+                "action_taken": True,
+                "details": f"SIGTERM signal sent to PIDs: {signaled}"
+            })
+
+        logger.info("No running pipeline script processes found.")
+        return ORJSONResponse({
+            "status": "No relevant scripts found running.",
+            "action_taken": False,
+            "details": "No matching script processes were found running."
+        })
 
-    except subprocess.TimeoutExpired:
-        logger.error("pkill command timed out.")
-        return JSONResponse(status_code=500, content={"error": "Stop command timed out.", "details": "pkill command took too long to execute."})
     except Exception as e:
-        logger.error(f"Exception while trying to stop scripts: {str(e)}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": "Failed to execute stop command.", "details": str(e)})
+        logger.error("Exception while trying to stop scripts: %s", e, exc_info=True)
+        return ORJSONResponse(status_code=500, content={"error": "Failed to execute stop command.", "details": str(e)})
+
+
+PREVIEW_ROWS = 5  # Rows returned to the UI after dataframe processing
+
 
 @app.post("/process_dataframe")
 async def process_dataframe(path: str = Form(...)): # path is now relative to UPLOAD_DIR
     absolute_processing_path = os.path.abspath(os.path.join(UPLOAD_DIR, path))
-    logger.info(f"Received relative path: '{path}', resolved to absolute: '{absolute_processing_path}'")
+    logger.debug("Received relative path: '%s', resolved to absolute: '%s'", path, absolute_processing_path)
 
     # Find first JSON in directory
     try:
         if not os.path.isdir(absolute_processing_path):
-            logger.error(f"Processing directory does not exist: {absolute_processing_path}")
-            return JSONResponse(status_code=400, content={"error": f"Processing directory not found: {path}"})
+            logger.error("Processing directory does not exist: %s", absolute_processing_path)
+            return ORJSONResponse(status_code=400, content={"error": f"Processing directory not found: {path}"})
 
         json_files = [f for f in os.listdir(absolute_processing_path) if f.lower().endswith('.json')]
         if not json_files:
-            logger.error(f"No JSON file found in {absolute_processing_path}")
-            return JSONResponse(status_code=400, content={"error": "No JSON file found."})
+            logger.error("No JSON file found in %s", absolute_processing_path)
+            return ORJSONResponse(status_code=400, content={"error": "No JSON file found."})
         json_path = os.path.join(absolute_processing_path, json_files[0])
         out_csv = os.path.join(absolute_processing_path, 'output.csv')
         
-        logger.info(f"Processing dataframe with JSON: {json_path}, output: {out_csv}")
+        logger.debug("Processing dataframe with JSON: %s, output: %s", json_path, out_csv)
         
         # Run extraction script with improved error handling
         try:
-            # Construct absolute path to the script using RAGPY_DIR
-            # RAGPY_DIR is /.../ragpy
-            project_scripts_dir = os.path.join(RAGPY_DIR, "scripts") # Scripts are in ragpy/scripts
-            script_path = os.path.join(project_scripts_dir, "rad_dataframe.py")
-            # Ensure it's absolute and normalized (though it should be already if RAGPY_DIR was derived from abspath)
-            script_path = os.path.abspath(script_path)
-
-            logger.info(f"  APP_DIR: {APP_DIR}")
-            logger.info(f"  RAGPY_DIR: {RAGPY_DIR}")
-            logger.info(f"  Calculated project_scripts_dir: {project_scripts_dir}")
-            logger.info(f"  Calculated script_path (final for subprocess): {script_path}")
-            
-            # Log the exact command and arguments being used
             cmd_to_run = [
-                "python3", script_path,
-                "--json", os.path.abspath(json_path), 
-                "--dir", os.path.abspath(absolute_processing_path), 
-                "--output", os.path.abspath(out_csv)
+                sys.executable, RAD_DATAFRAME_SCRIPT,
+                "--json", json_path,
+                "--dir", absolute_processing_path,
+                "--output", out_csv
             ]
-            logger.info(f"Executing rad_dataframe.py with command: {' '.join(cmd_to_run)}")
-            logger.info(f"  Resolved --json path: {os.path.abspath(json_path)}")
-            logger.info(f"  Resolved --dir path: {os.path.abspath(absolute_processing_path)}")
-            logger.info(f"  Resolved --output path: {os.path.abspath(out_csv)}")
-            logger.info(f"  Existence check for --json ({os.path.abspath(json_path)}): {os.path.exists(os.path.abspath(json_path))}")
-            logger.info(f"  Existence check for --dir ({os.path.abspath(absolute_processing_path)}): {os.path.exists(os.path.abspath(absolute_processing_path))}")
-
+            logger.info("Executing rad_dataframe.py with command: %s", ' '.join(cmd_to_run))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("  Existence check for --json (%s): %s", json_path, os.path.exists(json_path))
+                logger.debug("  Existence check for --dir (%s): %s", absolute_processing_path, os.path.exists(absolute_processing_path))
 
             # Use shell=False for better security and explicit argument passing
-            result = subprocess.run([
-                "python3", script_path,
-                "--json", json_path, # Already absolute
-                "--dir", absolute_processing_path, # Pass absolute path to script
-                "--output", out_csv # Already absolute
-            ], check=False, capture_output=True, text=True)  # Don't use check=True, handle ourselves
-            
+            result = await _run_script(cmd_to_run, check=False, capture_output=True)  # Don't use check=True, handle ourselves
+
             # Manually check the return code and handle
             if result.returncode != 0:
-                logger.error(f"Extraction script failed with code {result.returncode}. stderr: {result.stderr}")
-                return JSONResponse(status_code=500, content={
+                logger.error("Extraction script failed with code %s. stderr: %s", result.returncode, result.stderr)
+                return ORJSONResponse(status_code=500, content={
                     "error": f"Extraction script failed with code {result.returncode}.", 
                     "details": result.stderr,
                     "stdout": result.stdout[:500]  # Include first part of stdout for debugging
                 })
         except Exception as e:
-            logger.error(f"An unexpected error occurred during dataframe processing: {str(e)}", exc_info=True)
-            return JSONResponse(status_code=500, content={"error": "An unexpected error occurred.", "details": str(e)})
+            logger.error("An unexpected error occurred during dataframe processing: %s", e, exc_info=True)
+            return ORJSONResponse(status_code=500, content={"error": "An unexpected error occurred.", "details": str(e)})
 
         # Load and preview CSV
         if not os.path.exists(out_csv):
-            logger.error(f"Output CSV file not found after script execution: {out_csv}")
-            return JSONResponse(status_code=500, content={"error": "Output CSV not found after script execution."})
+            logger.error("Output CSV file not found after script execution: %s", out_csv)
+            return ORJSONResponse(status_code=500, content={"error": "Output CSV not found after script execution."})
     except Exception as e:
-        logger.error(f"Error in process_dataframe: {str(e)}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": f"Failed to process dataframe: {str(e)}"})
+        logger.error("Error in process_dataframe: %s", e, exc_info=True)
+        return ORJSONResponse(status_code=500, content={"error": f"Failed to process dataframe: {str(e)}"})
         
     try:
+        # Only the first rows are needed for the preview, so don't parse the whole file
         # Try reading with escapechar and dtype=str, then adapt
         try:
-            df = pd.read_csv(out_csv, escapechar='\\', dtype=str, keep_default_na=False)
+            df = pd.read_csv(out_csv, escapechar='\\', dtype=str, keep_default_na=False, nrows=PREVIEW_ROWS, engine='c')
         except pd.errors.ParserError:
-            logger.warning(f"Failed to parse CSV {out_csv} with escapechar='\\', dtype=str. Retrying without escapechar.")
+            logger.warning("Failed to parse CSV %s with escapechar='\\', dtype=str. Retrying without escapechar.", out_csv)
             try:
-                df = pd.read_csv(out_csv, dtype=str, keep_default_na=False)
+                df = pd.read_csv(out_csv, dtype=str, keep_default_na=False, nrows=PREVIEW_ROWS, engine='c')
             except Exception as e_inner: # Catch any error from the second read attempt
-                logger.error(f"Failed to read CSV {out_csv} even with dtype=str and no escapechar: {str(e_inner)}")
-                return JSONResponse(status_code=500, content={"error": "CSV parsing failed.", "details": str(e_inner)})
+                logger.error("Failed to read CSV %s even with dtype=str and no escapechar: %s", out_csv, e_inner)
+                return ORJSONResponse(status_code=500, content={"error": "CSV parsing failed.", "details": str(e_inner)})
         except Exception as e_outer: # Catch other errors from the first read attempt
-             logger.error(f"Failed to read CSV {out_csv} with escapechar='\\', dtype=str: {str(e_outer)}")
-             return JSONResponse(status_code=500, content={"error": "CSV reading failed.", "details": str(e_outer)})
+             logger.error("Failed to read CSV %s with escapechar='\\', dtype=str: %s", out_csv, e_outer)
+             return ORJSONResponse(status_code=500, content={"error": "CSV reading failed.", "details": str(e_outer)})
 
-            
-        if df.empty:
-            logger.warning(f"CSV file {out_csv} is empty or contains no data after reading.")
-            return JSONResponse(status_code=500, content={"error": "CSV file is empty or contains no data."})
-            
-        # df.head(5) ensures we don't process too much for preview
-        # .fillna('') ensures that any NaN/NaT values (if keep_default_na was True or dtype=str didn't prevent them) become empty strings
-        # to_dict(orient='records') should be safe if all data is string
-        preview_df = df.head(5).fillna('') 
-        preview = preview_df.to_dict(orient='records')
-        
-        # Final check for JSON serializability of the preview itself, though fillna('') and dtype=str should make it safe.
-        try:
-            json.dumps(preview)
-        except TypeError as te:
-            logger.error(f"Preview data is not JSON serializable even after dtype=str and fillna: {str(te)}")
-            # Fallback: convert all values in preview records to strings manually
-            safer_preview = []
-            for record in preview:
-                safer_record = {k: str(v) for k, v in record.items()}
-                safer_preview.append(safer_record)
-            preview = safer_preview
-            
-        return JSONResponse({"csv": out_csv, "preview": preview})
+        if len(df) == 0:
+            logger.warning("CSV file %s is empty or contains no data after reading.", out_csv)
+            return ORJSONResponse(status_code=500, content={"error": "CSV file is empty or contains no data."})
+
+        # dtype=str keeps every value a string; fillna('') only covers cells missing from short rows
+        preview = df.fillna('').to_dict(orient='records')
+
+        return ORJSONResponse({"csv": out_csv, "preview": preview})
     except Exception as e: # Catch-all for any other unexpected error in this block
-        logger.error(f"General error in processing/previewing CSV {out_csv}: {str(e)}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": "CSV read or preview failed.", "details": str(e)})
+        logger.error("General error in processing/previewing CSV %s: %s", out_csv, e, exc_info=True)
+        return ORJSONResponse(status_code=500, content={"error": "CSV read or preview failed.", "details": str(e)})
 
 
 @app.post("/upload_stage_file/{stage}")
 async def upload_stage_file(stage: str, path: str = Form(...), file: UploadFile = File(...)):
     """Allow operators to upload intermediate artifacts for any stage."""
-    logger.info(f"Received upload for stage '{stage}' targeting path '{path}' with original filename '{file.filename}'")
+    logger.debug("Received upload for stage '%s' targeting path '%s' with original filename '%s'", stage, path, file.filename)
 
-    config = STAGE_UPLOAD_CONFIG.get(stage)
+    config = STAGE_UPLOAD.get(stage)
     if not config:
-        logger.error(f"Unknown stage '{stage}' supplied to upload endpoint")
-        return JSONResponse(status_code=400, content={"error": f"Unknown stage: {stage}"})
+        logger.error("Unknown stage '%s' supplied to upload endpoint", stage)
+        return ORJSONResponse(status_code=400, content={"error": f"Unknown stage: {stage}"})
 
     absolute_processing_path = os.path.abspath(os.path.join(UPLOAD_DIR, path))
     if not os.path.isdir(absolute_processing_path):
-        logger.error(f"Upload target directory does not exist: {absolute_processing_path}")
-        return JSONResponse(status_code=400, content={"error": f"Processing directory not found: {path}"})
+        logger.error("Upload target directory does not exist: %s", absolute_processing_path)
+        return ORJSONResponse(status_code=400, content={"error": f"Processing directory not found: {path}"})
 
     _, ext = os.path.splitext(file.filename or "")
     ext = ext.lower()
-    allowed_exts = config.get("allowed_extensions", [])
-    if allowed_exts and ext not in allowed_exts:
-        logger.error(f"File extension '{ext}' is not allowed for stage '{stage}' (allowed: {allowed_exts})")
-        return JSONResponse(status_code=400, content={"error": f"Invalid file type for stage {stage}.", "allowed_extensions": allowed_exts})
+    if config.allowed_exts and ext not in config.allowed_exts:
+        allowed_exts = STAGE_UPLOAD_CONFIG[stage]["allowed_extensions"]
+        logger.error("File extension '%s' is not allowed for stage '%s' (allowed: %s)", ext, stage, allowed_exts)
+        return ORJSONResponse(status_code=400, content={"error": f"Invalid file type for stage {stage}.", "allowed_extensions": allowed_exts})
 
-    target_filename = config["filename"]
+    target_filename = config.filename
     target_path = os.path.join(absolute_processing_path, target_filename)
 
     try:
-        file.file.seek(0)
-        with open(target_path, "wb") as handled:
-            shutil.copyfileobj(file.file, handled)
+        await file.seek(0)
+        await _save_upload(file, target_path)
     except Exception as exc:  # noqa: BLE001
-        logger.error(f"Failed to store upload for stage '{stage}' at '{target_path}': {exc}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": f"Failed to write uploaded file: {exc}"})
+        logger.error("Failed to store upload for stage '%s' at '%s': %s", stage, target_path, exc, exc_info=True)
+        return ORJSONResponse(status_code=500, content={"error": f"Failed to write uploaded file: {exc}"})
 
-    summary = summarize_uploaded_stage(stage, target_path)
-    logger.info(f"Stored uploaded file for stage '{stage}' at '{target_path}' with summary: {summary}")
+    # Summaries may parse a large JSON list; keep that off the event loop
+    summary = await asyncio.to_thread(summarize_uploaded_stage, stage, target_path)
+    logger.info("Stored uploaded file for stage '%s' at '%s' with summary: %s", stage, target_path, summary)
 
     response_payload = {
         "status": "success",
@@ -416,7 +760,7 @@ async def upload_stage_file(stage: str, path: str = Form(...), file: UploadFile
         "details": summary
     }
 
-    return JSONResponse(response_payload)
+    return ORJSONResponse(response_payload)
 
 # --- Phased Chunking Endpoints ---
 BASE_CHUNK_OUTPUT_NAME = "output" # Consistent name from output.csv
@@ -442,19 +786,63 @@ STAGE_UPLOAD_CONFIG = {
     }
 }
 
+# STAGE_UPLOAD_CONFIG resolved once at import: per-stage lookups become attribute access and
+# extension checks hit a frozenset
+StageUploadConfig = namedtuple("StageUploadConfig", ["filename", "allowed_exts", "summary_type"])
+STAGE_UPLOAD = {
+    stage: StageUploadConfig(
+        filename=cfg["filename"],
+        allowed_exts=frozenset(cfg.get("allowed_extensions", [])),
+        summary_type=cfg.get("summary_type"),
+    )
+    for stage, cfg in STAGE_UPLOAD_CONFIG.items()
+}
+
+
+CSV_COUNT_BLOCK_SIZE = 1 << 20  # 1 MiB
+
+
+def _summarize_csv(file_path: str):
+    """Return (headers, data_row_count) for a CSV file.
+
+    Rows are counted by scanning raw 1 MiB blocks for newlines. Quoted fields may
+    hold embedded newlines, so if any quote character shows up the count is redone
+    with csv.reader, which handles quoting correctly.
+    """
+    with open(file_path, "rb") as f:
+        header_line = f.readline()
+        row_count = 0
+        has_quotes = False
+        last_block = b""
+        while block := f.read(CSV_COUNT_BLOCK_SIZE):
+            row_count += block.count(b"\n")
+            has_quotes = has_quotes or b'"' in block
+            last_block = block
+        if last_block and not last_block.endswith(b"\n"):
+            row_count += 1  # Last row has no trailing newline
+
+    if has_quotes or b'"' in header_line:
+        with open(file_path, newline='', encoding='utf-8') as csvfile:
+            reader = csv.reader(csvfile)
+            headers = next(reader, None)
+            row_count = sum(1 for _ in reader)
+        return headers, row_count
+
+    if not header_line:
+        return None, 0
+    headers = next(csv.reader([header_line.decode("utf-8")]))
+    return headers, row_count
+
 
 def summarize_uploaded_stage(stage_key: str, file_path: str) -> dict:
     """Build a lightweight summary for uploaded intermediate files."""
-    config = STAGE_UPLOAD_CONFIG.get(stage_key, {})
-    summary_type = config.get("summary_type")
+    config = STAGE_UPLOAD.get(stage_key)
+    summary_type = config.summary_type if config else None
     summary: dict = {}
 
     if summary_type == "csv":
         try:
-            with open(file_path, newline='', encoding='utf-8') as csvfile:
-                reader = csv.reader(csvfile)
-                headers = next(reader, None)
-                row_count = sum(1 for _ in reader)
+            headers, row_count = _summarize_csv(file_path)
             summary["rows"] = row_count
             if headers is not None:
                 summary["columns"] = len(headers)
@@ -462,8 +850,8 @@ def summarize_uploaded_stage(stage_key: str, file_path: str) -> dict:
             summary["parse_warning"] = f"Failed to analyse CSV: {exc}"
     elif summary_type == "json_list":
         try:
-            with open(file_path, "r", encoding="utf-8") as handle:
-                data = json.load(handle)
+            with open(file_path, "rb") as handle:
+                data = orjson.loads(handle.read())
             if isinstance(data, list):
                 summary["count"] = len(data)
             else:
@@ -486,6 +874,62 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# KEY=value lines of a .env file: the key is whatever precedes the first '=' (so
+# "export KEY=value" keeps "export KEY" and is written back as is); '#' lines are comments
+ENV_LINE_RE = re.compile(r'^[ \t]*(?![ \t#])([^=\r\n]*?)[ \t]*=[ \t]*(.*?)[ \t\r]*$', re.MULTILINE)
+
+
+def _read_env_file(env_path: str) -> dict:
+    """Parse a .env file into a dict with a single read and one regex sweep."""
+    with open(env_path, "r", encoding="utf-8") as f:
+        return dict(ENV_LINE_RE.findall(f.read()))
+
+
+# Parsed .env cache: ((path, st_mtime_ns, st_size), env_vars). Cleared by save_credentials.
+_ENV_CACHE = None
+_ENV_CACHE_LOCK = threading.Lock()
+
+
+def _read_env_file_cached(env_path: str) -> dict:
+    """Like _read_env_file, but skip re-parsing while the file's mtime and size are unchanged."""
+    global _ENV_CACHE
+    st = os.stat(env_path)
+    cache_key = (env_path, st.st_mtime_ns, st.st_size)
+    with _ENV_CACHE_LOCK:
+        if _ENV_CACHE is not None and _ENV_CACHE[0] == cache_key:
+            return dict(_ENV_CACHE[1])
+    env_vars = _read_env_file(env_path)
+    with _ENV_CACHE_LOCK:
+        _ENV_CACHE = (cache_key, env_vars)
+    return dict(env_vars)
+
+
+def _invalidate_env_cache() -> None:
+    global _ENV_CACHE
+    with _ENV_CACHE_LOCK:
+        _ENV_CACHE = None
+
+
+def _write_env_file(env_path: str, env_vars: dict) -> None:
+    """
+    Atomically replace a .env file with env_vars.
+
+    The content goes to a temporary file in one write, is fsynced, then renamed over
+    env_path, so a crash mid-save never leaves a truncated .env behind.
+    """
+    payload = "".join(f"{k}={v}\n" for k, v in env_vars.items()).encode("utf-8")
+    tmp_path = env_path + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        view = memoryview(payload)
+        while view:  # os.write may write fewer bytes than requested
+            view = view[os.write(fd, view):]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, env_path)
+
+
 @app.get("/get_credentials")
 async def get_credentials():
     """
@@ -498,12 +942,11 @@ async def get_credentials():
       - WEAVIATE_API_KEY, WEAVIATE_URL
       - QDRANT_API_KEY, QDRANT_URL
     """
-    env_path = os.path.join(RAGPY_DIR, ".env") # Use RAGPY_DIR for consistency
-    env_path = os.path.abspath(env_path)
+    env_path = ENV_PATH
     
-    logger.info(f"Attempting to read .env file for get_credentials at: {env_path}")
+    logger.info("Attempting to read .env file for get_credentials at: %s", env_path)
     if not os.path.exists(env_path):
-        logger.error(f".env file not found at: {env_path}")
+        logger.error(".env file not found at: %s", env_path)
         # Return empty strings for all keys if .env doesn't exist, so frontend form is populated correctly
         credential_keys_on_missing = [
             "OPENAI_API_KEY", "OPENROUTER_API_KEY", "OPENROUTER_DEFAULT_MODEL",
@@ -514,21 +957,15 @@ async def get_credentials():
         ]
         empty_credentials = {k: "" for k in credential_keys_on_missing}
         logger.info("Returning empty credentials as .env file was not found.")
-        return JSONResponse(status_code=200, content=empty_credentials) # Return 200 with empty strings
+        return ORJSONResponse(status_code=200, content=empty_credentials) # Return 200 with empty strings
 
     # Read existing .env
-    env_vars = {}
     try:
-        with open(env_path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if "=" in line and not line.startswith("#"):
-                    k, v = line.split("=", 1)
-                    env_vars[k.strip()] = v.strip() # Strip keys and values
-        logger.info(f"Read {len(env_vars)} environment variables from {env_path}")
+        env_vars = _read_env_file_cached(env_path)
+        logger.info("Read %s environment variables from %s", len(env_vars), env_path)
     except Exception as e:
-        logger.error(f"Error reading .env file: {str(e)}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": f"Failed to read credentials: {str(e)}"})
+        logger.error("Error reading .env file: %s", e, exc_info=True)
+        return ORJSONResponse(status_code=500, content={"error": f"Failed to read credentials: {str(e)}"})
 
     # Return just the credentials keys that we need for the form
     credential_keys = [
@@ -559,23 +996,17 @@ async def save_credentials(
       - WEAVIATE_API_KEY, WEAVIATE_URL
       - QDRANT_API_KEY, QDRANT_URL
     """
-    env_path = os.path.join(RAGPY_DIR, ".env") # Use RAGPY_DIR for consistency
-    env_path = os.path.abspath(env_path)
-    logger.info(f"Attempting to save credentials to .env file at: {env_path}")
+    env_path = ENV_PATH
+    logger.info("Attempting to save credentials to .env file at: %s", env_path)
 
     # Read existing .env content to preserve other variables
     env_vars = {}
     if os.path.exists(env_path):
         try:
-            with open(env_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if "=" in line and not line.startswith("#"):
-                        k, v = line.split("=", 1)
-                        env_vars[k.strip()] = v.strip() # Strip keys and values
-            logger.info(f"Successfully read {len(env_vars)} existing variables from {env_path}")
+            env_vars = _read_env_file(env_path)
+            logger.info("Successfully read %s existing variables from %s", len(env_vars), env_path)
         except Exception as e:
-            logger.error(f"Error reading existing .env file at {env_path}: {str(e)}", exc_info=True)
+            logger.error("Error reading existing .env file at %s: %s", env_path, e, exc_info=True)
             # Decide if we should proceed or return an error. For now, let's proceed but log heavily.
             # If the file is corrupted, overwriting might be acceptable if we only care about these specific keys.
 
@@ -605,14 +1036,20 @@ async def save_credentials(
 
     # Write all variables (original + updated/new) back to .env
     try:
-        with open(env_path, "w", encoding="utf-8") as f:
-            for k, v in env_vars.items():
-                f.write(f"{k}={v}\n")
-        logger.info(f"Successfully wrote {len(env_vars)} variables to {env_path}. Updated/Removed keys from request: {updated_keys}")
-        return JSONResponse({"status": "success", "message": f"Credentials saved to {env_path}. Processed keys: {updated_keys}", "saved_path": env_path})
+        _write_env_file(env_path, env_vars)
+        _invalidate_env_cache()
+        _reset_chunk_executor()  # Pool workers read API keys from .env when they start
+        llm_note_generator.reset_clients()  # Note generation clients are built from the saved keys
+        logger.info("Successfully wrote %s variables to %s. Updated/Removed keys from request: %s", len(env_vars), env_path, updated_keys)
+        return ORJSONResponse({"status": "success", "message": f"Credentials saved to {env_path}. Processed keys: {updated_keys}", "saved_path": env_path})
     except Exception as e:
-        logger.error(f"Failed to write to .env file at {env_path}: {str(e)}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": f"Failed to write credentials to {env_path}", "details": str(e)})
+        logger.error("Failed to write to .env file at %s: %s", env_path, e, exc_info=True)
+        return ORJSONResponse(status_code=500, content={"error": f"Failed to write credentials to {env_path}", "details": str(e)})
+
+
+# Tags put on generated reading notes; an item with a child note tagged with the first
+# one already has its note and is skipped
+RAGPY_NOTE_TAGS = ("ragpy", "fiche-lecture")
 
 
 @app.post("/generate_zotero_notes")
@@ -642,14 +1079,14 @@ async def generate_zotero_notes(
     """
     # Convert string to boolean
     use_extended = extended_analysis.lower() == "true"
-    logger.info(f"Starting Zotero notes generation for session: {session}, model: {model or 'default'}, extended_analysis: {use_extended}")
+    logger.info("Starting Zotero notes generation for session: %s, model: %s, extended_analysis: %s", session, model or 'default', use_extended)
 
     # Build session directory path
     session_dir = os.path.join(UPLOAD_DIR, session)
 
     if not os.path.exists(session_dir):
-        logger.error(f"Session directory not found: {session_dir}")
-        return JSONResponse(
+        logger.error("Session directory not found: %s", session_dir)
+        return ORJSONResponse(
             status_code=404,
             content={"error": f"Session directory not found: {session}"}
         )
@@ -658,22 +1095,22 @@ async def generate_zotero_notes(
     library_info = zotero_parser.extract_library_info_from_session(session_dir)
 
     if not library_info.get("success"):
-        logger.error(f"Failed to extract library info: {library_info.get('error')}")
-        return JSONResponse(
+        logger.error("Failed to extract library info: %s", library_info.get('error'))
+        return ORJSONResponse(
             status_code=400,
             content={"error": library_info.get("error")}
         )
 
     library_type = library_info["library_type"]
     library_id = library_info["library_id"]
-    logger.info(f"Detected library: type={library_type}, id={library_id}")
+    logger.info("Detected library: type=%s, id=%s", library_type, library_id)
 
     # Get Zotero credentials from environment
     zotero_api_key = os.getenv("ZOTERO_API_KEY")
 
     if not zotero_api_key:
         logger.error("ZOTERO_API_KEY not found in environment")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=400,
             content={"error": "ZOTERO_API_KEY not configured. Please set it in Settings."}
         )
@@ -681,10 +1118,10 @@ async def generate_zotero_notes(
     # Verify API key first
     try:
         key_info = zotero_client.verify_api_key(zotero_api_key)
-        logger.info(f"Zotero API key verified: {key_info.get('username', 'Unknown user')}")
+        logger.info("Zotero API key verified: %s", key_info.get('username', 'Unknown user'))
     except zotero_client.ZoteroAPIError as e:
-        logger.error(f"Invalid Zotero API key: {e}")
-        return JSONResponse(
+        logger.error("Invalid Zotero API key: %s", e)
+        return ORJSONResponse(
             status_code=401,
             content={"error": f"Invalid Zotero API key: {e.message}"}
         )
@@ -693,8 +1130,8 @@ async def generate_zotero_notes(
     csv_path = os.path.join(session_dir, "output.csv")
 
     if not os.path.exists(csv_path):
-        logger.error(f"output.csv not found at: {csv_path}")
-        return JSONResponse(
+        logger.error("output.csv not found at: %s", csv_path)
+        return ORJSONResponse(
             status_code=404,
             content={"error": "output.csv not found. Please run 'Generate CSV' first."}
         )
@@ -702,10 +1139,10 @@ async def generate_zotero_notes(
     # Load CSV with pandas
     try:
         df = pd.read_csv(csv_path, encoding="utf-8-sig")
-        logger.info(f"Loaded CSV with {len(df)} rows")
+        logger.info("Loaded CSV with %s rows", len(df))
     except Exception as e:
-        logger.error(f"Error reading CSV: {e}")
-        return JSONResponse(
+        logger.error("Error reading CSV: %s", e)
+        return ORJSONResponse(
             status_code=500,
             content={"error": f"Failed to read CSV: {str(e)}"}
         )
@@ -721,23 +1158,27 @@ async def generate_zotero_notes(
 
     if not itemkey_column:
         logger.error("No itemKey column found in CSV")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=400,
             content={"error": "No itemKey column found in CSV. Make sure the data comes from a Zotero export."}
         )
 
     # Filter items with non-null itemKey
     df_items = df[df[itemkey_column].notna()].copy()
-    logger.info(f"Found {len(df_items)} items with itemKey")
+    logger.info("Found %s items with itemKey", len(df_items))
 
     if len(df_items) == 0:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=400,
             content={"error": "No items with itemKey found in CSV"}
         )
 
-    # Process each item
+    # Process each item: items are checked against Zotero first, the missing notes are
+    # generated concurrently (bounded per LLM provider), then created in batched write requests
     results = []
+    pending = []  # (item_result, metadata, text_content) of the items needing a note
+    # Convert empty string to None to use default model
+    llm_model = model if model else None
 
     for idx, row in df_items.iterrows():
         item_key = str(row[itemkey_column])
@@ -747,6 +1188,7 @@ async def generate_zotero_notes(
             "status": "pending",
             "message": ""
         }
+        results.append(item_result)
 
         try:
             # Build metadata dictionary
@@ -766,73 +1208,110 @@ async def generate_zotero_notes(
             if not text_content and not metadata.get("abstract"):
                 item_result["status"] = "skipped"
                 item_result["message"] = "No text content or abstract available"
-                logger.warning(f"Skipping item {item_key}: no content")
-                results.append(item_result)
+                logger.warning("Skipping item %s: no content", item_key)
                 continue
 
-            # Generate the note
-            logger.info(f"Generating note for item {item_key} (extended: {use_extended})")
-            # Convert empty string to None to use default model
-            llm_model = model if model else None
-            sentinel, note_html = llm_note_generator.build_note_html(
-                metadata=metadata,
-                text_content=text_content,
-                model=llm_model,
-                use_llm=True,
-                extended_analysis=use_extended
-            )
-
-            # Check if note already exists
-            logger.info(f"Checking if note exists for item {item_key}")
-            note_exists = zotero_client.check_note_exists(
-                library_type=library_type,
-                library_id=library_id,
-                item_key=item_key,
-                sentinel=sentinel,
-                api_key=zotero_api_key
-            )
+            pending.append((item_result, metadata, text_content))
+        except Exception as e:
+            item_result["status"] = "error"
+            item_result["message"] = f"Unexpected error: {str(e)}"
+            logger.error("Unexpected error for item %s: %s", item_key, e, exc_info=True)
+
+    # Skip the items that already have a ragpy note (e.g. from an earlier run) before
+    # generating anything (Zotero calls are blocking: run them off the event loop)
+    logger.info("Checking if notes exist for %s items", len(pending))
+    existing = await asyncio.to_thread(
+        zotero_client.check_tagged_notes_exist,
+        library_type=library_type,
+        library_id=library_id,
+        item_keys=[item_result["itemKey"] for item_result, _, _ in pending],
+        tag=RAGPY_NOTE_TAGS[0],
+        api_key=zotero_api_key
+    )
+
+    to_generate = []  # (item_result, metadata, text_content) of the items without a note
+    for entry, note_exists in zip(pending, existing):
+        item_result = entry[0]
+        item_key = item_result["itemKey"]
+        if isinstance(note_exists, zotero_client.ZoteroAPIError):
+            item_result["status"] = "error"
+            item_result["message"] = f"Zotero API error {note_exists.status_code}: {note_exists.message}"
+            logger.error("Zotero API error for item %s: %s", item_key, note_exists)
+        elif note_exists:
+            item_result["status"] = "exists"
+            item_result["message"] = "Note already exists (idempotent)"
+            logger.info("Note already exists for item %s", item_key)
+        else:
+            to_generate.append(entry)
+
+    # Generate the notes
+    logger.info("Generating %s notes (extended: %s)", len(to_generate), use_extended)
+    notes = await asyncio.gather(*(
+        llm_note_generator.build_note_html_async(
+            metadata=metadata,
+            text_content=text_content,
+            model=llm_model,
+            use_llm=True,
+            extended_analysis=use_extended
+        )
+        for _, metadata, text_content in to_generate
+    ), return_exceptions=True)
 
-            if note_exists:
-                item_result["status"] = "exists"
-                item_result["message"] = "Note already exists (idempotent)"
-                item_result["sentinel"] = sentinel
-                logger.info(f"Note already exists for item {item_key}")
-                results.append(item_result)
-                continue
+    to_create = []  # (item_result, sentinel, note_html) of the notes to write
+    for (item_result, _, _), note in zip(to_generate, notes):
+        if isinstance(note, Exception):
+            item_result["status"] = "error"
+            item_result["message"] = f"Unexpected error: {str(note)}"
+            logger.error("Unexpected error for item %s: %s", item_result["itemKey"], note, exc_info=note)
+        else:
+            to_create.append((item_result, *note))
 
-            # Create the note
-            logger.info(f"Creating note for item {item_key}")
-            create_result = zotero_client.create_child_note(
+    # Create the notes, up to MAX_NOTES_PER_REQUEST per Zotero write request
+    for start in range(0, len(to_create), zotero_client.MAX_NOTES_PER_REQUEST):
+        batch = to_create[start:start + zotero_client.MAX_NOTES_PER_REQUEST]
+        logger.info("Creating %s notes", len(batch))
+        try:
+            create_results = await asyncio.to_thread(
+                zotero_client.create_child_notes_bulk,
                 library_type=library_type,
                 library_id=library_id,
-                item_key=item_key,
-                note_html=note_html,
-                tags=["ragpy", "fiche-lecture"],
+                notes=[
+                    {
+                        "item_key": item_result["itemKey"],
+                        "note_html": note_html,
+                        "tags": list(RAGPY_NOTE_TAGS),
+                        "sentinel": sentinel
+                    }
+                    for item_result, sentinel, note_html in batch
+                ],
                 api_key=zotero_api_key
             )
+        except zotero_client.ZoteroAPIError as e:
+            for item_result, _, _ in batch:
+                item_result["status"] = "error"
+                item_result["message"] = f"Zotero API error {e.status_code}: {e.message}"
+            logger.error("Zotero API error while creating %s notes: %s", len(batch), e)
+            continue
+        except Exception as e:
+            for item_result, _, _ in batch:
+                item_result["status"] = "error"
+                item_result["message"] = f"Unexpected error: {str(e)}"
+            logger.error("Unexpected error while creating %s notes: %s", len(batch), e, exc_info=True)
+            continue
 
+        for (item_result, sentinel, _), create_result in zip(batch, create_results):
+            item_key = item_result["itemKey"]
             if create_result.get("success"):
                 item_result["status"] = "created"
                 item_result["message"] = "Note created successfully"
                 item_result["noteKey"] = create_result.get("note_key")
                 item_result["sentinel"] = sentinel
                 item_result["zotero_url"] = f"zotero://select/library/items/{create_result.get('note_key')}"
-                logger.info(f"Successfully created note for item {item_key}")
+                logger.info("Successfully created note for item %s", item_key)
             else:
                 item_result["status"] = "error"
                 item_result["message"] = create_result.get("message", "Unknown error")
-                logger.error(f"Failed to create note for item {item_key}: {item_result['message']}")
-
-        except zotero_client.ZoteroAPIError as e:
-            item_result["status"] = "error"
-            item_result["message"] = f"Zotero API error {e.status_code}: {e.message}"
-            logger.error(f"Zotero API error for item {item_key}: {e}")
-        except Exception as e:
-            item_result["status"] = "error"
-            item_result["message"] = f"Unexpected error: {str(e)}"
-            logger.error(f"Unexpected error for item {item_key}: {e}", exc_info=True)
-
-        results.append(item_result)
+                logger.error("Failed to create note for item %s: %s", item_key, item_result['message'])
 
     # Build summary
     summary = {
@@ -843,15 +1322,83 @@ async def generate_zotero_notes(
         "errors": sum(1 for r in results if r["status"] == "error")
     }
 
-    logger.info(f"Zotero notes generation complete: {summary}")
+    logger.info("Zotero notes generation complete: %s", summary)
 
-    return JSONResponse({
+    return ORJSONResponse({
         "success": True,
         "summary": summary,
         "items": results
     })
 
 
+JSON_READ_BLOCK_SIZE = 64 * 1024
+
+
+# rad_chunk writes its chunk files with json.dump(indent=2): every top-level object starts a
+# line indented by exactly two spaces, and raw newlines never occur inside JSON strings.
+PRETTY_JSON_LIST_START = b"[\n  {"
+PRETTY_JSON_ITEM_START = b"\n  {"
+
+
+def _count_json_items(file_path: str) -> int:
+    """
+    Number of items in a JSON list file.
+
+    Files in rad_chunk's indent=2 layout are counted with a byte scan over a memory map,
+    without decoding; anything else is streamed with ijson when available, or parsed.
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size > len(PRETTY_JSON_LIST_START):
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm[:len(PRETTY_JSON_LIST_START)] == PRETTY_JSON_LIST_START:
+                    count, pos = 0, mm.find(PRETTY_JSON_ITEM_START)
+                    while pos != -1:  # One C-level find per item, no decoding
+                        count += 1
+                        pos = mm.find(PRETTY_JSON_ITEM_START, pos + 1)
+                    return count
+        if IJSON_AVAILABLE:
+            return sum(1 for _ in ijson.items(f, 'item'))
+        return len(orjson.loads(f.read()))
+
+
+def _read_first_json_item(file_path: str):
+    """
+    Decode only the first element of a top-level JSON array.
+
+    Embedding files can be gigabytes, so the file is read in blocks just until the
+    first element parses. Returns None if the file is not a non-empty JSON array.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    start = None  # Index of the first element once the opening '[' has been seen
+    with open(file_path, "r", encoding="utf-8") as f:
+        while True:
+            block = f.read(JSON_READ_BLOCK_SIZE)
+            buf += block
+            if start is None:
+                stripped = buf.lstrip()
+                if not stripped:
+                    if not block:
+                        return None
+                    continue
+                if stripped[0] != "[":
+                    return None
+                start = len(buf) - len(stripped) + 1
+            idx = start
+            while idx < len(buf) and buf[idx].isspace():
+                idx += 1
+            if idx < len(buf) and buf[idx] == "]":
+                return None
+            try:
+                item, end = decoder.raw_decode(buf, idx)
+                # A bare number ending exactly at the buffer edge may continue in the next block
+                if end < len(buf) or not block:
+                    return item
+            except json.JSONDecodeError:
+                if not block:  # EOF: the element is genuinely malformed
+                    raise
+
+
 @app.get("/get_first_chunk")
 async def get_first_chunk(path: str = Query(...), filetype: str = Query(...)): # path is now relative to UPLOAD_DIR
     """
@@ -859,7 +1406,7 @@ async def get_first_chunk(path: str = Query(...), filetype: str = Query(...)): #
     filetype: one of 'initial', 'dense', 'sparse'
     """
     absolute_processing_path = os.path.abspath(os.path.join(UPLOAD_DIR, path))
-    logger.info(f"get_first_chunk received relative path: '{path}', resolved to absolute: '{absolute_processing_path}' for filetype '{filetype}'")
+    logger.info("get_first_chunk received relative path: '%s', resolved to absolute: '%s' for filetype '%s'", path, absolute_processing_path, filetype)
 
     # Determine file path using absolute_processing_path
     if filetype == "initial":
@@ -869,17 +1416,15 @@ async def get_first_chunk(path: str = Query(...), filetype: str = Query(...)): #
     elif filetype == "sparse":
         chunk_file = os.path.join(absolute_processing_path, f"{BASE_CHUNK_OUTPUT_NAME}_chunks_with_embeddings_sparse.json")
     else:
-        return JSONResponse(status_code=400, content={"error": "Invalid filetype."})
+        return ORJSONResponse(status_code=400, content={"error": "Invalid filetype."})
 
     if not os.path.exists(chunk_file):
-        return JSONResponse(status_code=404, content={"error": f"File not found: {chunk_file}"})
+        return ORJSONResponse(status_code=404, content={"error": f"File not found: {chunk_file}"})
 
     try:
-        with open(chunk_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        if not data or not isinstance(data, list):
-            return JSONResponse(status_code=404, content={"error": "No chunks found in file."})
-        first_chunk = data[0]
+        first_chunk = await asyncio.to_thread(_read_first_json_item, chunk_file)
+        if first_chunk is None:
+            return ORJSONResponse(status_code=404, content={"error": "No chunks found in file."})
         # Sanitize embedding for display
         def sanitize_embedding(emb):
             if isinstance(emb, list):
@@ -898,149 +1443,245 @@ async def get_first_chunk(path: str = Query(...), filetype: str = Query(...)): #
             "sparse_embedding": None
         }
         if filetype == "dense" or filetype == "sparse":
-            result["embedding"] = sanitize_embedding(first_chunk.get("embedding"))
+            from scripts.rad_vectordb import dense_embedding  # Decodes float16-encoded vectors
+            result["embedding"] = sanitize_embedding(dense_embedding(first_chunk))
         if filetype == "sparse":
             result["sparse_embedding"] = sanitize_embedding(first_chunk.get("sparse_embedding"))
-        return JSONResponse(result)
+        return ORJSONResponse(result)
     except Exception as e:
-        return JSONResponse(status_code=500, content={"error": f"Failed to read chunk file: {e}"})
+        return ORJSONResponse(status_code=500, content={"error": f"Failed to read chunk file: {e}"})
 
-@app.post("/initial_text_chunking")
-async def initial_text_chunking(path: str = Form(...), model: str = Form(None)): # path is now relative to UPLOAD_DIR
-    absolute_processing_path = os.path.abspath(os.path.join(UPLOAD_DIR, path))
-    logger.info(f"initial_text_chunking received relative path: '{path}', resolved to absolute: '{absolute_processing_path}'")
-    if model:
-        logger.info(f"LLM model specified for recoding: {model}")
+# Long-running work (chunking, embeddings, large DB uploads) runs as a background job:
+# the POST returns 202 with a job_id and the client polls /jobs/{job_id} (or listens on
+# /jobs/{job_id}/ws) instead of holding the connection for up to an hour.
+_JOBS = {}      # job_id -> asyncio.Task returning the final ORJSONResponse
+_JOB_KEYS = {}  # (kind, path) -> job_id of the running job, so retries do not start a second one
+_JOB_DONE_AT = {}  # job_id -> time.monotonic() when the job finished
+JOB_RESULT_TTL = 3600  # seconds a finished job's result stays available (to every poller)
 
-    input_csv = os.path.join(absolute_processing_path, f"{BASE_CHUNK_OUTPUT_NAME}.csv")
-    output_json = os.path.join(absolute_processing_path, f"{BASE_CHUNK_OUTPUT_NAME}_chunks.json")
 
-    if not os.path.exists(input_csv):
-        logger.error(f"Input CSV not found for initial chunking: {input_csv}")
-        return JSONResponse(status_code=400, content={"error": f"Input CSV not found: {input_csv}"})
+def _evict_finished_jobs() -> None:
+    """Forget jobs that finished more than JOB_RESULT_TTL seconds ago."""
+    expired_before = time.monotonic() - JOB_RESULT_TTL
+    for job_id in [job_id for job_id, done_at in _JOB_DONE_AT.items() if done_at < expired_before]:
+        del _JOB_DONE_AT[job_id]
+        _JOBS.pop(job_id, None)
 
-    try:
-        # Ensure script path is robust
-        script_path = os.path.abspath(os.path.join(RAGPY_DIR, "scripts", "rad_chunk.py"))
-        logger.info(f"Executing rad_chunk.py (initial) with script: {script_path}, input: {input_csv}, output dir: {absolute_processing_path}")
-
-        # Build command with optional --model parameter
-        cmd = [
-            "python3", script_path,
-            "--phase", "initial",
-            "--input", input_csv,
-            "--output", absolute_processing_path
-        ]
-        if model:
-            cmd.extend(["--model", model])
-
-        # Modifié pour que stdout/stderr du script aillent vers la console uvicorn
-        subprocess.run(cmd, check=True, timeout=3600) # Timeout augmenté à 1 heure (3600 secondes)
-    except subprocess.TimeoutExpired:
-        logger.error(f"Initial chunking script timed out after 1 hour. Path: {absolute_processing_path}")
-        return JSONResponse(status_code=504, content={"error": "Initial chunking timed out (1 hour)."})
-    except subprocess.CalledProcessError as e:
-        # e.stderr ne sera pas peuplé si capture_output=False. L'erreur du script sera dans la console.
-        logger.error(f"Initial chunking script failed with code {e.returncode}. Path: {absolute_processing_path}. Script error output should be in console.")
-        return JSONResponse(status_code=500, content={"error": "Initial chunking failed.", "details": f"Script exited with code {e.returncode}. Check server console for details."})
-    except Exception as e:
-        logger.error(f"Unexpected error in initial chunking. Path: {absolute_processing_path}. Error: {str(e)}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": "Unexpected error in initial chunking.", "details": str(e)})
 
-    if os.path.exists(output_json):
-        try:
-            with open(output_json, 'r', encoding='utf-8') as f: data = json.load(f)
-            return JSONResponse({"status": "success", "file": output_json, "count": len(data)})
-        except Exception as e:
-            return JSONResponse({"status": "success_file_unreadable", "file": output_json, "error": str(e)})
-    else:
-        return JSONResponse(status_code=500, content={"error": "Output JSON from initial chunking not found.", "file": output_json})
+def _job_done(job_id: str, key=None):
+    def callback(_task) -> None:
+        _JOB_DONE_AT[job_id] = time.monotonic()
+        if key is not None:
+            _JOB_KEYS.pop(key, None)
+    return callback
+
+
+def _start_job(coro_factory, key=None) -> str:
+    """Start coro_factory() as a background job, or return the job already running for key."""
+    _evict_finished_jobs()
+    if key is not None and key in _JOB_KEYS:
+        return _JOB_KEYS[key]
+    job_id = uuid.uuid4().hex
+    task = asyncio.create_task(coro_factory())
+    _JOBS[job_id] = task
+    if key is not None:
+        _JOB_KEYS[key] = job_id
+    task.add_done_callback(_job_done(job_id, key))
+    return job_id
 
-@app.post("/dense_embedding_generation")
-async def dense_embedding_generation(path: str = Form(...)): # path is now relative to UPLOAD_DIR
-    absolute_processing_path = os.path.abspath(os.path.join(UPLOAD_DIR, path))
-    logger.info(f"dense_embedding_generation received relative path: '{path}', resolved to absolute: '{absolute_processing_path}'")
 
-    input_json = os.path.join(absolute_processing_path, f"{BASE_CHUNK_OUTPUT_NAME}_chunks.json")
-    output_json = os.path.join(absolute_processing_path, f"{BASE_CHUNK_OUTPUT_NAME}_chunks_with_embeddings.json")
+def _accepted(job_id: str, message: str, **extra) -> ORJSONResponse:
+    return ORJSONResponse(status_code=202, content={"status": "accepted", "message": message, "job_id": job_id, **extra})
 
-    if not os.path.exists(input_json):
-        logger.error(f"Input JSON for dense embeddings not found: {input_json}")
-        return JSONResponse(status_code=400, content={"error": f"Input JSON for dense embeddings not found: {input_json}"})
 
+def _job_result(job_id: str, label: str = "Job") -> ORJSONResponse:
+    """
+    Final response of a finished job, or a 202/404 status response.
+
+    Results are kept for JOB_RESULT_TTL seconds after the job ends, so a retry, a second
+    tab or a poller taking over from a dropped WebSocket all get the same answer.
+    """
+    _evict_finished_jobs()
+    task = _JOBS.get(job_id)
+    if task is None:
+        return ORJSONResponse(status_code=404, content={"error": f"Unknown job: {job_id}"})
+    if not task.done():
+        return ORJSONResponse(status_code=202, content={"status": "running", "job_id": job_id})
     try:
-        # Ensure script path is robust
-        script_path = os.path.abspath(os.path.join(RAGPY_DIR, "scripts", "rad_chunk.py"))
-        logger.info(f"Executing rad_chunk.py (dense) with script: {script_path}, input: {input_json}, output dir: {absolute_processing_path}")
-
-        # Modifié pour que stdout/stderr du script aillent vers la console uvicorn
-        subprocess.run([
-            "python3", script_path,
-            "--phase", "dense",
-            "--input", input_json, 
-            "--output", absolute_processing_path
-        ], check=True, timeout=3600) # Timeout augmenté à 1 heure (3600 secondes)
-    except subprocess.TimeoutExpired:
-        logger.error(f"Dense embedding script timed out after 1 hour. Path: {absolute_processing_path}")
-        return JSONResponse(status_code=504, content={"error": "Dense embedding timed out (1 hour)."})
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Dense embedding script failed with code {e.returncode}. Path: {absolute_processing_path}. Script error output should be in console.")
-        return JSONResponse(status_code=500, content={"error": "Dense embedding failed.", "details": f"Script exited with code {e.returncode}. Check server console for details."})
+        return task.result()
     except Exception as e:
-        logger.error(f"Unexpected error in dense embedding. Path: {absolute_processing_path}. Error: {str(e)}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": "Unexpected error in dense embedding.", "details": str(e)})
+        logger.error("%s %s failed: %s", label, job_id, e, exc_info=True)
+        return ORJSONResponse(status_code=500, content={"error": f"{label} failed.", "details": str(e)})
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return _job_result(job_id)
+
+
+def _job_message(response: Response) -> str:
+    """The {"status_code", "content"} WebSocket message for a job's final response."""
+    try:
+        content = orjson.loads(response.body) if response.body else None
+    except orjson.JSONDecodeError:
+        content = response.body.decode("utf-8", "replace")
+    return orjson.dumps({"status_code": response.status_code, "content": content}).decode("utf-8")
+
+
+@app.websocket("/jobs/{job_id}/ws")
+async def job_events(websocket: WebSocket, job_id: str):
+    """Push the job's final response ({"status_code", "content"}) once it completes."""
+    await websocket.accept()
+    task = _JOBS.get(job_id)
+    # Wait for the job while listening to the socket, so a client that goes away is
+    # noticed; the job itself keeps running either way
+    while task is not None and not task.done():
+        receive = asyncio.ensure_future(websocket.receive())
+        await asyncio.wait([task, receive], return_when=asyncio.FIRST_COMPLETED)
+        if not receive.done():
+            receive.cancel()
+            break
+        if receive.result()["type"] == "websocket.disconnect":
+            return
+    response = _job_result(job_id)
+    # Text frame: the page JSON.parse()s it
+    await websocket.send_text(_job_message(response))
+    await websocket.close()
+
+
+async def _run_phase(path: str, label: str, input_name: str, output_name: str, input_description: str, run_phase) -> ORJSONResponse:
+    """
+    Shared body of the chunking/embedding endpoints.
 
-    if os.path.exists(output_json):
+    path is relative to UPLOAD_DIR; label names the phase in messages ("Dense embedding");
+    run_phase(input_path, processing_path) is awaited to run it. The phase runs as a
+    background job: the response is 202 with the job_id to poll.
+    """
+    absolute_processing_path = os.path.abspath(os.path.join(UPLOAD_DIR, path))
+    logger.info("%s received relative path: '%s', resolved to absolute: '%s'", label, path, absolute_processing_path)
+
+    input_path = os.path.join(absolute_processing_path, input_name)
+    output_json = os.path.join(absolute_processing_path, output_name)
+
+    if not os.path.exists(input_path):
+        logger.error("%s not found: %s", input_description, input_path)
+        return ORJSONResponse(status_code=400, content={"error": f"{input_description} not found: {input_path}"})
+
+    async def run() -> ORJSONResponse:
         try:
-            with open(output_json, 'r', encoding='utf-8') as f: data = json.load(f)
-            return JSONResponse({"status": "success", "file": output_json, "count": len(data)})
+            logger.info("Running %s, input: %s, output dir: %s", label.lower(), input_path, absolute_processing_path)
+            await run_phase(input_path, absolute_processing_path)
+        except asyncio.TimeoutError:
+            logger.error("%s timed out after 1 hour. Path: %s", label, absolute_processing_path)
+            return ORJSONResponse(status_code=504, content={"error": f"{label} timed out (1 hour)."})
+        except (RuntimeError, ValueError, FileNotFoundError) as e:
+            logger.error("%s failed. Path: %s. Error: %s", label, absolute_processing_path, e)
+            return ORJSONResponse(status_code=500, content={"error": f"{label} failed.", "details": str(e)})
         except Exception as e:
-            return JSONResponse({"status": "success_file_unreadable", "file": output_json, "error": str(e)})
-    else:
-        return JSONResponse(status_code=500, content={"error": "Output JSON from dense embedding not found.", "file": output_json})
+            logger.error("Unexpected error in %s. Path: %s. Error: %s", label.lower(), absolute_processing_path, e, exc_info=True)
+            return ORJSONResponse(status_code=500, content={"error": f"Unexpected error in {label.lower()}.", "details": str(e)})
+
+        if os.path.exists(output_json):
+            try:
+                return ORJSONResponse({"status": "success", "file": output_json, "count": await asyncio.to_thread(_count_json_items, output_json)})
+            except Exception as e:
+                return ORJSONResponse({"status": "success_file_unreadable", "file": output_json, "error": str(e)})
+        else:
+            return ORJSONResponse(status_code=500, content={"error": f"Output JSON from {label.lower()} not found.", "file": output_json})
+
+    job_id = _start_job(run, key=(label, absolute_processing_path))
+    logger.info("%s for %s running as job %s", label, absolute_processing_path, job_id)
+    return _accepted(job_id, f"{label} running in the background. Poll /jobs/{job_id} for the result.")
+
+
+@app.post("/initial_text_chunking")
+async def initial_text_chunking(path: str = Form(...), model: str = Form(None)): # path is now relative to UPLOAD_DIR
+    if model:
+        logger.info("LLM model specified for recoding: %s", model)
+    return await _run_phase(
+        path, "Initial chunking",
+        f"{BASE_CHUNK_OUTPUT_NAME}.csv", f"{BASE_CHUNK_OUTPUT_NAME}_chunks.json", "Input CSV",
+        lambda input_csv, output_dir: _run_chunk_job("initial", input_csv, output_dir, model or "gpt-4o-mini"),
+    )
+
+@app.post("/dense_embedding_generation")
+async def dense_embedding_generation(path: str = Form(...)): # path is now relative to UPLOAD_DIR
+    return await _run_phase(
+        path, "Dense embedding",
+        f"{BASE_CHUNK_OUTPUT_NAME}_chunks.json", f"{BASE_CHUNK_OUTPUT_NAME}_chunks_with_embeddings.json",
+        "Input JSON for dense embeddings",
+        _embed_dense,
+    )
 
 @app.post("/sparse_embedding_generation")
 async def sparse_embedding_generation(path: str = Form(...)): # path is now relative to UPLOAD_DIR
+    return await _run_phase(
+        path, "Sparse embedding",
+        f"{BASE_CHUNK_OUTPUT_NAME}_chunks_with_embeddings.json", f"{BASE_CHUNK_OUTPUT_NAME}_chunks_with_embeddings_sparse.json",
+        "Input JSON for sparse embeddings",
+        lambda input_json, output_dir: _run_chunk_job("sparse", input_json, output_dir),
+    )
+
+
+@app.post("/run_pipeline")
+async def run_pipeline(path: str = Form(...), model: str = Form(None)): # path is relative to UPLOAD_DIR
+    """
+    Chunking, dense and sparse embeddings in one request.
+
+    Dense (API-bound) and sparse (spaCy, CPU-bound) embeddings only need the chunks, so
+    they run side by side on separate pool workers and are merged afterwards.
+    """
     absolute_processing_path = os.path.abspath(os.path.join(UPLOAD_DIR, path))
-    logger.info(f"sparse_embedding_generation received relative path: '{path}', resolved to absolute: '{absolute_processing_path}'")
+    logger.info("run_pipeline received relative path: '%s', resolved to absolute: '%s'", path, absolute_processing_path)
 
-    input_json = os.path.join(absolute_processing_path, f"{BASE_CHUNK_OUTPUT_NAME}_chunks_with_embeddings.json")
+    input_csv = os.path.join(absolute_processing_path, f"{BASE_CHUNK_OUTPUT_NAME}.csv")
+    chunks_json = os.path.join(absolute_processing_path, f"{BASE_CHUNK_OUTPUT_NAME}_chunks.json")
+    dense_json = os.path.join(absolute_processing_path, f"{BASE_CHUNK_OUTPUT_NAME}_chunks_with_embeddings.json")
     output_json = os.path.join(absolute_processing_path, f"{BASE_CHUNK_OUTPUT_NAME}_chunks_with_embeddings_sparse.json")
 
-    if not os.path.exists(input_json):
-        logger.error(f"Input JSON for sparse embeddings not found: {input_json}")
-        return JSONResponse(status_code=400, content={"error": f"Input JSON for sparse embeddings not found: {input_json}"})
+    if not os.path.exists(input_csv):
+        logger.error("Input CSV not found for pipeline: %s", input_csv)
+        return ORJSONResponse(status_code=400, content={"error": f"Input CSV not found: {input_csv}"})
 
-    try:
-        # Ensure script path is robust
-        script_path = os.path.abspath(os.path.join(RAGPY_DIR, "scripts", "rad_chunk.py"))
-        logger.info(f"Executing rad_chunk.py (sparse) with script: {script_path}, input: {input_json}, output dir: {absolute_processing_path}")
-
-        # Modifié pour que stdout/stderr du script aillent vers la console uvicorn
-        subprocess.run([
-            "python3", script_path,
-            "--phase", "sparse",
-            "--input", input_json,
-            "--output", absolute_processing_path
-        ], check=True, timeout=3600) # Timeout augmenté à 1 heure (3600 secondes)
-    except subprocess.TimeoutExpired:
-        logger.error(f"Sparse embedding script timed out after 1 hour. Path: {absolute_processing_path}")
-        return JSONResponse(status_code=504, content={"error": "Sparse embedding timed out (1 hour)."})
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Sparse embedding script failed with code {e.returncode}. Path: {absolute_processing_path}. Script error output should be in console.")
-        return JSONResponse(status_code=500, content={"error": "Sparse embedding failed.", "details": f"Script exited with code {e.returncode}. Check server console for details."})
-    except Exception as e:
-        logger.error(f"Unexpected error in sparse embedding. Path: {absolute_processing_path}. Error: {str(e)}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": "Unexpected error in sparse embedding.", "details": str(e)})
+    async def run() -> ORJSONResponse:
+        try:
+            await _run_chunk_job("initial", input_csv, absolute_processing_path, model or "gpt-4o-mini")
+            await asyncio.gather(
+                _embed_dense(chunks_json, absolute_processing_path),
+                _run_chunk_job("sparse", chunks_json, absolute_processing_path),
+            )
+            await _run_chunk_job("merge", dense_json, output_json)
+        except asyncio.TimeoutError:
+            logger.error("Pipeline phase timed out after 1 hour. Path: %s", absolute_processing_path)
+            return ORJSONResponse(status_code=504, content={"error": "Pipeline phase timed out (1 hour)."})
+        except (RuntimeError, ValueError, FileNotFoundError) as e:
+            logger.error("Pipeline failed. Path: %s. Error: %s", absolute_processing_path, e)
+            return ORJSONResponse(status_code=500, content={"error": "Pipeline failed.", "details": str(e)})
+        except Exception as e:
+            logger.error("Unexpected error in pipeline. Path: %s. Error: %s", absolute_processing_path, e, exc_info=True)
+            return ORJSONResponse(status_code=500, content={"error": "Unexpected error in pipeline.", "details": str(e)})
 
-    if os.path.exists(output_json):
         try:
-            with open(output_json, 'r', encoding='utf-8') as f: data = json.load(f)
-            return JSONResponse({"status": "success", "file": output_json, "count": len(data)})
+            return ORJSONResponse({"status": "success", "file": output_json, "count": await asyncio.to_thread(_count_json_items, output_json)})
         except Exception as e:
-            return JSONResponse({"status": "success_file_unreadable", "file": output_json, "error": str(e)})
-    else:
-        return JSONResponse(status_code=500, content={"error": "Output JSON from sparse embedding not found.", "file": output_json})
+            return ORJSONResponse({"status": "success_file_unreadable", "file": output_json, "error": str(e)})
+
+    job_id = _start_job(run, key=("Pipeline", absolute_processing_path))
+    logger.info("Pipeline for %s running as job %s", absolute_processing_path, job_id)
+    return _accepted(job_id, f"Pipeline running in the background. Poll /jobs/{job_id} for the result.")
+
+
+# Vector DB inserts are blocking network calls: run them on a dedicated thread pool, and
+# bound how many run (each loads its chunks file) at once.
+DB_UPLOAD_WORKERS = 4
+DB_UPLOAD_JOB_THRESHOLD = 100 * 1024 * 1024  # Chunks files this large are uploaded as background jobs
+_db_upload_executor = ThreadPoolExecutor(max_workers=DB_UPLOAD_WORKERS, thread_name_prefix="db-upload")
+_db_upload_semaphore = asyncio.Semaphore(DB_UPLOAD_WORKERS)
+
+
+async def _run_db_upload(insert_fn, **kwargs):
+    async with _db_upload_semaphore:
+        return await asyncio.get_running_loop().run_in_executor(_db_upload_executor, functools.partial(insert_fn, **kwargs))
 
 
 @app.post("/upload_db") # Added decorator back
@@ -1054,32 +1695,27 @@ async def upload_db(
     qdrant_collection_name: str = Form(None)
 ): # path is now relative to UPLOAD_DIR
     absolute_processing_path = os.path.abspath(os.path.join(UPLOAD_DIR, path))
-    logger.info(f"/upload_db called with relative path: '{path}', resolved to absolute: '{absolute_processing_path}', db_choice: '{db_choice}'")
-    logger.info(f"Pinecone index: {pinecone_index_name}, namespace: {pinecone_namespace}, Weaviate class: {weaviate_class_name}, Qdrant collection: {qdrant_collection_name}")
+    logger.info("/upload_db called with relative path: '%s', resolved to absolute: '%s', db_choice: '%s'", path, absolute_processing_path, db_choice)
+    logger.info("Pinecone index: %s, namespace: %s, Weaviate class: %s, Qdrant collection: %s", pinecone_index_name, pinecone_namespace, weaviate_class_name, qdrant_collection_name)
 
     chunks_json = os.path.join(absolute_processing_path, f"{BASE_CHUNK_OUTPUT_NAME}_chunks_with_embeddings_sparse.json")
     if not os.path.exists(chunks_json):
-        logger.error(f"Chunks file not found for DB upload: {chunks_json}")
-        return JSONResponse(status_code=400, content={"error": f"Required chunks file not found: {chunks_json}"})
+        logger.error("Chunks file not found for DB upload: %s", chunks_json)
+        return ORJSONResponse(status_code=400, content={"error": f"Required chunks file not found: {chunks_json}"})
 
-    # Load credentials
-    env_path_relative = os.path.join(os.path.dirname(__file__), "..", ".env")
-    env_path_abs = os.path.abspath(env_path_relative)
+    # Load credentials (parsed once per .env change, see _read_env_file_cached)
+    env_path_abs = ENV_PATH
     
     current_env_vars = {}
     if os.path.exists(env_path_abs):
         try:
-            with open(env_path_abs, "r", encoding="utf-8") as f:
-                for line in f:
-                    if "=" in line and not line.strip().startswith("#"):
-                        k, v = line.strip().split("=", 1)
-                        current_env_vars[k.strip()] = v.strip()
-            logger.info(f"Loaded {len(current_env_vars)} credentials from {env_path_abs} for DB upload.")
+            current_env_vars = _read_env_file_cached(env_path_abs)
+            logger.info("Loaded %s credentials from %s for DB upload.", len(current_env_vars), env_path_abs)
         except Exception as e:
-            logger.error(f"Error reading .env file for DB upload: {str(e)}")
-            return JSONResponse(status_code=500, content={"error": f"Failed to read credentials for DB upload: {str(e)}"})
+            logger.error("Error reading .env file for DB upload: %s", e)
+            return ORJSONResponse(status_code=500, content={"error": f"Failed to read credentials for DB upload: {str(e)}"})
     else:
-        logger.warning(f".env file not found at {env_path_abs} for DB upload. Operations might fail if API keys are required.")
+        logger.warning(".env file not found at %s for DB upload. Operations might fail if API keys are required.", env_path_abs)
 
     # Import necessary functions from rad_vectordb.py
     # This assumes 'scripts' is in PYTHONPATH or accessible.
@@ -1087,206 +1723,252 @@ async def upload_db(
     try:
         from scripts.rad_vectordb import insert_to_pinecone, insert_to_weaviate_hybrid, insert_to_qdrant
     except ImportError as e:
-        logger.error(f"Failed to import vector DB functions: {e}. Ensure scripts directory is in PYTHONPATH.")
+        logger.error("Failed to import vector DB functions: %s. Ensure scripts directory is in PYTHONPATH.", e)
         # Attempt to add parent of scripts to sys.path if running from app dir
-        import sys
-        scripts_dir_parent = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-        if scripts_dir_parent not in sys.path:
-            sys.path.append(scripts_dir_parent)
+        if RAGPY_DIR not in sys.path:
+            sys.path.append(RAGPY_DIR)
         try:
             from scripts.rad_vectordb import insert_to_pinecone, insert_to_weaviate_hybrid, insert_to_qdrant
             logger.info("Successfully imported DB functions after sys.path modification.")
         except ImportError as e_retry:
-            logger.error(f"Still failed to import vector DB functions after sys.path modification: {e_retry}")
-            return JSONResponse(status_code=500, content={"error": f"Server configuration error: Cannot import DB scripts. {e_retry}"})
+            logger.error("Still failed to import vector DB functions after sys.path modification: %s", e_retry)
+            return ORJSONResponse(status_code=500, content={"error": f"Server configuration error: Cannot import DB scripts. {e_retry}"})
 
 
-    try:
-        if db_choice == "pinecone":
-            api_key = current_env_vars.get("PINECONE_API_KEY")
-            # PINECONE_ENV is typically handled by the Pinecone client library via environment variable
-            # or if the index is serverless, it might not be needed for pc.Index(index_name)
-            # The insert_to_pinecone function doesn't explicitly take PINECONE_ENV.
-            if not api_key:
-                return JSONResponse(status_code=400, content={"error": "Pinecone API Key not found in credentials."})
-            if not pinecone_index_name:
-                return JSONResponse(status_code=400, content={"error": "Pinecone Index Name is required."})
-            namespace_value = (pinecone_namespace or "").strip() or None
+    async def perform_upload() -> ORJSONResponse:
+        try:
+            if db_choice == "pinecone":
+                api_key = current_env_vars.get("PINECONE_API_KEY")
+                # PINECONE_ENV is typically handled by the Pinecone client library via environment variable
+                # or if the index is serverless, it might not be needed for pc.Index(index_name)
+                # The insert_to_pinecone function doesn't explicitly take PINECONE_ENV.
+                if not api_key:
+                    return ORJSONResponse(status_code=400, content={"error": "Pinecone API Key not found in credentials."})
+                if not pinecone_index_name:
+                    return ORJSONResponse(status_code=400, content={"error": "Pinecone Index Name is required."})
+                namespace_value = (pinecone_namespace or "").strip() or None
             
-            logger.info(f"Starting Pinecone upload to index: {pinecone_index_name}, namespace: {namespace_value} with file {chunks_json}")
-            pinecone_result = insert_to_pinecone( # Capture the result
-                embeddings_json_file=chunks_json,
-                index_name=pinecone_index_name,
-                pinecone_api_key=api_key,
-                namespace=namespace_value
-            )
-            # Use the status and message from pinecone_result for the response
-            if pinecone_result.get("status") == "success" or pinecone_result.get("status") == "success_partial_data":
-                logger.info(f"Pinecone upload successful/partially successful: {pinecone_result.get('message')}")
-                response_content = {
-                    "status": "success", # Simplified status for frontend if needed, or pass pinecone_result["status"]
-                    "message": pinecone_result.get("message", "Pinecone operation completed."),
-                    "inserted_count": pinecone_result.get("inserted_count", 0),
-                    "db_choice": db_choice,
-                    "namespace": namespace_value
-                }
-                logger.info(f"Returning 200 OK for Pinecone success: {response_content}")
-                return JSONResponse(response_content)
-            else: # Handle error or partial_error from insert_to_pinecone
-                logger.error(f"Pinecone upload failed or had issues: {pinecone_result.get('message')}")
-                return JSONResponse(status_code=500, content={ # Or a more appropriate status code
-                    "error": pinecone_result.get("message", "Pinecone operation failed."),
-                    "status": pinecone_result.get("status", "error"), # Pass along the specific status
-                    "inserted_count": pinecone_result.get("inserted_count", 0),
-                    "db_choice": db_choice,
-                    "namespace": namespace_value
-                })
-
-        elif db_choice == "weaviate":
-            api_key = current_env_vars.get("WEAVIATE_API_KEY")
-            url = current_env_vars.get("WEAVIATE_URL")
-            if not api_key or not url:
-                return JSONResponse(status_code=400, content={"error": "Weaviate API Key or URL not found in credentials."})
-            if not weaviate_class_name:
-                return JSONResponse(status_code=400, content={"error": "Weaviate Class Name is required."})
-            if not weaviate_tenant_name: # tenant_name is optional in function but good to ensure it's passed if provided
-                logger.warning("Weaviate Tenant Name not provided, using default if any in function.")
+                logger.info("Starting Pinecone upload to index: %s, namespace: %s with file %s", pinecone_index_name, namespace_value, chunks_json)
+                pinecone_result = await _run_db_upload(insert_to_pinecone, # Capture the result
+                    embeddings_json_file=chunks_json,
+                    index_name=pinecone_index_name,
+                    pinecone_api_key=api_key,
+                    namespace=namespace_value
+                )
+                # Use the status and message from pinecone_result for the response
+                if pinecone_result.get("status") == "success" or pinecone_result.get("status") == "success_partial_data":
+                    logger.info("Pinecone upload successful/partially successful: %s", pinecone_result.get('message'))
+                    response_content = {
+                        "status": "success", # Simplified status for frontend if needed, or pass pinecone_result["status"]
+                        "message": pinecone_result.get("message", "Pinecone operation completed."),
+                        "inserted_count": pinecone_result.get("inserted_count", 0),
+                        "db_choice": db_choice,
+                        "namespace": namespace_value
+                    }
+                    logger.info("Returning 200 OK for Pinecone success: %s", response_content)
+                    return ORJSONResponse(response_content)
+                else: # Handle error or partial_error from insert_to_pinecone
+                    logger.error("Pinecone upload failed or had issues: %s", pinecone_result.get('message'))
+                    return ORJSONResponse(status_code=500, content={ # Or a more appropriate status code
+                        "error": pinecone_result.get("message", "Pinecone operation failed."),
+                        "status": pinecone_result.get("status", "error"), # Pass along the specific status
+                        "inserted_count": pinecone_result.get("inserted_count", 0),
+                        "db_choice": db_choice,
+                        "namespace": namespace_value
+                    })
+
+            elif db_choice == "weaviate":
+                api_key = current_env_vars.get("WEAVIATE_API_KEY")
+                url = current_env_vars.get("WEAVIATE_URL")
+                if not api_key or not url:
+                    return ORJSONResponse(status_code=400, content={"error": "Weaviate API Key or URL not found in credentials."})
+                if not weaviate_class_name:
+                    return ORJSONResponse(status_code=400, content={"error": "Weaviate Class Name is required."})
+                if not weaviate_tenant_name: # tenant_name is optional in function but good to ensure it's passed if provided
+                    logger.warning("Weaviate Tenant Name not provided, using default if any in function.")
             
-            logger.info(f"Starting Weaviate upload to URL: {url}, Class: {weaviate_class_name}, Tenant: {weaviate_tenant_name or 'default'}")
-            inserted_count = insert_to_weaviate_hybrid( # Capture result
-                embeddings_json_file=chunks_json,
-                url=url,
-                api_key=api_key,
-                class_name=weaviate_class_name,
-                tenant_name=weaviate_tenant_name
-            )
-            # insert_to_weaviate_hybrid returns an int (count) or 0 on error
-            if inserted_count > 0:
-                status_message = f"Weaviate upload successful. {inserted_count} items inserted."
-                logger.info(status_message)
-                response_content = {
-                    "status": "success", 
-                    "message": status_message,
-                    "inserted_count": inserted_count,
-                    "db_choice": db_choice
-                }
-                logger.info(f"Returning 200 OK for Weaviate success: {response_content}")
-                return JSONResponse(response_content)
+                logger.info("Starting Weaviate upload to URL: %s, Class: %s, Tenant: %s", url, weaviate_class_name, weaviate_tenant_name or 'default')
+                inserted_count = await _run_db_upload(insert_to_weaviate_hybrid, # Capture result
+                    embeddings_json_file=chunks_json,
+                    url=url,
+                    api_key=api_key,
+                    class_name=weaviate_class_name,
+                    tenant_name=weaviate_tenant_name
+                )
+                # insert_to_weaviate_hybrid returns an int (count) or 0 on error
+                if inserted_count > 0:
+                    status_message = f"Weaviate upload successful. {inserted_count} items inserted."
+                    logger.info(status_message)
+                    response_content = {
+                        "status": "success", 
+                        "message": status_message,
+                        "inserted_count": inserted_count,
+                        "db_choice": db_choice
+                    }
+                    logger.info("Returning 200 OK for Weaviate success: %s", response_content)
+                    return ORJSONResponse(response_content)
+                else:
+                    # This path is taken if file not found, or major error in setup, or 0 items inserted from a valid file.
+                    # The function insert_to_weaviate_hybrid prints its own errors.
+                    status_message = f"Weaviate upload to class '{weaviate_class_name}' (tenant: '{weaviate_tenant_name or 'default'}') completed, but 0 items were inserted. Check server logs for details."
+                    logger.warning(status_message) # It might not be a full error if the file was empty but processed.
+                    response_content = {
+                        "status": "warning", # Or "error" depending on how strict we want to be
+                        "message": status_message,
+                        "inserted_count": 0,
+                        "db_choice": db_choice
+                    }
+                    logger.info("Returning 200 OK for Weaviate (0 inserted): %s", response_content)
+                    return ORJSONResponse(status_code=200, content=response_content)
+
+
+            elif db_choice == "qdrant":
+                api_key = current_env_vars.get("QDRANT_API_KEY") # Can be None for local/unsecured
+                url = current_env_vars.get("QDRANT_URL")
+                if not url: # URL is essential
+                    return ORJSONResponse(status_code=400, content={"error": "Qdrant URL not found in credentials."})
+                if not qdrant_collection_name:
+                    return ORJSONResponse(status_code=400, content={"error": "Qdrant Collection Name is required."})
+
+                logger.info("Starting Qdrant upload to URL: %s, Collection: %s", url, qdrant_collection_name)
+                inserted_count = await _run_db_upload(insert_to_qdrant, # Capture result
+                    embeddings_json_file=chunks_json,
+                    collection_name=qdrant_collection_name,
+                    qdrant_url=url,
+                    qdrant_api_key=api_key
+                )
+                # insert_to_qdrant returns an int (count) or 0 on error
+                if inserted_count > 0:
+                    status_message = f"Qdrant upload successful. {inserted_count} items inserted."
+                    logger.info(status_message)
+                    response_content = {
+                        "status": "success",
+                        "message": status_message,
+                        "inserted_count": inserted_count,
+                        "db_choice": db_choice
+                    }
+                    logger.info("Returning 200 OK for Qdrant success: %s", response_content)
+                    return ORJSONResponse(response_content)
+                else:
+                    status_message = f"Qdrant upload to collection '{qdrant_collection_name}' completed, but 0 items were inserted. Check server logs for details."
+                    logger.warning(status_message)
+                    response_content = {
+                        "status": "warning", 
+                        "message": status_message,
+                        "inserted_count": 0,
+                        "db_choice": db_choice
+                    }
+                    logger.info("Returning 200 OK for Qdrant (0 inserted): %s", response_content)
+                    return ORJSONResponse(status_code=200, content=response_content)
             else:
-                # This path is taken if file not found, or major error in setup, or 0 items inserted from a valid file.
-                # The function insert_to_weaviate_hybrid prints its own errors.
-                status_message = f"Weaviate upload to class '{weaviate_class_name}' (tenant: '{weaviate_tenant_name or 'default'}') completed, but 0 items were inserted. Check server logs for details."
-                logger.warning(status_message) # It might not be a full error if the file was empty but processed.
-                response_content = {
-                    "status": "warning", # Or "error" depending on how strict we want to be
-                    "message": status_message,
-                    "inserted_count": 0,
-                    "db_choice": db_choice
-                }
-                logger.info(f"Returning 200 OK for Weaviate (0 inserted): {response_content}")
-                return JSONResponse(status_code=200, content=response_content)
-
-
-        elif db_choice == "qdrant":
-            api_key = current_env_vars.get("QDRANT_API_KEY") # Can be None for local/unsecured
-            url = current_env_vars.get("QDRANT_URL")
-            if not url: # URL is essential
-                return JSONResponse(status_code=400, content={"error": "Qdrant URL not found in credentials."})
-            if not qdrant_collection_name:
-                return JSONResponse(status_code=400, content={"error": "Qdrant Collection Name is required."})
-
-            logger.info(f"Starting Qdrant upload to URL: {url}, Collection: {qdrant_collection_name}")
-            inserted_count = insert_to_qdrant( # Capture result
-                embeddings_json_file=chunks_json,
-                collection_name=qdrant_collection_name,
-                qdrant_url=url,
-                qdrant_api_key=api_key
-            )
-            # insert_to_qdrant returns an int (count) or 0 on error
-            if inserted_count > 0:
-                status_message = f"Qdrant upload successful. {inserted_count} items inserted."
-                logger.info(status_message)
-                response_content = {
-                    "status": "success",
-                    "message": status_message,
-                    "inserted_count": inserted_count,
-                    "db_choice": db_choice
-                }
-                logger.info(f"Returning 200 OK for Qdrant success: {response_content}")
-                return JSONResponse(response_content)
-            else:
-                status_message = f"Qdrant upload to collection '{qdrant_collection_name}' completed, but 0 items were inserted. Check server logs for details."
-                logger.warning(status_message)
-                response_content = {
-                    "status": "warning", 
-                    "message": status_message,
-                    "inserted_count": 0,
-                    "db_choice": db_choice
-                }
-                logger.info(f"Returning 200 OK for Qdrant (0 inserted): {response_content}")
-                return JSONResponse(status_code=200, content=response_content)
-        else:
-            logger.error(f"Invalid DB choice: {db_choice}")
-            return JSONResponse(status_code=400, content={"error": "Invalid database choice."})
+                logger.error("Invalid DB choice: %s", db_choice)
+                return ORJSONResponse(status_code=400, content={"error": "Invalid database choice."})
 
-        # This part of the original code is now largely unreachable due to returns within each db_choice block.
-        # Kept for safety, but ideally refactor to ensure all paths return explicitly.
-        # logger.info(f"DB upload process completed for {db_choice}.") # This log might be misleading now
-        # return JSONResponse({"status": status_message, "db_choice": db_choice}) # status_message might be from the last successful DB type
+            # This part of the original code is now largely unreachable due to returns within each db_choice block.
+            # Kept for safety, but ideally refactor to ensure all paths return explicitly.
+            # logger.info(f"DB upload process completed for {db_choice}.") # This log might be misleading now
+            # return ORJSONResponse({"status": status_message, "db_choice": db_choice}) # status_message might be from the last successful DB type
+
+        except ValueError as ve: # Catch specific ValueErrors from the DB functions (e.g. missing keys, bad URL)
+            logger.error("ValueError during DB upload for %s: %s", db_choice, ve)
+            return ORJSONResponse(status_code=400, content={"error": f"Configuration error for {db_choice}: {str(ve)}"})
+        except Exception as e:
+            logger.error("An unexpected error occurred during DB upload for %s: %s", db_choice, e, exc_info=True)
+            return ORJSONResponse(status_code=500, content={"error": f"An unexpected error occurred during {db_choice} upload.", "details": str(e)})
+
+    if os.path.getsize(chunks_json) >= DB_UPLOAD_JOB_THRESHOLD:
+        # Large uploads run as a background job; the client polls /upload_db/status/{job_id}
+        job_id = _start_job(perform_upload)
+        logger.info("DB upload for %s queued as background job %s", chunks_json, job_id)
+        return _accepted(job_id, f"Upload running in the background. Poll /upload_db/status/{job_id} for the result.", db_choice=db_choice)
+    return await perform_upload()
+
+
+@app.get("/upload_db/status/{job_id}")
+async def upload_db_status(job_id: str):
+    return _job_result(job_id, "DB upload job")
+
+
+# Chunk/embedding JSON and CSV artifacts compress several times over (repeated keys, text)
+ZSTD_LEVEL = 3
+ZSTD_MIN_SIZE = 64 * 1024  # Smaller files are sent as is
+ZSTD_SUFFIXES = (".json", ".csv", ".txt", ".log")
+
+
+def _accepts_encoding(request: Request, encoding: str) -> bool:
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.partition(";")
+        if name.strip().lower() == encoding:
+            return params.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def _iter_zstd(file_path: str):
+    """Compress a file as a multi-threaded zstd frame, 1 MiB at a time (run in the threadpool)."""
+    compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1)
+    with open(file_path, "rb") as f, compressor.stream_reader(f) as reader:
+        while chunk := reader.read(DownloadFileResponse.chunk_size):
+            yield chunk
 
-    except ValueError as ve: # Catch specific ValueErrors from the DB functions (e.g. missing keys, bad URL)
-        logger.error(f"ValueError during DB upload for {db_choice}: {str(ve)}")
-        return JSONResponse(status_code=400, content={"error": f"Configuration error for {db_choice}: {str(ve)}"})
-    except Exception as e:
-        logger.error(f"An unexpected error occurred during DB upload for {db_choice}: {str(e)}", exc_info=True)
-        return JSONResponse(status_code=500, content={"error": f"An unexpected error occurred during {db_choice} upload.", "details": str(e)})
 
 @app.get("/download_file")
-async def download_file(session_path: str = Query(...), filename: str = Query(...)):
+async def download_file(request: Request, session_path: str = Query(...), filename: str = Query(...)):
     """
     Allows downloading a file from a session directory.
     session_path: The relative path of the session within UPLOAD_DIR.
     filename: The name of the file to download.
     """
-    logger.info(f"Download request for session_path='{session_path}', filename='{filename}'")
+    logger.info("Download request for session_path='%s', filename='%s'", session_path, filename)
     
     # Construct the full, absolute path to the file
     # UPLOAD_DIR is the absolute path to the main uploads directory
     # session_path is relative to UPLOAD_DIR (e.g., "unique_id_original_filename")
     # filename is the name of the file within that session directory
     
-    # Basic security: prevent path traversal attacks in filename and session_path
-    if ".." in filename or "/" in filename or "\\" in filename:
-        logger.error(f"Invalid characters in filename: {filename}")
-        return JSONResponse(status_code=400, content={"error": "Invalid filename."})
-    if ".." in session_path: # session_path can contain subdirs, but not '..'
-        logger.error(f"Invalid characters in session_path: {session_path}")
-        return JSONResponse(status_code=400, content={"error": "Invalid session path."})
-
-    # Normalize paths to prevent issues and ensure they are within UPLOAD_DIR
-    # Create the base session directory path
-    base_session_dir = os.path.abspath(os.path.join(UPLOAD_DIR, session_path))
-    
-    # Create the full file path
-    file_path_abs = os.path.abspath(os.path.join(base_session_dir, filename))
+    # filename must be a plain file name; session_path may contain subdirectories
+    if "/" in filename or "\\" in filename:
+        logger.error("Invalid characters in filename: %s", filename)
+        return ORJSONResponse(status_code=400, content={"error": "Invalid filename."})
 
-    # Security check: Ensure the resolved file_path_abs is still within UPLOAD_DIR
-    # This is crucial to prevent accessing files outside the intended scope.
-    # os.path.commonpath can be used, or check if UPLOAD_DIR is a prefix of file_path_abs.
-    # Note: os.path.commonprefix is not suitable for path validation.
-    
-    # Ensure UPLOAD_DIR is absolute and normalized for comparison
-    normalized_upload_dir = os.path.abspath(UPLOAD_DIR)
-    
-    if not file_path_abs.startswith(normalized_upload_dir):
-        logger.error(f"Attempt to access file outside UPLOAD_DIR. Requested: '{file_path_abs}', UPLOAD_DIR: '{normalized_upload_dir}'")
-        return JSONResponse(status_code=403, content={"error": "Access denied: File is outside the allowed directory."})
-
-    if not os.path.exists(file_path_abs) or not os.path.isfile(file_path_abs):
-        logger.error(f"File not found or is not a file: {file_path_abs}")
-        return JSONResponse(status_code=404, content={"error": "File not found."})
-
-    logger.info(f"Serving file: {file_path_abs}")
-    # Use FileResponse to send the file
-    # The `filename` parameter in FileResponse sets the name for the download dialog.
-    return FileResponse(path=file_path_abs, filename=filename, media_type='application/octet-stream')
+    # resolve() collapses '..' and follows symlinks, so the containment check sees the real target.
+    # Containment is checked before existence, so a 404 never reveals files outside UPLOAD_DIR.
+    try:
+        file_path = (NORMALIZED_UPLOAD_DIR / session_path / filename).resolve()
+    except (OSError, RuntimeError):  # Symlink loop
+        logger.error("Could not resolve %s/%s", session_path, filename)
+        return ORJSONResponse(status_code=404, content={"error": "File not found."})
+    if not file_path.is_relative_to(NORMALIZED_UPLOAD_DIR):
+        logger.error("Attempt to access file outside UPLOAD_DIR. Requested: '%s', UPLOAD_DIR: '%s'", file_path, NORMALIZED_UPLOAD_DIR)
+        return ORJSONResponse(status_code=403, content={"error": "Access denied: File is outside the allowed directory."})
+
+    file_path_abs = str(file_path)
+    try:
+        stat_result = file_path.stat()
+    except OSError:  # Missing, or not readable by the server
+        stat_result = None
+    if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+        logger.error("File not found or is not a file: %s", file_path_abs)
+        return ORJSONResponse(status_code=404, content={"error": "File not found."})
+
+    # The `filename` parameter sets the name for the download dialog; media type is guessed from it
+    response = DownloadFileResponse(path=file_path_abs, filename=filename, stat_result=stat_result)
+    compress = (
+        ZSTD_AVAILABLE
+        and stat_result.st_size >= ZSTD_MIN_SIZE
+        and filename.lower().endswith(ZSTD_SUFFIXES)
+    )
+    if compress:
+        response.headers["vary"] = "Accept-Encoding"
+    if response.is_not_modified(request):
+        logger.info("File not modified, answering 304: %s", file_path_abs)
+        return Response(status_code=304, headers={k: response.headers[k] for k in ("etag", "last-modified", "vary") if k in response.headers})
+
+    if compress and _accepts_encoding(request, "zstd"):
+        logger.info("Serving file zstd-compressed: %s", file_path_abs)
+        # The compressed length is unknown upfront (chunked body), and the ETag names the raw file
+        headers = {k: response.headers[k] for k in ("content-disposition", "last-modified", "vary")}
+        headers["content-encoding"] = "zstd"
+        return StreamingResponse(_iter_zstd(file_path_abs), media_type=response.media_type, headers=headers)
+
+    logger.info("Serving file: %s", file_path_abs)
+    return response
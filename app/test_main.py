@@ -3,6 +3,7 @@ from unittest.mock import patch, MagicMock
 import os
 import sys
 import json # <--- Added import json
+import tempfile
 from fastapi.testclient import TestClient
 
 # Add the 'ragpy' directory to sys.path to allow 'from app.main import app'
@@ -11,48 +12,41 @@ from fastapi.testclient import TestClient
 # Or, more robustly, go up two levels from this file's dir to reach __RAG, then down to ragpy.
 current_file_dir = os.path.dirname(os.path.abspath(__file__))
 ragpy_dir = os.path.dirname(current_file_dir) # This should be __RAG/ragpy
-project_root_dir = os.path.dirname(ragpy_dir) # This should be __RAG
 
 # Add __RAG/ragpy to sys.path for 'from app.main import app'
 if ragpy_dir not in sys.path:
     sys.path.insert(0, ragpy_dir)
 
-# Add __RAG (project root) to sys.path for 'from scripts.rad_vectordb import ...'
-# This allows 'scripts.rad_vectordb' to be found if 'ragpy' is the top-level package for scripts.
-# However, the imports in main.py are 'from scripts.rad_vectordb', implying 'ragpy' is already a package root.
-# Let's ensure the directory containing 'scripts' is discoverable.
-# If main.py is in app/, and it does 'from scripts.rad_vectordb', then 'ragpy' (parent of app and scripts)
-# must be in PYTHONPATH or be the CWD.
-# For testing, we can add 'ragpy' to the path.
-if ragpy_dir not in sys.path: # If ragpy_dir is /path/to/__RAG/ragpy
-    sys.path.insert(0, ragpy_dir)
-
-
-try:
-    from app.main import app
-except ModuleNotFoundError as e:
-    print(f"Failed to import app from app.main. Current sys.path: {sys.path}")
-    print(f"Error: {e}")
-    # If app is in the same directory as test_main.py, this should work.
-    # If main.py is in ragpy/app/ and test_main.py is also in ragpy/app/
-    # then 'from main import app' might be needed if 'app' is not a package.
-    # Given the structure, 'from app.main import app' implies 'ragpy' is a root.
-    raise
+from app.main import app
+import app.main as main_module
 
-client = TestClient(app)
-
-# Dummy path for uploads, ensure it exists for tests that need it
-TEST_UPLOAD_PATH = os.path.join(project_root_dir, "ragpy", "test_uploads_temp")
 TEST_CHUNKS_JSON_FILENAME = "output_chunks_with_embeddings_sparse.json"
-TEST_CHUNKS_JSON_FULLPATH = os.path.join(TEST_UPLOAD_PATH, TEST_CHUNKS_JSON_FILENAME)
+TEST_ENV_PATH = os.path.join(ragpy_dir, ".env.test_main") # Patched in as app.main.ENV_PATH
 
 
 class TestMainApp(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
+        # Patched once for the whole class (mocks are reset in setUp) rather than per test
+        cls._patchers = [
+            patch('app.main.ENV_PATH', TEST_ENV_PATH), # To control where .env is looked for
+            patch('scripts.rad_vectordb.insert_to_pinecone'), # Patching at source
+            patch('scripts.rad_vectordb.insert_to_weaviate_hybrid'),
+            patch('scripts.rad_vectordb.insert_to_qdrant'),
+        ]
+        cls.addClassCleanup(lambda: [p.stop() for p in cls._patchers])
+        _, cls.mock_insert_pinecone, cls.mock_insert_weaviate, cls.mock_insert_qdrant = (
+            p.start() for p in cls._patchers
+        )
+        cls._mocks = [cls.mock_insert_pinecone, cls.mock_insert_weaviate, cls.mock_insert_qdrant]
+
+        # One client (and app lifespan) for the whole class
+        cls.client = TestClient(app)
+        cls.client.__enter__()
+
         # Create a dummy .env file for testing credential loading
-        cls.test_env_path = os.path.join(ragpy_dir, ".env.test_main")
+        cls.test_env_path = TEST_ENV_PATH
         with open(cls.test_env_path, "w") as f:
             f.write("PINECONE_API_KEY=test_pinecone_key\n")
             f.write("WEAVIATE_API_KEY=test_weaviate_key\n")
@@ -60,39 +54,43 @@ class TestMainApp(unittest.TestCase):
             f.write("QDRANT_API_KEY=test_qdrant_key\n")
             f.write("QDRANT_URL=http://testqdrant.url\n")
         
-        # Create a dummy chunks file
-        os.makedirs(TEST_UPLOAD_PATH, exist_ok=True)
-        with open(TEST_CHUNKS_JSON_FULLPATH, "w") as f:
+        # Dummy upload dir with a chunks file; a fresh temp dir per run, removed with its contents
+        cls._tmpdir = tempfile.TemporaryDirectory(prefix="ragpy_test_")
+        cls.TEST_UPLOAD_PATH = cls._tmpdir.name
+        cls.TEST_CHUNKS_JSON_FULLPATH = os.path.join(cls.TEST_UPLOAD_PATH, TEST_CHUNKS_JSON_FILENAME)
+        with open(cls.TEST_CHUNKS_JSON_FULLPATH, "w") as f:
             json.dump([{"id": "test_chunk", "embedding": [0.1, 0.2]}], f)
 
+        # A .env without PINECONE_API_KEY
+        cls.test_env_no_pinecone_path = os.path.join(cls.TEST_UPLOAD_PATH, ".env.test_main_no_pc")
+        with open(cls.test_env_no_pinecone_path, "w") as f:
+            f.write("OTHER_KEY=some_value\n")
+
 
     @classmethod
     def tearDownClass(cls):
         if os.path.exists(cls.test_env_path):
             os.remove(cls.test_env_path)
-        if os.path.exists(TEST_CHUNKS_JSON_FULLPATH):
-            os.remove(TEST_CHUNKS_JSON_FULLPATH)
-        if os.path.exists(TEST_UPLOAD_PATH):
-            os.rmdir(TEST_UPLOAD_PATH)
+        cls._tmpdir.cleanup()
+        cls.client.__exit__(None, None, None)
 
 
-    def _get_mock_env_path(self):
-        # This function will be used by the patch to return our test .env path
-        return self.test_env_path
+    def setUp(self):
+        # .env contents are cached by path/mtime; start each test from a cold cache
+        main_module._invalidate_env_cache()
+        for mock in self._mocks:
+            mock.reset_mock(return_value=True, side_effect=True)
 
-    @patch('scripts.rad_vectordb.insert_to_pinecone') # Patching at source
-    @patch('os.path.abspath') # To control where .env is looked for
-    def test_upload_db_pinecone_success(self, mock_abspath, mock_insert_pinecone):
-        mock_abspath.side_effect = lambda path: self._get_mock_env_path() if ".env" in path else os.path.normpath(path)
+    def test_upload_db_pinecone_success(self):
         
-        mock_insert_pinecone.return_value = {
+        self.mock_insert_pinecone.return_value = {
             "status": "success",
             "message": "Pinecone upload successful.",
             "inserted_count": 10
         }
 
-        response = client.post("/upload_db", data={
-            "path": TEST_UPLOAD_PATH,
+        response = self.client.post("/upload_db", data={
+            "path": self.TEST_UPLOAD_PATH,
             "db_choice": "pinecone",
             "pinecone_index_name": "test_index"
         })
@@ -102,24 +100,21 @@ class TestMainApp(unittest.TestCase):
         self.assertEqual(json_response["message"], "Pinecone upload successful.")
         self.assertEqual(json_response["inserted_count"], 10)
         self.assertEqual(json_response["db_choice"], "pinecone")
-        mock_insert_pinecone.assert_called_once_with(
-            embeddings_json_file=TEST_CHUNKS_JSON_FULLPATH,
+        self.mock_insert_pinecone.assert_called_once_with(
+            embeddings_json_file=self.TEST_CHUNKS_JSON_FULLPATH,
             index_name="test_index",
             pinecone_api_key="test_pinecone_key"
         )
 
-    @patch('scripts.rad_vectordb.insert_to_pinecone') # Patching at source
-    @patch('os.path.abspath')
-    def test_upload_db_pinecone_script_error(self, mock_abspath, mock_insert_pinecone):
-        mock_abspath.side_effect = lambda path: self._get_mock_env_path() if ".env" in path else os.path.normpath(path)
+    def test_upload_db_pinecone_script_error(self):
         
-        mock_insert_pinecone.return_value = {
+        self.mock_insert_pinecone.return_value = {
             "status": "error",
             "message": "Pinecone script internal error.",
             "inserted_count": 0
         }
-        response = client.post("/upload_db", data={
-            "path": TEST_UPLOAD_PATH,
+        response = self.client.post("/upload_db", data={
+            "path": self.TEST_UPLOAD_PATH,
             "db_choice": "pinecone",
             "pinecone_index_name": "test_index"
         })
@@ -129,21 +124,17 @@ class TestMainApp(unittest.TestCase):
         self.assertEqual(json_response["error"], "Pinecone script internal error.")
         self.assertEqual(json_response["inserted_count"], 0)
 
-    @patch('os.path.abspath')
-    def test_upload_db_pinecone_missing_index_name(self, mock_abspath):
-        mock_abspath.side_effect = lambda path: self._get_mock_env_path() if ".env" in path else os.path.normpath(path)
-        response = client.post("/upload_db", data={
-            "path": TEST_UPLOAD_PATH,
+    def test_upload_db_pinecone_missing_index_name(self):
+        response = self.client.post("/upload_db", data={
+            "path": self.TEST_UPLOAD_PATH,
             "db_choice": "pinecone"
             # pinecone_index_name is missing
         })
         self.assertEqual(response.status_code, 400)
         self.assertIn("Pinecone Index Name is required", response.json()["error"])
 
-    @patch('os.path.abspath')
-    def test_upload_db_chunks_file_not_found(self, mock_abspath):
-        mock_abspath.side_effect = lambda path: self._get_mock_env_path() if ".env" in path else os.path.normpath(path)
-        response = client.post("/upload_db", data={
+    def test_upload_db_chunks_file_not_found(self):
+        response = self.client.post("/upload_db", data={
             "path": "/non/existent/path", # This path won't have the chunks file
             "db_choice": "pinecone",
             "pinecone_index_name": "test_index"
@@ -151,16 +142,11 @@ class TestMainApp(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn("Required chunks file not found", response.json()["error"])
 
-    @patch('os.path.abspath')
-    def test_upload_db_pinecone_missing_api_key(self, mock_abspath):
-        # Simulate .env file without PINECONE_API_KEY
-        temp_env_content = "OTHER_KEY=some_value\n"
-        with patch('builtins.open', unittest.mock.mock_open(read_data=temp_env_content)) as mock_open_env:
-            # Ensure abspath still points to a "valid" .env for the open mock to be used
-            mock_abspath.side_effect = lambda path: self._get_mock_env_path() if ".env" in path else os.path.normpath(path)
-            
-            response = client.post("/upload_db", data={
-                "path": TEST_UPLOAD_PATH,
+    def test_upload_db_pinecone_missing_api_key(self):
+        # Point the app at the .env file without PINECONE_API_KEY
+        with patch.object(main_module, "ENV_PATH", self.test_env_no_pinecone_path):
+            response = self.client.post("/upload_db", data={
+                "path": self.TEST_UPLOAD_PATH,
                 "db_choice": "pinecone",
                 "pinecone_index_name": "test_index"
             })
@@ -168,14 +154,11 @@ class TestMainApp(unittest.TestCase):
         self.assertIn("Pinecone API Key not found in credentials", response.json()["error"])
 
     # Example for Weaviate - can be expanded
-    @patch('scripts.rad_vectordb.insert_to_weaviate_hybrid') # Patching at source
-    @patch('os.path.abspath')
-    def test_upload_db_weaviate_success(self, mock_abspath, mock_insert_weaviate):
-        mock_abspath.side_effect = lambda path: self._get_mock_env_path() if ".env" in path else os.path.normpath(path)
-        mock_insert_weaviate.return_value = 5 # Returns count of inserted items
-
-        response = client.post("/upload_db", data={
-            "path": TEST_UPLOAD_PATH,
+    def test_upload_db_weaviate_success(self):
+        self.mock_insert_weaviate.return_value = 5 # Returns count of inserted items
+
+        response = self.client.post("/upload_db", data={
+            "path": self.TEST_UPLOAD_PATH,
             "db_choice": "weaviate",
             "weaviate_class_name": "TestClass",
             "weaviate_tenant_name": "test_tenant"
@@ -185,8 +168,8 @@ class TestMainApp(unittest.TestCase):
         self.assertEqual(json_response["status"], "success")
         self.assertIn("Weaviate upload successful. 5 items inserted.", json_response["message"])
         self.assertEqual(json_response["inserted_count"], 5)
-        mock_insert_weaviate.assert_called_once_with(
-            embeddings_json_file=TEST_CHUNKS_JSON_FULLPATH,
+        self.mock_insert_weaviate.assert_called_once_with(
+            embeddings_json_file=self.TEST_CHUNKS_JSON_FULLPATH,
             url="http://testweaviate.url",
             api_key="test_weaviate_key",
             class_name="TestClass",
@@ -194,14 +177,11 @@ class TestMainApp(unittest.TestCase):
         )
 
     # Example for Qdrant - can be expanded
-    @patch('scripts.rad_vectordb.insert_to_qdrant') # Patching at source
-    @patch('os.path.abspath')
-    def test_upload_db_qdrant_success(self, mock_abspath, mock_insert_qdrant):
-        mock_abspath.side_effect = lambda path: self._get_mock_env_path() if ".env" in path else os.path.normpath(path)
-        mock_insert_qdrant.return_value = 3 # Returns count
-
-        response = client.post("/upload_db", data={
-            "path": TEST_UPLOAD_PATH,
+    def test_upload_db_qdrant_success(self):
+        self.mock_insert_qdrant.return_value = 3 # Returns count
+
+        response = self.client.post("/upload_db", data={
+            "path": self.TEST_UPLOAD_PATH,
             "db_choice": "qdrant",
             "qdrant_collection_name": "test_collection"
         })
@@ -210,13 +190,62 @@ class TestMainApp(unittest.TestCase):
         self.assertEqual(json_response["status"], "success")
         self.assertIn("Qdrant upload successful. 3 items inserted.", json_response["message"])
         self.assertEqual(json_response["inserted_count"], 3)
-        mock_insert_qdrant.assert_called_once_with(
-            embeddings_json_file=TEST_CHUNKS_JSON_FULLPATH,
+        self.mock_insert_qdrant.assert_called_once_with(
+            embeddings_json_file=self.TEST_CHUNKS_JSON_FULLPATH,
             collection_name="test_collection",
             qdrant_url="http://testqdrant.url",
             qdrant_api_key="test_qdrant_key"
         )
 
+    def test_job_result_is_kept_for_every_poller(self):
+        async def start():
+            async def run():
+                return main_module.ORJSONResponse({"done": True})
+            return main_module._start_job(run)
+
+        job_id = self.client.portal.call(start)
+        with self.client.websocket_connect(f"/jobs/{job_id}/ws") as websocket:
+            self.assertEqual(json.loads(websocket.receive_text())["content"], {"done": True})
+        # The WebSocket reader did not consume the result: pollers still get it
+        for _ in range(2):
+            response = self.client.get(f"/jobs/{job_id}")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), {"done": True})
+
+    def test_save_credentials_keeps_unrelated_env_lines(self):
+        with open(self.test_env_path) as f:
+            original = f.read()
+
+        def restore():
+            with open(self.test_env_path, "w") as f:
+                f.write(original)
+        self.addCleanup(restore)
+        with open(self.test_env_path, "a") as f:
+            f.write("# comment\nexport HTTPS_PROXY=http://proxy:3128\nmy.key = a=b\n")
+
+        response = self.client.post("/save_credentials", json={"OPENAI_API_KEY": "sk-test"})
+        self.assertEqual(response.status_code, 200)
+        env_vars = main_module._read_env_file(self.test_env_path)
+        self.assertEqual(env_vars["export HTTPS_PROXY"], "http://proxy:3128")
+        self.assertEqual(env_vars["my.key"], "a=b")
+        self.assertEqual(env_vars["OPENAI_API_KEY"], "sk-test")
+        self.assertEqual(env_vars["PINECONE_API_KEY"], "test_pinecone_key")
+
+    def test_download_file_checks_containment_before_existence(self):
+        with tempfile.TemporaryDirectory(dir=main_module.NORMALIZED_UPLOAD_DIR) as session_dir:
+            session = os.path.basename(session_dir)
+            with open(os.path.join(session_dir, "output.csv"), "w") as f:
+                f.write("a,b\n")
+
+            def download(session_path, filename):
+                return self.client.get("/download_file", params={"session_path": session_path, "filename": filename})
+
+            self.assertEqual(download(session, "output.csv").status_code, 200)
+            self.assertEqual(download(session, "missing.csv").status_code, 404)
+            # Outside UPLOAD_DIR: denied whether or not the file exists
+            self.assertEqual(download("..", "README.md").status_code, 403)
+            self.assertEqual(download("..", "missing.md").status_code, 403)
+
 if __name__ == "__main__":
     # Adjust sys.path for standalone execution if necessary
     # This setup is primarily for running with `python -m unittest ragpy.app.test_main`
@@ -5,41 +5,167 @@ This module generates structured reading notes using LLM APIs (OpenAI or OpenRou
 and includes unique sentinels for idempotence.
 """
 
+import asyncio
 import os
-import uuid
+import re
+import secrets
+import functools
+import hashlib
 import logging
+import threading
 import html as html_module
+from dataclasses import dataclass
+from string import Template
 from typing import Dict, Tuple, Optional
-from openai import OpenAI
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Optional: budget the short-mode text in tokens (what the model is billed on) rather than characters
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# Optional: persistent cache of generated notes (RAGPY_LLM_CACHE=1)
+try:
+    import diskcache
+    DISKCACHE_AVAILABLE = True
+except ImportError:
+    DISKCACHE_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
-# Sentinel prefix for idempotence
+# Sentinel prefix for idempotence; the ID is 16 hex chars (older notes carry a hyphenated UUID)
 SENTINEL_PREFIX = "ragpy-note-id:"
+SENTINEL_ID_BYTES = 8
+_SENTINEL_RE = re.compile(rf"<!--\s*({re.escape(SENTINEL_PREFIX)}[a-f0-9][a-f0-9\-]*)\s*-->")
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
 
-# Load environment variables
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_DEFAULT_MODEL = os.getenv("OPENROUTER_DEFAULT_MODEL", "gpt-4o-mini")
+@dataclass(frozen=True)
+class LLMConfig:
+    """LLM settings read from the environment (and .env)."""
+    openai_api_key: Optional[str]
+    openrouter_api_key: Optional[str]
+    default_model: str
+    concurrency: int  # Concurrent requests per provider of the async API
+    note_cache: bool  # Reuse the stored output of identical LLM requests
+    note_cache_dir: str
 
-# Initialize clients
-openai_client = None
-openrouter_client = None
 
-if OPENAI_API_KEY:
-    openai_client = OpenAI(api_key=OPENAI_API_KEY)
-    logger.info("OpenAI client initialized for note generation")
+@functools.lru_cache(maxsize=1)
+def get_config() -> LLMConfig:
+    """
+    Load .env and read the LLM settings once; the result is cached.
 
-if OPENROUTER_API_KEY:
-    openrouter_client = OpenAI(
-        api_key=OPENROUTER_API_KEY,
-        base_url="https://openrouter.ai/api/v1"
+    reset_clients() (or get_config.cache_clear()) makes the next call read them again.
+    """
+    load_dotenv()
+    return LLMConfig(
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        openrouter_api_key=os.getenv("OPENROUTER_API_KEY"),
+        default_model=os.getenv("OPENROUTER_DEFAULT_MODEL", "gpt-4o-mini"),
+        concurrency=int(os.getenv("RAGPY_LLM_CONCURRENCY", "8")),
+        note_cache=os.getenv("RAGPY_LLM_CACHE") == "1",
+        note_cache_dir=os.getenv("RAGPY_LLM_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "ragpy", "llm_notes")),
     )
-    logger.info("OpenRouter client initialized for note generation")
+
+
+# LLM clients are created on first use (keys saved to .env after import are picked up)
+# and cached; reset_clients() drops them when the credentials change.
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _get_client(name: str, api_key: Optional[str], use_async: bool = False, **client_kwargs):
+    """Return the cached client `name`, creating it if `api_key` is set, else None."""
+    client = _clients.get(name)
+    if client is not None:
+        return client
+    if not api_key:
+        return None
+    import openai  # Imported on first use: the template fallback never needs it
+
+    with _clients_lock:
+        if name not in _clients:
+            client_class = openai.AsyncOpenAI if use_async else openai.OpenAI
+            _clients[name] = client_class(api_key=api_key, **client_kwargs)
+            logger.info("%s client initialized for note generation", name)
+        return _clients[name]
+
+
+def _get_openai_client():
+    """OpenAI client, or None if OPENAI_API_KEY is not set."""
+    return _get_client("OpenAI", get_config().openai_api_key)
+
+
+def _get_openrouter_client():
+    """OpenRouter client, or None if OPENROUTER_API_KEY is not set."""
+    return _get_client("OpenRouter", get_config().openrouter_api_key, base_url=OPENROUTER_BASE_URL)
+
+
+def _get_async_openai_client():
+    """AsyncOpenAI client for OpenAI, or None if OPENAI_API_KEY is not set."""
+    return _get_client("AsyncOpenAI", get_config().openai_api_key, use_async=True)
+
+
+def _get_async_openrouter_client():
+    """AsyncOpenAI client for OpenRouter, or None if OPENROUTER_API_KEY is not set."""
+    return _get_client("AsyncOpenRouter", get_config().openrouter_api_key, use_async=True, base_url=OPENROUTER_BASE_URL)
+
+
+# Concurrent LLM requests allowed per provider by the async API (build_note_html_async),
+# set by RAGPY_LLM_CONCURRENCY
+_semaphores = {}  # provider -> (event loop, asyncio.Semaphore)
+
+
+def _get_semaphore(provider: str) -> asyncio.Semaphore:
+    """The request semaphore of `provider` for the running event loop."""
+    loop = asyncio.get_running_loop()
+    entry = _semaphores.get(provider)
+    if entry is None or entry[0] is not loop:
+        entry = _semaphores[provider] = (loop, asyncio.Semaphore(get_config().concurrency))
+    return entry[1]
+
+
+# Opt-in cache (RAGPY_LLM_CACHE=1) of LLM outputs keyed by (model, prompt, sampling settings):
+# regenerating an unchanged item (retry, Zotero re-sync) returns the stored note instead of
+# calling the API again
+_inflight = {}  # cache key -> asyncio.Task of the request being made for it
+
+
+@functools.lru_cache(maxsize=1)
+def _get_note_cache():
+    """The note cache, or None if disabled or diskcache is not installed."""
+    config = get_config()
+    if not config.note_cache:
+        return None
+    if not DISKCACHE_AVAILABLE:
+        logger.warning("RAGPY_LLM_CACHE is set but diskcache is not installed; notes are not cached")
+        return None
+    return diskcache.Cache(config.note_cache_dir)
+
+
+def _note_cache_key(request: Dict) -> str:
+    """Cache key of a chat request built by _chat_request."""
+    raw = "\0".join((
+        request["model"],
+        str(request["temperature"]),
+        str(request["max_tokens"]),
+        request["messages"][0]["content"],
+        request["messages"][1]["content"],
+    ))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def reset_clients() -> None:
+    """Reload .env and drop the cached config and clients, e.g. after the API keys were changed."""
+    load_dotenv(override=True)
+    get_config.cache_clear()
+    _get_note_cache.cache_clear()
+    with _clients_lock:
+        _clients.clear()
 
 
 def _detect_language(metadata: Dict) -> str:
@@ -65,10 +191,14 @@ def _detect_language(metadata: Dict) -> str:
     return "fr"
 
 
+@functools.lru_cache(maxsize=2)
 def _load_prompt_template(extended_analysis: bool = True) -> str:
     """
     Load the prompt template from zotero_prompt.md or zotero_prompt_short.md file.
 
+    The templates do not change while the process runs: each one is read once and
+    cached (a missing file is not cached, so it is looked up again on the next call).
+
     Args:
         extended_analysis: If True, load exhaustive analysis template (zotero_prompt.md)
                           If False, load short summary template (zotero_prompt_short.md)
@@ -89,13 +219,68 @@ def _load_prompt_template(extended_analysis: bool = True) -> str:
     try:
         with open(prompt_file, "r", encoding="utf-8") as f:
             template = f.read()
-        logger.info(f"Loaded prompt template from {prompt_file} (extended: {extended_analysis})")
+        logger.info("Loaded prompt template from %s (extended: %s)", prompt_file, extended_analysis)
         return template
     except FileNotFoundError:
-        logger.error(f"Prompt template not found at {prompt_file}")
+        logger.error("Prompt template not found at %s", prompt_file)
         raise
 
 
+# Placeholders of the prompt templates, filled by _build_prompt
+PROMPT_PLACEHOLDERS = ("TITLE", "AUTHORS", "DATE", "DOI", "URL", "PROBLEMATIQUE", "ABSTRACT", "TEXT", "LANGUAGE")
+_ESCAPED_PLACEHOLDER_RE = re.compile(r"\{\{(" + "|".join(PROMPT_PLACEHOLDERS) + r")\}\}")
+
+
+@functools.lru_cache(maxsize=2)
+def _load_prompt_format(extended_analysis: bool = True) -> str:
+    """
+    Load the prompt template as a str.format_map() string.
+
+    Literal braces are doubled and only the known placeholders become format fields, so
+    a prompt is built in a single pass instead of one str.replace per placeholder.
+
+    Raises:
+        FileNotFoundError: If the prompt file is not found
+    """
+    template = _load_prompt_template(extended_analysis=extended_analysis)
+    escaped = template.replace("{", "{{").replace("}", "}}")
+    return _ESCAPED_PLACEHOLDER_RE.sub(r"{\1}", escaped)
+
+
+# Text budget of the short summary mode
+SHORT_TEXT_MAX_TOKENS = 2000
+SHORT_TEXT_MAX_CHARS = 8000  # Used when tiktoken is not installed
+PROMPT_ENCODING = "o200k_base"  # gpt-4o family tokenizer, a close estimate for other providers
+MAX_CHARS_PER_TOKEN = 16  # Only this much of the text is tokenized to find the cut
+
+
+@functools.lru_cache(maxsize=1)
+def _get_encoding():
+    """The prompt tokenizer, or None if tiktoken is missing or its encoding cannot be loaded."""
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        return tiktoken.get_encoding(PROMPT_ENCODING)
+    except Exception as e:  # e.g. the encoding file cannot be downloaded
+        logger.warning("Token-based truncation unavailable, cutting by characters: %s", e)
+        return None
+
+
+def _truncate_text(text: str) -> str:
+    """
+    Cut text to the short-mode budget: SHORT_TEXT_MAX_TOKENS tokens with tiktoken,
+    SHORT_TEXT_MAX_CHARS characters otherwise.
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:SHORT_TEXT_MAX_CHARS]
+    head = text[:SHORT_TEXT_MAX_TOKENS * MAX_CHARS_PER_TOKEN]
+    tokens = encoding.encode(head, disallowed_special=())
+    if len(tokens) <= SHORT_TEXT_MAX_TOKENS:
+        return head
+    return encoding.decode(tokens[:SHORT_TEXT_MAX_TOKENS])
+
+
 def _build_prompt(metadata: Dict, text_content: str, language: str, extended_analysis: bool = True) -> str:
     """
     Build the LLM prompt by loading template and replacing placeholders.
@@ -145,27 +330,30 @@ def _build_prompt(metadata: Dict, text_content: str, language: str, extended_ana
         # Use full text for exhaustive analysis
         text_limited = safe_str(text_content if text_content else None, "Non disponible")
     else:
-        # Limit to 8000 characters for quick summary
-        text_limited = safe_str(text_content[:8000] if text_content else None, "Non disponible")
+        # Limit to SHORT_TEXT_MAX_TOKENS tokens for quick summary
+        text_limited = safe_str(_truncate_text(text_content) if text_content else None, "Non disponible")
 
     abstract_text = abstract if abstract else "Non disponible"
 
     try:
         # Load template from file
-        template = _load_prompt_template(extended_analysis=extended_analysis)
-
-        # Replace placeholders
-        prompt = template.replace("{TITLE}", title)
-        prompt = prompt.replace("{AUTHORS}", authors)
-        prompt = prompt.replace("{DATE}", date)
-        prompt = prompt.replace("{DOI}", doi)
-        prompt = prompt.replace("{URL}", url)
-        prompt = prompt.replace("{PROBLEMATIQUE}", problematique)
-        prompt = prompt.replace("{ABSTRACT}", abstract_text)
-        prompt = prompt.replace("{TEXT}", text_limited)
-        prompt = prompt.replace("{LANGUAGE}", target_lang)
-
-        logger.debug(f"Built prompt from template for: {title}")
+        template = _load_prompt_format(extended_analysis=extended_analysis)
+
+        # Fill placeholders (one pass; values containing braces are inserted verbatim)
+        prompt = template.format_map({
+            "TITLE": title,
+            "AUTHORS": authors,
+            "DATE": date,
+            "DOI": doi,
+            "URL": url,
+            "PROBLEMATIQUE": problematique,
+            "ABSTRACT": abstract_text,
+            "TEXT": text_limited,
+            "LANGUAGE": target_lang,
+        })
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Built prompt from template for: %s", title)
         return prompt
 
     except FileNotFoundError:
@@ -207,6 +395,61 @@ Commence directement par le contenu HTML, sans préambule."""
         return prompt
 
 
+def _select_client(model: str, use_async: bool = False) -> Tuple[object, str, str]:
+    """
+    Pick the LLM client for `model`.
+
+    Returns:
+        Tuple of (client, model, provider); model is replaced by "gpt-4o-mini" when an
+        OpenRouter model falls back to OpenAI.
+
+    Raises:
+        ValueError: If no LLM client is available
+    """
+    get_openai = _get_async_openai_client if use_async else _get_openai_client
+    get_openrouter = _get_async_openrouter_client if use_async else _get_openrouter_client
+
+    # Detect which client to use based on model format
+    use_openrouter = "/" in model  # OpenRouter models have format "provider/model"
+
+    if use_openrouter:
+        openrouter_client = get_openrouter()
+        if not openrouter_client:
+            logger.warning("OpenRouter model '%s' requested but client not initialized. Falling back to OpenAI.", model)
+            openai_client = get_openai()
+            if not openai_client:
+                raise ValueError("No LLM client available (neither OpenAI nor OpenRouter)")
+            return openai_client, "gpt-4o-mini", "openai"
+        logger.info("Using OpenRouter with model: %s", model)
+        return openrouter_client, model, "openrouter"
+
+    openai_client = get_openai()
+    if not openai_client:
+        raise ValueError("OpenAI client not initialized (OPENAI_API_KEY missing)")
+    logger.info("Using OpenAI with model: %s", model)
+    return openai_client, model, "openai"
+
+
+def _chat_request(prompt: str, model: str, temperature: float, extended_analysis: bool) -> Dict:
+    """Keyword arguments of the chat.completions.create call for a note."""
+    return {
+        "model": model,
+        "messages": [
+            {
+                "role": "system",
+                "content": "Tu es un assistant spécialisé en rédaction de fiches de lecture académiques."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "temperature": temperature,
+        # Set max_tokens based on analysis mode
+        "max_tokens": 16000 if extended_analysis else 2000
+    }
+
+
 def _generate_with_llm(prompt: str, model: str = None, temperature: float = 0.2, extended_analysis: bool = True) -> str:
     """
     Generate note content using LLM.
@@ -227,58 +470,134 @@ def _generate_with_llm(prompt: str, model: str = None, temperature: float = 0.2,
     """
     # Use OPENROUTER_DEFAULT_MODEL if no model specified
     if not model:
-        model = OPENROUTER_DEFAULT_MODEL
-        logger.info(f"No model specified, using default: {model}")
-
-    # Detect which client to use based on model format
-    use_openrouter = "/" in model  # OpenRouter models have format "provider/model"
+        model = get_config().default_model
+        logger.info("No model specified, using default: %s", model)
 
-    if use_openrouter:
-        if not openrouter_client:
-            logger.warning(f"OpenRouter model '{model}' requested but client not initialized. Falling back to OpenAI.")
-            if not openai_client:
-                raise ValueError("No LLM client available (neither OpenAI nor OpenRouter)")
-            active_client = openai_client
-            model = "gpt-4o-mini"
-        else:
-            active_client = openrouter_client
-            logger.info(f"Using OpenRouter with model: {model}")
-    else:
-        if not openai_client:
-            raise ValueError("OpenAI client not initialized (OPENAI_API_KEY missing)")
-        active_client = openai_client
-        logger.info(f"Using OpenAI with model: {model}")
+    active_client, model, _ = _select_client(model)
+    request = _chat_request(prompt, model, temperature, extended_analysis)
 
-    # Set max_tokens based on analysis mode
-    max_tokens = 16000 if extended_analysis else 2000
+    cache = _get_note_cache()
+    if cache is not None:
+        key = _note_cache_key(request)
+        content = cache.get(key)
+        if content is not None:
+            logger.info("Reusing cached note content for model: %s", model)
+            return content
 
     # Make the API call
     try:
-        response = active_client.chat.completions.create(
-            model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Tu es un assistant spécialisé en rédaction de fiches de lecture académiques."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
+        response = active_client.chat.completions.create(**request)
 
         content = response.choices[0].message.content.strip()
-        logger.debug(f"Generated note content (length: {len(content)} chars)")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Generated note content (length: %d chars)", len(content))
+        if cache is not None:
+            cache.set(key, content)
         return content
 
     except Exception as e:
-        logger.error(f"Error calling LLM API: {e}")
+        logger.error("Error calling LLM API: %s", e)
         raise
 
 
+async def _generate_with_llm_async(prompt: str, model: str = None, temperature: float = 0.2, extended_analysis: bool = True) -> str:
+    """
+    Async variant of _generate_with_llm (AsyncOpenAI clients).
+
+    At most RAGPY_LLM_CONCURRENCY requests per provider are in flight at once. With the note
+    cache enabled, identical concurrent requests share a single API call.
+    """
+    if not model:
+        model = get_config().default_model
+        logger.info("No model specified, using default: %s", model)
+
+    active_client, model, provider = _select_client(model, use_async=True)
+    request = _chat_request(prompt, model, temperature, extended_analysis)
+
+    cache = _get_note_cache()
+    if cache is None:
+        return await _request_note_async(active_client, provider, request)
+
+    key = _note_cache_key(request)
+    content = cache.get(key)
+    if content is not None:
+        logger.info("Reusing cached note content for model: %s", model)
+        return content
+
+    task = _inflight.get(key)
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        task = asyncio.ensure_future(_request_note_async(active_client, provider, request))
+        _inflight[key] = task
+
+        def _store(done: asyncio.Task, key: str = key) -> None:
+            if _inflight.get(key) is done:
+                del _inflight[key]
+            if not done.cancelled() and done.exception() is None:
+                cache.set(key, done.result())
+
+        task.add_done_callback(_store)
+    # shield: a cancelled caller must not cancel the request other callers wait on
+    return await asyncio.shield(task)
+
+
+async def _request_note_async(active_client, provider: str, request: Dict) -> str:
+    """Send one chat request (within the provider semaphore) and return the note content."""
+    try:
+        async with _get_semaphore(provider):
+            response = await active_client.chat.completions.create(**request)
+
+        content = response.choices[0].message.content.strip()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Generated note content (length: %d chars)", len(content))
+        return content
+
+    except Exception as e:
+        logger.error("Error calling LLM API: %s", e)
+        raise
+
+
+# Labels of the fallback note per language (other languages use French)
+_FALLBACK_LABELS = {
+    "fr": {
+        "title": "Fiche de lecture",
+        "ref": "Référence",
+        "problem": "Problématique",
+        "method": "Méthodologie",
+        "results": "Résultats clés",
+        "limits": "Limites",
+        "abstract": "Résumé",
+        "tbd": "à compléter"
+    },
+    "en": {
+        "title": "Reading Note",
+        "ref": "Reference",
+        "problem": "Research Question",
+        "method": "Methodology",
+        "results": "Key Results",
+        "limits": "Limitations",
+        "abstract": "Abstract",
+        "tbd": "to be completed"
+    }
+}
+
+
+def _compile_fallback_template(lang_labels: Dict[str, str]) -> Template:
+    """Fallback note HTML with the labels filled in and $-placeholders for the metadata."""
+    return Template(f"""<p><em>Fiche générée automatiquement (template).</em></p>
+<h3>{lang_labels["title"]}</h3>
+<p><strong>{lang_labels["ref"]} :</strong> $title — $authors — $date — $url</p>
+<ul>
+  <li><strong>{lang_labels["problem"]} :</strong> {lang_labels["tbd"]}</li>
+  <li><strong>{lang_labels["method"]} :</strong> {lang_labels["tbd"]}</li>
+  <li><strong>{lang_labels["results"]} :</strong> {lang_labels["tbd"]}</li>
+  <li><strong>{lang_labels["limits"]} :</strong> {lang_labels["tbd"]}</li>
+</ul>
+<p><strong>{lang_labels["abstract"]} :</strong> $abstract</p>""")
+
+
+_FALLBACK_TEMPLATES = {lang: _compile_fallback_template(labels) for lang, labels in _FALLBACK_LABELS.items()}
+
+
 def _fallback_template(metadata: Dict, language: str) -> str:
     """
     Generate a simple HTML template if LLM is unavailable.
@@ -302,49 +621,33 @@ def _fallback_template(metadata: Dict, language: str) -> str:
                 return default
         return str(value)
 
-    title = html_module.escape(safe_str(metadata.get("title"), "Sans titre"))
-    authors = html_module.escape(safe_str(metadata.get("authors"), "N/A"))
-    date = html_module.escape(safe_str(metadata.get("date"), "N/A")[:10])
+    esc = html_module.escape
     abstract_raw = safe_str(metadata.get("abstract"), "")
-    abstract = html_module.escape(abstract_raw[:1200] if abstract_raw else "")
-    url = html_module.escape(safe_str(metadata.get("url") or metadata.get("doi"), ""))
-
-    # Language-specific labels
-    labels = {
-        "fr": {
-            "title": "Fiche de lecture",
-            "ref": "Référence",
-            "problem": "Problématique",
-            "method": "Méthodologie",
-            "results": "Résultats clés",
-            "limits": "Limites",
-            "abstract": "Résumé",
-            "tbd": "à compléter"
-        },
-        "en": {
-            "title": "Reading Note",
-            "ref": "Reference",
-            "problem": "Research Question",
-            "method": "Methodology",
-            "results": "Key Results",
-            "limits": "Limitations",
-            "abstract": "Abstract",
-            "tbd": "to be completed"
-        }
-    }
 
-    lang_labels = labels.get(language, labels["fr"])
+    template = _FALLBACK_TEMPLATES.get(language, _FALLBACK_TEMPLATES["fr"])
+    return template.substitute(
+        title=esc(safe_str(metadata.get("title"), "Sans titre")),
+        authors=esc(safe_str(metadata.get("authors"), "N/A")),
+        date=esc(safe_str(metadata.get("date"), "N/A")[:10]),
+        url=esc(safe_str(metadata.get("url") or metadata.get("doi"), "")),
+        abstract=esc(abstract_raw[:1200] if abstract_raw else ""),
+    )
 
-    return f"""<p><em>Fiche générée automatiquement (template).</em></p>
-<h3>{lang_labels["title"]}</h3>
-<p><strong>{lang_labels["ref"]} :</strong> {title} — {authors} — {date} — {url}</p>
-<ul>
-  <li><strong>{lang_labels["problem"]} :</strong> {lang_labels["tbd"]}</li>
-  <li><strong>{lang_labels["method"]} :</strong> {lang_labels["tbd"]}</li>
-  <li><strong>{lang_labels["results"]} :</strong> {lang_labels["tbd"]}</li>
-  <li><strong>{lang_labels["limits"]} :</strong> {lang_labels["tbd"]}</li>
-</ul>
-<p><strong>{lang_labels["abstract"]} :</strong> {abstract}</p>"""
+
+def _prompt_text(metadata: Dict, text_content: Optional[str]) -> Optional[str]:
+    """
+    Text for the {TEXT} placeholder of the prompt.
+
+    The abstract already fills {ABSTRACT}: when there is no full text, or the full text
+    is just the abstract, {TEXT} is left empty rather than sending the abstract twice.
+    Returns None when there is neither text nor abstract to work from.
+    """
+    abstract = metadata.get("abstract")
+    abstract = abstract.strip() if isinstance(abstract, str) else ""
+    text = text_content.strip() if isinstance(text_content, str) else ""
+    if text and text != abstract:
+        return text_content
+    return "" if abstract else None
 
 
 def build_note_html(
@@ -387,20 +690,20 @@ def build_note_html(
     """
     # Use OPENROUTER_DEFAULT_MODEL if no model specified
     if not model:
-        model = OPENROUTER_DEFAULT_MODEL
-        logger.info(f"No model specified, using default: {model}")
+        model = get_config().default_model
+        logger.info("No model specified, using default: %s", model)
 
     # Detect target language
     language = _detect_language(metadata)
-    logger.info(f"Generating note in language: {language}")
+    logger.info("Generating note in language: %s", language)
 
     # Generate the note body
-    if use_llm and (openai_client or openrouter_client):
+    if use_llm and (_get_openai_client() or _get_openrouter_client()):
         try:
-            # Use text_content if available, otherwise use abstract
-            content = text_content or metadata.get("abstract", "")
+            # Full text if available; the abstract is always part of the prompt
+            content = _prompt_text(metadata, text_content)
 
-            if not content:
+            if content is None:
                 logger.warning("No text content or abstract available, using template fallback")
                 body_html = _fallback_template(metadata, language)
             else:
@@ -408,19 +711,64 @@ def build_note_html(
                 prompt = _build_prompt(metadata, content, language, extended_analysis=extended_analysis)
                 body_html = _generate_with_llm(prompt, model=model, extended_analysis=extended_analysis)
         except Exception as e:
-            logger.error(f"LLM generation failed, using template fallback: {e}")
+            logger.error("LLM generation failed, using template fallback: %s", e)
+            body_html = _fallback_template(metadata, language)
+    else:
+        logger.info("LLM not available or disabled, using template")
+        body_html = _fallback_template(metadata, language)
+
+    return _wrap_note(body_html)
+
+
+async def build_note_html_async(
+    metadata: Dict,
+    text_content: Optional[str] = None,
+    model: str = None,
+    use_llm: bool = True,
+    extended_analysis: bool = True
+) -> Tuple[str, str]:
+    """
+    Async variant of build_note_html, using AsyncOpenAI clients.
+
+    Notes of a batch can be generated concurrently with asyncio.gather(); at most
+    RAGPY_LLM_CONCURRENCY requests per provider are sent at once.
+    """
+    if not model:
+        model = get_config().default_model
+        logger.info("No model specified, using default: %s", model)
+
+    language = _detect_language(metadata)
+    logger.info("Generating note in language: %s", language)
+
+    if use_llm and (_get_async_openai_client() or _get_async_openrouter_client()):
+        try:
+            content = _prompt_text(metadata, text_content)
+
+            if content is None:
+                logger.warning("No text content or abstract available, using template fallback")
+                body_html = _fallback_template(metadata, language)
+            else:
+                prompt = _build_prompt(metadata, content, language, extended_analysis=extended_analysis)
+                body_html = await _generate_with_llm_async(prompt, model=model, extended_analysis=extended_analysis)
+        except Exception as e:
+            logger.error("LLM generation failed, using template fallback: %s", e)
             body_html = _fallback_template(metadata, language)
     else:
         logger.info("LLM not available or disabled, using template")
         body_html = _fallback_template(metadata, language)
 
+    return _wrap_note(body_html)
+
+
+def _wrap_note(body_html: str) -> Tuple[str, str]:
+    """Prefix a note body with a new unique sentinel; returns (sentinel, note_html)."""
     # Generate unique sentinel
-    sentinel = f"{SENTINEL_PREFIX}{uuid.uuid4()}"
+    sentinel = f"{SENTINEL_PREFIX}{secrets.token_hex(SENTINEL_ID_BYTES)}"
 
     # Build complete HTML with sentinel comment
     note_html = f"<!-- {sentinel} -->\n{body_html}"
 
-    logger.info(f"Generated note with sentinel: {sentinel}")
+    logger.info("Generated note with sentinel: %s", sentinel)
     return sentinel, note_html
 
 
@@ -434,7 +782,7 @@ def sentinel_in_html(html_text: str) -> bool:
     Returns:
         True if a ragpy sentinel is found, False otherwise
     """
-    return SENTINEL_PREFIX in (html_text or "")
+    return bool(html_text) and SENTINEL_PREFIX in html_text
 
 
 def extract_sentinel_from_html(html_text: str) -> Optional[str]:
@@ -451,11 +799,5 @@ def extract_sentinel_from_html(html_text: str) -> Optional[str]:
         return None
 
     # Look for the sentinel pattern in HTML comments
-    import re
-    pattern = rf"<!--\s*({SENTINEL_PREFIX}[a-f0-9\-]+)\s*-->"
-    match = re.search(pattern, html_text)
-
-    if match:
-        return match.group(1)
-
-    return None
+    match = _SENTINEL_RE.search(html_text)
+    return match.group(1) if match else None
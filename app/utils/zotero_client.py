@@ -5,24 +5,124 @@ This module provides functions to interact with Zotero API v3 for:
 - Verifying API keys
 - Retrieving library versions
 - Checking if notes exist
-- Creating child notes with automatic retry and concurrency control
+- Creating child notes (singly or in batches) with automatic retry and concurrency control
 
 API Documentation: https://www.zotero.org/support/dev/web_api/v3/start
 """
 
+import functools
+import hashlib
+import os
+import random
+import sqlite3
+import threading
 import time
-import uuid
 import logging
-from typing import Optional, Dict, List
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Set, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
 # Constants
 ZOTERO_API_BASE = "https://api.zotero.org"
 ZOTERO_API_VERSION = "3"
-MAX_RETRIES = 3
-RETRY_DELAY = 2  # seconds
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5  # seconds
+BACKOFF_CAP = 30  # seconds
+RETRY_AFTER_JITTER = 0.25  # seconds
+KEY_INFO_TTL = 60  # seconds
+LIBRARY_VERSION_TTL = 5  # seconds
+NOTE_CHECKS_MAX_ENTRIES = 4096
+MAX_NOTES_PER_REQUEST = 50  # Zotero write requests accept at most 50 items
+CHECK_WORKERS = 8  # Concurrent requests of check_notes_exist / check_tagged_notes_exist
+NOTES_PAGE_SIZE = 100  # Maximum "limit" of the items endpoint
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 32  # Notes of a batch are written from several threads
+LIBRARY_TYPES = frozenset(("users", "groups"))
+HTTP2_MAX_CONNECTIONS = 4  # With RAGPY_HTTP2=1, requests are multiplexed over these connections
+NOTES_DB_ENV = "RAGPY_ZOTERO_NOTES_DB"  # Path of the SQLite record of created notes (unset: disabled)
+
+
+def _new_session() -> requests.Session:
+    """Session with a keep-alive connection pool and the headers common to all requests."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "Zotero-API-Version": ZOTERO_API_VERSION,
+        "Content-Type": "application/json",
+    })
+    return session
+
+
+# Shared by all API calls so connections (and TLS handshakes) are reused across items
+_SESSION = _new_session()
+
+
+def get_session() -> requests.Session:
+    """The shared HTTP session used for Zotero API calls."""
+    return _SESSION
+
+
+@functools.lru_cache(maxsize=1)
+def _get_http2_client():
+    """
+    httpx client used instead of the session when RAGPY_HTTP2=1, or None.
+
+    HTTP/2 multiplexes the concurrent existence checks over a few connections.
+    Needs httpx with its http2 extra (pip install "httpx[http2]").
+    """
+    if os.getenv("RAGPY_HTTP2") != "1":
+        return None
+    if not HTTPX_AVAILABLE:
+        logger.warning("RAGPY_HTTP2=1 but httpx is not installed, using HTTP/1.1")
+        return None
+    try:
+        return httpx.Client(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=HTTP2_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP2_MAX_CONNECTIONS
+            ),
+            headers={
+                "Zotero-API-Version": ZOTERO_API_VERSION,
+                "Content-Type": "application/json",
+            },
+        )
+    except ImportError:  # The h2 package of the http2 extra is missing
+        logger.warning("RAGPY_HTTP2=1 but httpx[http2] is not installed, using HTTP/1.1")
+        return None
+
+
+# Network errors of either transport
+_NETWORK_ERRORS = (requests.RequestException, httpx.HTTPError) if HTTPX_AVAILABLE else (requests.RequestException,)
+
+
+def _request(method: str, url: str, **kwargs):
+    """Send a request through the HTTP/2 client if enabled, else through the shared session."""
+    client = _get_http2_client()
+    if client is not None:
+        return client.request(method, url, **kwargs)
+    return getattr(_SESSION, method.lower())(url, **kwargs)
+
+
+def close_session() -> None:
+    """Close the pooled connections of the shared session (e.g. on shutdown)."""
+    _SESSION.close()
+    if _get_http2_client.cache_info().currsize:
+        client = _get_http2_client()
+        if client is not None:
+            client.close()
+        _get_http2_client.cache_clear()
 
 
 class ZoteroAPIError(Exception):
@@ -35,9 +135,175 @@ class ZoteroAPIError(Exception):
         super().__init__(f"Zotero API Error {status_code}: {message}")
 
 
+# Short-lived caches of /keys/current results and library versions: {key: (value, expiry)}
+_key_info_cache = {}
+_library_versions = {}
+# check_note_exists answers: {(library_type, library_id, item_key, sentinel): (version, exists)},
+# revalidated with If-Modified-Since-Version (least recently used entries are dropped)
+_note_checks = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_get(cache: Dict, key):
+    """Cached value of `key`, or None if missing or expired."""
+    with _cache_lock:
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        if entry[1] < time.monotonic():
+            del cache[key]
+            return None
+        return entry[0]
+
+
+def _cache_set(cache: Dict, key, value, ttl: float) -> None:
+    with _cache_lock:
+        cache[key] = (value, time.monotonic() + ttl)
+
+
+def set_library_version(library_type: str, library_id: str, version: str) -> None:
+    """Record a library version seen in a response (e.g. Last-Modified-Version of a write)."""
+    _cache_set(_library_versions, (library_type, library_id), version, LIBRARY_VERSION_TTL)
+
+
+def invalidate_library_version(library_type: str, library_id: str) -> None:
+    """Drop the cached version of a library, so the next get_library_version() asks the API."""
+    with _cache_lock:
+        _library_versions.pop((library_type, library_id), None)
+
+
+def clear_caches() -> None:
+    """Drop all cached key information and library versions."""
+    with _cache_lock:
+        _key_info_cache.clear()
+        _library_versions.clear()
+        _note_checks.clear()
+
+
+# Notes created by this module, kept on disk so that a resumed run skips their existence checks
+_notes_db = None
+_notes_db_path = None
+_notes_db_lock = threading.Lock()
+
+
+def _get_notes_db() -> Optional[sqlite3.Connection]:
+    """Connection to the record of created notes, or None when RAGPY_ZOTERO_NOTES_DB is not set."""
+    global _notes_db, _notes_db_path
+    path = os.getenv(NOTES_DB_ENV)
+    if not path:
+        return None
+    if _notes_db is not None and _notes_db_path == path:
+        return _notes_db
+
+    close_notes_db()
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS created_notes("
+        "library TEXT, item_key TEXT, note_key TEXT, ts INTEGER, "
+        "PRIMARY KEY(library, item_key))"
+    )
+    connection.commit()
+    _notes_db, _notes_db_path = connection, path
+    return connection
+
+
+def close_notes_db() -> None:
+    """Close the record of created notes (it is reopened on next use)."""
+    global _notes_db, _notes_db_path
+    if _notes_db is not None:
+        _notes_db.close()
+    _notes_db, _notes_db_path = None, None
+
+
+def _recorded_items(library_type: str, library_id: str, item_keys: List[str]) -> Set[str]:
+    """Those of `item_keys` that this module already created a note for."""
+    if not item_keys:
+        return set()
+    with _notes_db_lock:
+        db = _get_notes_db()
+        if db is None:
+            return set()
+        library, recorded = f"{library_type}/{library_id}", set()
+        try:
+            for start in range(0, len(item_keys), 500):  # Stay below SQLite's variable limit
+                keys = item_keys[start:start + 500]
+                recorded.update(item_key for (item_key,) in db.execute(
+                    f"SELECT item_key FROM created_notes WHERE library = ? AND item_key IN ({','.join('?' * len(keys))})",
+                    (library, *keys)
+                ))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read the record of created notes: {e}")
+            return set()
+    return recorded
+
+
+def _record_notes(library_type: str, library_id: str, created: List[Tuple[str, str]]) -> None:
+    """Record created notes given as (item_key, note_key)."""
+    if not created:
+        return
+    with _notes_db_lock:
+        db = _get_notes_db()
+        if db is None:
+            return
+        library, ts = f"{library_type}/{library_id}", int(time.time())
+        try:
+            with db:
+                db.executemany(
+                    "INSERT OR IGNORE INTO created_notes(library, item_key, note_key, ts) VALUES (?, ?, ?, ?)",
+                    [(library, item_key, note_key, ts) for item_key, note_key in created]
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not record created notes: {e}")
+
+
+# A 429 from any thread pauses every request until the Retry-After delay has passed
+_resume_at = 0.0
+_rate_limit_lock = threading.Lock()
+
+
+def _pause_requests(delay: float) -> None:
+    """Hold back all requests of this module for `delay` seconds."""
+    global _resume_at
+    with _rate_limit_lock:
+        _resume_at = max(_resume_at, time.monotonic() + delay)
+
+
+def _wait_if_paused() -> None:
+    """Sleep until the current rate-limit pause (if any) is over."""
+    while True:
+        with _rate_limit_lock:
+            remaining = _resume_at - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(remaining)
+
+
+def _backoff(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """
+    Delay before retry number `attempt` (0-based): exponential backoff with jitter.
+
+    The random spread keeps workers that failed together from retrying in lockstep.
+    """
+    return random.uniform(base, min(cap, base * 2 ** attempt))
+
+
+def _retry_after_delay(response: requests.Response, attempt: int) -> float:
+    """Delay requested by a 429 response (Retry-After, plus jitter), or the backoff delay."""
+    try:
+        retry_after = float(response.headers["Retry-After"])
+    except (KeyError, ValueError):  # Missing, or an HTTP date
+        return _backoff(attempt)
+    return max(0.0, retry_after + random.uniform(-RETRY_AFTER_JITTER, RETRY_AFTER_JITTER))
+
+
 def _build_headers(api_key: str, additional_headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
     """
-    Build standard headers for Zotero API requests.
+    Build the per-request headers for Zotero API requests.
+
+    Zotero-API-Version and Content-Type are default headers of the shared session.
 
     Args:
         api_key: Zotero API key
@@ -46,11 +312,7 @@ def _build_headers(api_key: str, additional_headers: Optional[Dict[str, str]] =
     Returns:
         Dictionary of headers
     """
-    headers = {
-        "Zotero-API-Key": api_key,
-        "Zotero-API-Version": ZOTERO_API_VERSION,
-        "Content-Type": "application/json",
-    }
+    headers = {"Zotero-API-Key": api_key}
 
     if additional_headers:
         headers.update(additional_headers)
@@ -69,7 +331,7 @@ def _build_library_prefix(library_type: str, library_id: str) -> str:
     Returns:
         Library prefix string (e.g., "users/12345" or "groups/67890")
     """
-    if library_type not in ("users", "groups"):
+    if library_type not in LIBRARY_TYPES:
         raise ValueError(f"Invalid library_type: {library_type}. Must be 'users' or 'groups'")
 
     return f"{library_type}/{library_id}"
@@ -79,6 +341,8 @@ def verify_api_key(api_key: str) -> Dict:
     """
     Verify that the API key is valid and return its permissions.
 
+    Successful results are cached for KEY_INFO_TTL seconds.
+
     Args:
         api_key: Zotero API key to verify
 
@@ -88,15 +352,21 @@ def verify_api_key(api_key: str) -> Dict:
     Raises:
         ZoteroAPIError: If the key is invalid or API request fails
     """
+    key_info = _cache_get(_key_info_cache, api_key)
+    if key_info is not None:
+        return dict(key_info)
+
     url = f"{ZOTERO_API_BASE}/keys/current"
     headers = _build_headers(api_key)
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = _request("GET", url, headers=headers, timeout=10)
 
         if response.status_code == 200:
             logger.info("Zotero API key verified successfully")
-            return response.json()
+            key_info = response.json()
+            _cache_set(_key_info_cache, api_key, key_info, KEY_INFO_TTL)
+            return dict(key_info)
         elif response.status_code == 403:
             raise ZoteroAPIError(403, "Invalid API key", response)
         else:
@@ -105,7 +375,7 @@ def verify_api_key(api_key: str) -> Dict:
                 f"Failed to verify API key: {response.text}",
                 response
             )
-    except requests.RequestException as e:
+    except _NETWORK_ERRORS as e:
         logger.error(f"Network error while verifying API key: {e}")
         raise ZoteroAPIError(0, f"Network error: {str(e)}")
 
@@ -115,6 +385,8 @@ def get_library_version(library_type: str, library_id: str, api_key: str) -> str
     Get the current version of the library.
 
     This is used for concurrency control with If-Unmodified-Since-Version header.
+    Versions are cached for LIBRARY_VERSION_TTL seconds; writes made through this
+    module update the cache and version conflicts invalidate it.
 
     Args:
         library_type: "users" or "groups"
@@ -128,15 +400,20 @@ def get_library_version(library_type: str, library_id: str, api_key: str) -> str
         ZoteroAPIError: If the request fails
     """
     prefix = _build_library_prefix(library_type, library_id)
+    version = _cache_get(_library_versions, (library_type, library_id))
+    if version is not None:
+        return version
+
     url = f"{ZOTERO_API_BASE}/{prefix}/items/top"
     headers = _build_headers(api_key)
 
     try:
-        response = requests.get(url, headers=headers, params={"limit": 1}, timeout=10)
+        response = _request("GET", url, headers=headers, params={"limit": 1}, timeout=10)
 
         if response.status_code == 200:
             version = response.headers.get("Last-Modified-Version", "0")
             logger.debug(f"Retrieved library version: {version}")
+            set_library_version(library_type, library_id, version)
             return version
         else:
             raise ZoteroAPIError(
@@ -144,11 +421,24 @@ def get_library_version(library_type: str, library_id: str, api_key: str) -> str
                 f"Failed to get library version: {response.text}",
                 response
             )
-    except requests.RequestException as e:
+    except _NETWORK_ERRORS as e:
         logger.error(f"Network error while getting library version: {e}")
         raise ZoteroAPIError(0, f"Network error: {str(e)}")
 
 
+def _get_with_rate_limit(url: str, headers: Dict[str, str], params: Optional[Dict] = None, timeout: float = 15):
+    """GET `url`, waiting out 429 responses (for all threads) up to MAX_RETRIES times."""
+    for attempt in range(MAX_RETRIES):
+        _wait_if_paused()
+        response = _request("GET", url, headers=headers, params=params, timeout=timeout)
+        if response.status_code != 429:
+            break
+        retry_after = _retry_after_delay(response, attempt)
+        logger.warning(f"Rate limit (429), pausing requests for {retry_after:.1f}s")
+        _pause_requests(retry_after)
+    return response
+
+
 def check_note_exists(
     library_type: str,
     library_id: str,
@@ -159,6 +449,9 @@ def check_note_exists(
     """
     Check if a note with the given sentinel already exists as a child of the item.
 
+    A repeated check sends If-Modified-Since-Version with the library version of the
+    previous answer; a 304 reuses that answer without downloading the children again.
+
     Args:
         library_type: "users" or "groups"
         library_id: The library ID
@@ -174,24 +467,35 @@ def check_note_exists(
     """
     prefix = _build_library_prefix(library_type, library_id)
     url = f"{ZOTERO_API_BASE}/{prefix}/items/{item_key}/children"
-    headers = _build_headers(api_key)
+    check_key = (library_type, library_id, item_key, sentinel)
+    with _cache_lock:
+        previous = _note_checks.get(check_key)
+    headers = _build_headers(api_key, {"If-Modified-Since-Version": previous[0]} if previous else None)
 
     try:
-        response = requests.get(
-            url,
-            headers=headers,
-            params={"itemType": "note"},
-            timeout=15
-        )
-
-        if response.status_code == 200:
-            notes = response.json()
-            for note in notes:
+        response = _get_with_rate_limit(url, headers, {"itemType": "note"})
+
+        if response.status_code == 304 and previous:
+            with _cache_lock:
+                if check_key in _note_checks:
+                    _note_checks.move_to_end(check_key)
+            return previous[1]
+        elif response.status_code == 200:
+            exists = False
+            for note in response.json():
                 note_content = note.get("data", {}).get("note", "")
                 if sentinel in note_content:
                     logger.info(f"Found existing note with sentinel {sentinel}")
-                    return True
-            return False
+                    exists = True
+                    break
+            version = response.headers.get("Last-Modified-Version")
+            if version:
+                with _cache_lock:
+                    _note_checks[check_key] = (version, exists)
+                    _note_checks.move_to_end(check_key)
+                    if len(_note_checks) > NOTE_CHECKS_MAX_ENTRIES:
+                        _note_checks.popitem(last=False)
+            return exists
         elif response.status_code == 404:
             logger.warning(f"Parent item {item_key} not found")
             raise ZoteroAPIError(404, f"Parent item {item_key} not found", response)
@@ -201,68 +505,266 @@ def check_note_exists(
                 f"Failed to check child notes: {response.text}",
                 response
             )
-    except requests.RequestException as e:
+    except _NETWORK_ERRORS as e:
         logger.error(f"Network error while checking notes: {e}")
         raise ZoteroAPIError(0, f"Network error: {str(e)}")
 
 
-def create_child_note(
+def prefetch_existing_notes(
     library_type: str,
     library_id: str,
-    item_key: str,
-    note_html: str,
-    tags: Optional[List[str]] = None,
-    api_key: str = "",
-    library_version: Optional[str] = None
-) -> Dict:
+    api_key: str,
+    tag: str,
+    max_requests: Optional[int] = None
+) -> Optional[Set[str]]:
     """
-    Create a child note for a Zotero item.
-
-    This function implements:
-    - Automatic retry on 412 (version conflict)
-    - Backoff on 429 (rate limit)
-    - Write token for idempotence
+    List the parent items of all notes of the library carrying `tag`, NOTES_PAGE_SIZE
+    notes per request.
 
     Args:
         library_type: "users" or "groups"
         library_id: The library ID
-        item_key: The parent item key
-        note_html: HTML content of the note
-        tags: Optional list of tags to add to the note
         api_key: Zotero API key
-        library_version: Optional library version for concurrency control
+        tag: Tag of the notes (e.g., "ragpy")
+        max_requests: Give up (return None) if the listing would take more requests
 
     Returns:
-        Dictionary with response data including:
-        - success: bool
-        - note_key: str (if successful)
-        - message: str
-        - new_version: str (if successful)
+        Keys of the items having such a child note, or None (see max_requests)
 
     Raises:
-        ZoteroAPIError: If all retry attempts fail
+        ZoteroAPIError: If a request fails
     """
     prefix = _build_library_prefix(library_type, library_id)
     url = f"{ZOTERO_API_BASE}/{prefix}/items"
+    params = {"itemType": "note", "tag": tag, "format": "json", "include": "data", "limit": NOTES_PAGE_SIZE}
+    headers = _build_headers(api_key)
+    parent_keys = set()
+
+    try:
+        while url:
+            response = _get_with_rate_limit(url, headers, params, timeout=30)
+            if response.status_code != 200:
+                raise ZoteroAPIError(
+                    response.status_code,
+                    f"Failed to list notes: {response.text}",
+                    response
+                )
+            if params is not None and max_requests is not None:
+                total = int(response.headers.get("Total-Results") or 0)
+                if -(-total // NOTES_PAGE_SIZE) > max_requests:
+                    logger.debug(f"{total} notes tagged {tag}, not prefetching them")
+                    return None
+
+            for note in response.json():
+                parent_key = note.get("data", {}).get("parentItem")
+                if parent_key:
+                    parent_keys.add(parent_key)
+
+            # The next page link carries the query parameters
+            url = response.links.get("next", {}).get("url")
+            params = None
+    except _NETWORK_ERRORS as e:
+        logger.error(f"Network error while listing notes: {e}")
+        raise ZoteroAPIError(0, f"Network error: {str(e)}")
+
+    return parent_keys
 
-    # Build the note item payload
-    note_item = {
+
+def check_tagged_note_exists(
+    library_type: str,
+    library_id: str,
+    item_key: str,
+    tag: str,
+    api_key: str
+) -> bool:
+    """
+    Check if the item has a child note carrying `tag` (e.g. a note from an earlier run).
+
+    Raises:
+        ZoteroAPIError: If the request fails
+    """
+    prefix = _build_library_prefix(library_type, library_id)
+    url = f"{ZOTERO_API_BASE}/{prefix}/items/{item_key}/children"
+
+    try:
+        response = _get_with_rate_limit(
+            url, _build_headers(api_key), {"itemType": "note", "tag": tag, "format": "keys", "limit": 1}
+        )
+    except _NETWORK_ERRORS as e:
+        logger.error(f"Network error while checking notes: {e}")
+        raise ZoteroAPIError(0, f"Network error: {str(e)}")
+
+    if response.status_code == 200:
+        return bool(response.text.strip())
+    elif response.status_code == 404:
+        logger.warning(f"Parent item {item_key} not found")
+        raise ZoteroAPIError(404, f"Parent item {item_key} not found", response)
+    raise ZoteroAPIError(
+        response.status_code,
+        f"Failed to check child notes: {response.text}",
+        response
+    )
+
+
+def check_tagged_notes_exist(
+    library_type: str,
+    library_id: str,
+    item_keys: List[str],
+    tag: str,
+    api_key: str,
+    max_workers: int = CHECK_WORKERS
+) -> List:
+    """
+    Check which items already have a child note carrying `tag`.
+
+    The notes carrying the tag are listed once for the whole library
+    (prefetch_existing_notes) when that takes fewer requests than checking each item;
+    otherwise the items are checked concurrently (check_tagged_note_exists). Items
+    recorded as having a note created (see RAGPY_ZOTERO_NOTES_DB) are not checked at all.
+
+    Args:
+        library_type: "users" or "groups"
+        library_id: The library ID
+        item_keys: Keys of the parent items
+        tag: Tag of the notes (e.g., "ragpy")
+        api_key: Zotero API key
+        max_workers: Maximum number of requests in flight
+
+    Returns:
+        One entry per item, in input order: True/False, or the ZoteroAPIError raised
+    """
+    recorded = _recorded_items(library_type, library_id, item_keys)
+    if recorded:
+        logger.info(f"{len(recorded)} item(s) already have a note recorded as created")
+    pending = [item_key for item_key in item_keys if item_key not in recorded]
+    found = dict(zip(pending, _check_tagged_notes(
+        library_type, library_id, pending, tag, api_key, max_workers
+    )))
+    return [True if item_key in recorded else found[item_key] for item_key in item_keys]
+
+
+def _check_tagged_notes(
+    library_type: str,
+    library_id: str,
+    item_keys: List[str],
+    tag: str,
+    api_key: str,
+    max_workers: int
+) -> List:
+    """Query Zotero for check_tagged_notes_exist."""
+    if len(item_keys) > 1:
+        try:
+            parent_keys = prefetch_existing_notes(
+                library_type, library_id, api_key, tag, max_requests=len(item_keys) - 1
+            )
+        except ZoteroAPIError as e:
+            logger.warning(f"Could not list the notes tagged {tag}, checking items one by one: {e}")
+            parent_keys = None
+        if parent_keys is not None:
+            return [item_key in parent_keys for item_key in item_keys]
+
+    def check(item_key):
+        try:
+            return check_tagged_note_exists(library_type, library_id, item_key, tag, api_key)
+        except ZoteroAPIError as e:
+            return e
+
+    if len(item_keys) <= 1:
+        return [check(item_key) for item_key in item_keys]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(item_keys))) as executor:
+        return list(executor.map(check, item_keys))
+
+
+def check_notes_exist(
+    library_type: str,
+    library_id: str,
+    checks: List[Tuple[str, str]],
+    api_key: str,
+    max_workers: int = CHECK_WORKERS
+) -> List:
+    """
+    Run check_note_exists for several items concurrently.
+
+    The checks are independent reads, so their round trips overlap on the shared
+    connection pool; a 429 pauses all of them (see _pause_requests). Notes themselves
+    are written serially in batches (create_child_notes_bulk): concurrent writes to one
+    library would only conflict on its version.
+
+    Args:
+        library_type: "users" or "groups"
+        library_id: The library ID
+        checks: (item_key, sentinel) pairs
+        api_key: Zotero API key
+        max_workers: Maximum number of requests in flight
+
+    Returns:
+        One entry per check, in input order: True/False, or the ZoteroAPIError raised
+    """
+    def check(item_key_and_sentinel):
+        item_key, sentinel = item_key_and_sentinel
+        try:
+            return check_note_exists(library_type, library_id, item_key, sentinel, api_key)
+        except ZoteroAPIError as e:
+            return e
+
+    if len(checks) <= 1:
+        return [check(entry) for entry in checks]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(checks))) as executor:
+        return list(executor.map(check, checks))
+
+
+def _note_item(item_key: str, note_html: str, tags: Optional[List[str]] = None) -> Dict:
+    """Payload of a child note for the items endpoint."""
+    return {
         "itemType": "note",
         "note": note_html,
         "parentItem": item_key,
         "tags": [{"tag": tag} for tag in (tags or [])]
     }
 
-    # Generate write token for idempotence
-    write_token = uuid.uuid4().hex
+
+def _write_token(notes: List[Dict]) -> str:
+    """
+    Zotero-Write-Token of a write request, derived from its notes.
+
+    The same notes (parent item key + sentinel, or the note HTML when no sentinel is
+    given) always get the same token, so a request repeated after its response was
+    lost is rejected by Zotero instead of creating duplicate notes.
+    """
+    digest = hashlib.sha256()
+    for note in notes:
+        digest.update(f"{note['item_key']}:{note.get('sentinel') or note['note_html']}\n".encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def _post_notes(
+    library_type: str,
+    library_id: str,
+    note_items: List[Dict],
+    api_key: str,
+    library_version: Optional[str],
+    parent_label: str,
+    write_token: str
+) -> Optional[Tuple[Dict, Optional[str]]]:
+    """
+    POST up to MAX_NOTES_PER_REQUEST note items in one write request, with retries.
+
+    Returns:
+        (parsed response, new library version), or None if every attempt was retried away
+
+    Raises:
+        ZoteroAPIError: On errors that retrying cannot fix, or repeated network errors
+    """
+    prefix = _build_library_prefix(library_type, library_id)
+    url = f"{ZOTERO_API_BASE}/{prefix}/items"
 
     for attempt in range(MAX_RETRIES):
         try:
             # Build headers with version control
             additional_headers = {"Zotero-Write-Token": write_token}
 
-            # Try to get current version if not provided or on retry
-            if library_version is None or attempt > 0:
+            # Get the current version if not provided, or after a conflict without one
+            if library_version is None:
                 try:
                     library_version = get_library_version(library_type, library_id, api_key)
                     additional_headers["If-Unmodified-Since-Version"] = library_version
@@ -274,61 +776,55 @@ def create_child_note(
             headers = _build_headers(api_key, additional_headers)
 
             # Make the request
-            response = requests.post(
+            _wait_if_paused()
+            response = _request(
+                "POST",
                 url,
                 headers=headers,
-                json=[note_item],  # API expects an array
+                json=note_items,  # API expects an array
                 timeout=30
             )
 
             # Handle response
             if response.status_code in (200, 201):
-                result = response.json()
                 new_version = response.headers.get("Last-Modified-Version")
+                if new_version:
+                    # Our write bumped the library version: the next note can use it without a GET
+                    set_library_version(library_type, library_id, new_version)
+                return response.json(), new_version
 
-                # Extract the created note key
-                # According to Zotero API docs, successful["0"] contains the itemKey directly
-                # Response format: {"successful": {"0": "<itemKey>"}, "unchanged": {}, "failed": {}}
-                if "successful" in result and "0" in result["successful"]:
-                    note_key = result["successful"]["0"]
-                    logger.info(f"Successfully created note {note_key} for item {item_key}")
-                    return {
-                        "success": True,
-                        "note_key": note_key,
-                        "message": "Note created successfully",
-                        "new_version": new_version
-                    }
-                else:
-                    logger.error(f"Unexpected response format: {result}")
-                    return {
-                        "success": False,
-                        "message": "Note created but could not extract note key",
-                        "raw_response": result
-                    }
+            elif response.status_code == 412 and "write token" in response.text.lower():
+                # An earlier request with the same notes went through: do not write them again
+                raise ZoteroAPIError(412, "These notes were already written (write token already used)", response)
 
             elif response.status_code == 412:
-                # Version conflict - retry with new version
+                # Version conflict - retry with the current version, which the 412 carries
                 logger.warning(f"Version conflict (412), retrying (attempt {attempt + 1}/{MAX_RETRIES})")
-                library_version = None  # Force refresh on next iteration
-                time.sleep(RETRY_DELAY)
+                library_version = response.headers.get("Last-Modified-Version")
+                if library_version:
+                    set_library_version(library_type, library_id, library_version)
+                else:
+                    invalidate_library_version(library_type, library_id)  # GET it on next iteration
+                time.sleep(_backoff(attempt))
                 continue
 
             elif response.status_code == 429:
                 # Rate limit - respect Retry-After header
-                retry_after = int(response.headers.get("Retry-After", RETRY_DELAY))
-                logger.warning(f"Rate limit (429), waiting {retry_after}s")
-                time.sleep(retry_after)
+                retry_after = _retry_after_delay(response, attempt)
+                logger.warning(f"Rate limit (429), waiting {retry_after:.1f}s")
+                _pause_requests(retry_after)
+                _wait_if_paused()
                 continue
 
             elif response.status_code == 409:
                 # Conflict - possibly locked library
                 logger.warning(f"Conflict (409), retrying (attempt {attempt + 1}/{MAX_RETRIES})")
-                time.sleep(RETRY_DELAY * 2)
+                time.sleep(_backoff(attempt + 1))
                 continue
 
             elif response.status_code == 404:
                 # Parent item not found
-                raise ZoteroAPIError(404, f"Parent item {item_key} not found", response)
+                raise ZoteroAPIError(404, f"{parent_label} not found", response)
 
             elif response.status_code in (401, 403):
                 # Authentication/permission error - no point in retrying
@@ -354,19 +850,158 @@ def create_child_note(
                     response
                 )
 
-        except requests.RequestException as e:
+        except _NETWORK_ERRORS as e:
             logger.error(f"Network error on attempt {attempt + 1}: {e}")
             if attempt < MAX_RETRIES - 1:
-                time.sleep(RETRY_DELAY)
+                time.sleep(_backoff(attempt))
                 continue
             else:
                 raise ZoteroAPIError(0, f"Network error after {MAX_RETRIES} attempts: {str(e)}")
 
-    # Should not reach here, but just in case
-    return {
-        "success": False,
-        "message": f"Failed to create note after {MAX_RETRIES} attempts"
-    }
+    return None
+
+
+def _note_result(result: Dict, index: int, item_key: str, new_version: Optional[str]) -> Dict:
+    """
+    Outcome of the note at `index` of a write request.
+
+    Response format: {"successful": {"0": ...}, "unchanged": {"1": "<itemKey>"}, "failed": {"2": {...}}}
+    """
+    position = str(index)
+    successful = result.get("successful") or {}
+    unchanged = result.get("unchanged") or {}
+    failed = result.get("failed") or {}
+
+    if position in successful or position in unchanged:
+        # According to Zotero API docs, successful["0"] contains the itemKey directly
+        # (newer servers send the full item object instead)
+        entry = successful.get(position, unchanged.get(position))
+        note_key = entry.get("key") if isinstance(entry, dict) else entry
+        logger.info(f"Successfully created note {note_key} for item {item_key}")
+        return {
+            "success": True,
+            "note_key": note_key,
+            "message": "Note created successfully",
+            "new_version": new_version
+        }
+    elif position in failed:
+        entry = failed[position]
+        message = entry.get("message", entry) if isinstance(entry, dict) else entry
+        logger.error(f"Zotero rejected the note for item {item_key}: {message}")
+        return {
+            "success": False,
+            "message": f"Failed to create note: {message}",
+            "raw_response": entry
+        }
+    else:
+        logger.error(f"Unexpected response format: {result}")
+        return {
+            "success": False,
+            "message": "Note created but could not extract note key",
+            "raw_response": result
+        }
+
+
+def create_child_notes_bulk(
+    library_type: str,
+    library_id: str,
+    notes: List[Dict],
+    api_key: str = "",
+    library_version: Optional[str] = None
+) -> List[Dict]:
+    """
+    Create child notes for several Zotero items, MAX_NOTES_PER_REQUEST per write request.
+
+    Each request gets the retry handling of create_child_note and its own write token.
+    Created notes are recorded when RAGPY_ZOTERO_NOTES_DB is set.
+
+    Args:
+        library_type: "users" or "groups"
+        library_id: The library ID
+        notes: Dictionaries with "item_key" (parent item key), "note_html" and optionally
+               "tags" (list of tag names) and "sentinel" (note sentinel, for the write token)
+        api_key: Zotero API key
+        library_version: Optional library version for concurrency control
+
+    Returns:
+        One result dictionary per note, in input order (see create_child_note)
+
+    Raises:
+        ZoteroAPIError: If a write request fails for good; notes of earlier requests
+                        have already been created
+    """
+    results = []
+    for start in range(0, len(notes), MAX_NOTES_PER_REQUEST):
+        batch = notes[start:start + MAX_NOTES_PER_REQUEST]
+        note_items = [_note_item(note["item_key"], note["note_html"], note.get("tags")) for note in batch]
+        parent_label = f"Parent item {batch[0]['item_key']}" if len(batch) == 1 else "Parent item"
+
+        posted = _post_notes(
+            library_type, library_id, note_items, api_key, library_version, parent_label, _write_token(batch)
+        )
+        if posted is None:
+            results.extend(
+                {"success": False, "message": f"Failed to create note after {MAX_RETRIES} attempts"}
+                for _ in batch
+            )
+            library_version = None
+            continue
+
+        result, library_version = posted
+        batch_results = [
+            _note_result(result, index, note["item_key"], library_version)
+            for index, note in enumerate(batch)
+        ]
+        _record_notes(library_type, library_id, [
+            (note["item_key"], note_result["note_key"])
+            for note, note_result in zip(batch, batch_results)
+            if note_result["success"]
+        ])
+        results.extend(batch_results)
+    return results
+
+
+def create_child_note(
+    library_type: str,
+    library_id: str,
+    item_key: str,
+    note_html: str,
+    tags: Optional[List[str]] = None,
+    api_key: str = "",
+    library_version: Optional[str] = None,
+    sentinel: Optional[str] = None
+) -> Dict:
+    """
+    Create a child note for a Zotero item.
+
+    This function implements:
+    - Automatic retry on 412 (version conflict) and 409, with exponential backoff and jitter
+    - Backoff on 429 (rate limit), honoring Retry-After
+    - Write token for idempotence, stable for the same item and note
+
+    Args:
+        library_type: "users" or "groups"
+        library_id: The library ID
+        item_key: The parent item key
+        note_html: HTML content of the note
+        tags: Optional list of tags to add to the note
+        api_key: Zotero API key
+        library_version: Optional library version for concurrency control
+        sentinel: Optional note sentinel; the write token is derived from it (or from
+                  note_html when not given)
+
+    Returns:
+        Dictionary with response data including:
+        - success: bool
+        - note_key: str (if successful)
+        - message: str
+        - new_version: str (if successful)
+
+    Raises:
+        ZoteroAPIError: If all retry attempts fail
+    """
+    note = {"item_key": item_key, "note_html": note_html, "tags": tags, "sentinel": sentinel}
+    return create_child_notes_bulk(library_type, library_id, [note], api_key, library_version)[0]
 
 
 def get_item(
@@ -395,7 +1030,7 @@ def get_item(
     headers = _build_headers(api_key)
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = _request("GET", url, headers=headers, timeout=10)
 
         if response.status_code == 200:
             return response.json()
@@ -407,6 +1042,6 @@ def get_item(
                 f"Failed to get item: {response.text}",
                 response
             )
-    except requests.RequestException as e:
+    except _NETWORK_ERRORS as e:
         logger.error(f"Network error while getting item: {e}")
         raise ZoteroAPIError(0, f"Network error: {str(e)}")
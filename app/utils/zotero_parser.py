@@ -5,14 +5,23 @@ This module extracts library information (library_type, library_id, itemKey)
 from Zotero export JSON files.
 """
 
+import functools
 import os
-import json
 import re
 import logging
-from typing import Dict, List, Optional, Tuple
-from pathlib import Path
+from itertools import islice
+from operator import itemgetter
+from typing import Dict, Iterator, List, Optional, Tuple
+import orjson
 from dotenv import load_dotenv
 
+# Optional: stream the items of large exports instead of parsing the whole file at once
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -21,12 +30,30 @@ logger = logging.getLogger(__name__)
 # Regex to extract library info from Zotero URIs
 # Format: http://zotero.org/users/15681/items/4G3PMW5F
 # Format: http://zotero.org/groups/12345/items/ABC123XY
+# (ASCII: no Unicode case folding; URIs without "zotero.org/" are rejected before the regex)
 URI_PATTERN = re.compile(
     r"zotero\.org/(users|groups)/(\d+)/items/([A-Z0-9]{8})",
-    re.IGNORECASE
+    re.IGNORECASE | re.ASCII
 )
 
 
+# API path names of the library types of the "library" field of modern exports
+LIBRARY_TYPE_NAMES = {"user": "users", "group": "groups"}
+
+# Child item types: only parent items get a reading note
+SKIPPED_ITEM_TYPES = frozenset(("attachment", "note", "annotation"))
+
+# First "uri" value of an export, looked for in its first HEAD_SCAN_BYTES bytes
+URI_FIELD_PATTERN = re.compile(rb'"uri"\s*:\s*"([^"]+)"')
+HEAD_SCAN_BYTES = 32 * 1024
+
+# Items inspected for library info before falling back to .env credentials
+LIBRARY_INFO_PROBE_LIMIT = 20
+
+# Exports from this size on are streamed with ijson; smaller ones are parsed at once with orjson
+STREAM_MIN_BYTES = 50 * 1024 * 1024
+
+
 def extract_library_info_from_uri(uri: str) -> Optional[Tuple[str, str, str]]:
     """
     Extract library information from a Zotero URI.
@@ -41,6 +68,8 @@ def extract_library_info_from_uri(uri: str) -> Optional[Tuple[str, str, str]]:
         >>> extract_library_info_from_uri("http://zotero.org/users/15681/items/4G3PMW5F")
         ("users", "15681", "4G3PMW5F")
     """
+    if "zotero.org/" not in uri:
+        return None
     match = URI_PATTERN.search(uri)
     if match:
         library_type = match.group(1).lower()  # "users" or "groups"
@@ -51,6 +80,61 @@ def extract_library_info_from_uri(uri: str) -> Optional[Tuple[str, str, str]]:
     return None
 
 
+class ZoteroExportFormatError(ValueError):
+    """The JSON file is neither an array of items nor an object with an "items" array."""
+
+
+def iter_export_items(json_path: str) -> Iterator[Dict]:
+    """
+    Yield the items of a Zotero JSON export.
+
+    Zotero exports can be either:
+    1. Direct array: [{item1}, {item2}, ...]
+    2. Object with items key: {"items": [{item1}, {item2}, ...]}
+
+    Exports of STREAM_MIN_BYTES or more are streamed when ijson is installed: only the
+    current item is in memory and parsing stops as soon as the caller stops iterating.
+    Smaller ones are loaded with orjson, which parses a whole file at least as fast.
+
+    Raises:
+        ZoteroExportFormatError: If the top-level structure is not one of the above
+        OSError, ValueError: If the file cannot be read or is not valid JSON
+    """
+    with open(json_path, "rb") as f:
+        if IJSON_AVAILABLE and os.fstat(f.fileno()).st_size >= STREAM_MIN_BYTES:
+            head = f.read(64).lstrip()
+            f.seek(0)
+            if head.startswith(b"\xef\xbb\xbf"):  # UTF-8 BOM
+                head = head[3:].lstrip()
+            if head.startswith(b"["):
+                yield from ijson.items(f, "item")
+                return
+            if head.startswith(b"{"):
+                yield from ijson.items(f, "items.item")
+                return
+
+        raw = f.read()
+
+    data = orjson.loads(raw[3:] if raw.startswith(b"\xef\xbb\xbf") else raw)  # Skip a UTF-8 BOM
+
+    if isinstance(data, list):
+        items = data
+    elif isinstance(data, dict) and "items" in data:
+        items = data["items"]
+        if not isinstance(items, list):
+            raise ZoteroExportFormatError("Invalid Zotero JSON format: 'items' is not an array")
+    else:
+        raise ZoteroExportFormatError(
+            f"Invalid Zotero JSON format: expected array or object with 'items' key, got {type(data).__name__}"
+        )
+    yield from items
+
+
+# Zotero JSON lookup: subdirectory levels searched, and attachment folders skipped
+ZOTERO_JSON_MAX_DEPTH = 2
+ATTACHMENT_DIR_NAMES = ("storage", "attachments", "files")
+
+
 def find_zotero_json(session_dir: str) -> Optional[str]:
     """
     Find the Zotero JSON file in a session directory.
@@ -61,14 +145,28 @@ def find_zotero_json(session_dir: str) -> Optional[str]:
     Returns:
         Path to the JSON file if found, None otherwise
     """
-    session_path = Path(session_dir)
-
-    if not session_path.exists() or not session_path.is_dir():
+    if not os.path.isdir(session_dir):
         logger.error(f"Session directory does not exist: {session_dir}")
         return None
 
-    # Look for JSON files
-    json_files = list(session_path.glob("**/*.json"))
+    # Look for JSON files, at most ZOTERO_JSON_MAX_DEPTH levels down and outside the
+    # attachment folders (one stat per file, cached by os.scandir)
+    json_files = []  # (path, size)
+    pending_dirs = [(session_dir, 0)]
+    while pending_dirs:
+        directory, depth = pending_dirs.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError as e:
+            logger.warning(f"Cannot list {directory}: {e}")
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if depth < ZOTERO_JSON_MAX_DEPTH and entry.name.lower() not in ATTACHMENT_DIR_NAMES:
+                        pending_dirs.append((entry.path, depth + 1))
+                elif entry.name.lower().endswith(".json") and entry.is_file():
+                    json_files.append((entry.path, entry.stat().st_size))
 
     if not json_files:
         logger.warning(f"No JSON files found in {session_dir}")
@@ -76,10 +174,109 @@ def find_zotero_json(session_dir: str) -> Optional[str]:
 
     # If multiple JSON files, prefer the largest one (likely the main export)
     if len(json_files) > 1:
-        json_files.sort(key=lambda p: p.stat().st_size, reverse=True)
-        logger.info(f"Found {len(json_files)} JSON files, using largest: {json_files[0].name}")
+        json_path = max(json_files, key=itemgetter(1))[0]
+        logger.info(f"Found {len(json_files)} JSON files, using largest: {os.path.basename(json_path)}")
+        return json_path
+
+    return json_files[0][0]
+
+
+def _library_info_from_head(json_path: str) -> Optional[Tuple[str, str]]:
+    """
+    (library_type, library_id) from the first item URI found in the start of the file.
+
+    Lets extract_library_info_from_session skip parsing the export in the common case;
+    None when the start of the file has no usable URI.
+    """
+    try:
+        with open(json_path, "rb") as f:
+            head = f.read(HEAD_SCAN_BYTES)
+    except OSError:
+        return None
+    match = URI_FIELD_PATTERN.search(head)
+    if not match:
+        return None
+    lib_info = extract_library_info_from_uri(match.group(1).decode("utf-8", errors="replace"))
+    return lib_info[:2] if lib_info else None
+
+
+@functools.lru_cache(maxsize=128)
+def _library_info_from_json(json_path: str, mtime_ns: int, size: int) -> Optional[Dict]:
+    """
+    Library info found in the export itself (result of extract_library_info_from_session),
+    or None if its items do not carry it.
+
+    Cached per file version: mtime_ns and size are part of the key, so a rewritten
+    export is parsed again. Callers must copy the returned dictionary.
+    """
+    # Fast path: the first item URI, from the start of the file without parsing it
+    lib_info = _library_info_from_head(json_path)
+    if lib_info:
+        library_type, library_id = lib_info
+        logger.info(f"Extracted library info from URI: type={library_type}, id={library_id}")
+        return {
+            "success": True,
+            "library_type": library_type,
+            "library_id": library_id,
+            "json_path": json_path
+        }
+
+    # Extract library info from the first items (try multiple methods); a streamed
+    # file is only read up to the item that carries it
+    item_count = 0
+    try:
+        for item in islice(iter_export_items(json_path), LIBRARY_INFO_PROBE_LIMIT):
+            item_count += 1
+
+            # Method 1: Modern format - check "library" field
+            library_field = item.get("library")
+            if library_field and isinstance(library_field, dict):
+                lib_type = library_field.get("type")  # "user" or "group"
+                lib_id = library_field.get("id")
+
+                if lib_type and lib_id:
+                    # Convert "user" → "users", "group" → "groups" for API compatibility
+                    library_type = LIBRARY_TYPE_NAMES.get(lib_type, lib_type)
+                    library_id = str(lib_id)
+                    logger.info(f"Extracted library info from 'library' field: type={library_type}, id={library_id}")
+                    return {
+                        "success": True,
+                        "library_type": library_type,
+                        "library_id": library_id,
+                        "json_path": json_path
+                    }
+
+            # Method 2: Legacy format - extract from URI
+            uri = item.get("uri")
+            if uri:
+                lib_info = extract_library_info_from_uri(uri)
+                if lib_info:
+                    library_type, library_id, _ = lib_info
+                    logger.info(f"Extracted library info from URI: type={library_type}, id={library_id}")
+                    return {
+                        "success": True,
+                        "library_type": library_type,
+                        "library_id": library_id,
+                        "json_path": json_path
+                    }
+    except ZoteroExportFormatError as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+    except Exception as e:
+        logger.error(f"Error reading JSON file {json_path}: {e}")
+        return {
+            "success": False,
+            "error": f"Failed to read JSON file: {str(e)}"
+        }
 
-    return str(json_files[0])
+    if not item_count:
+        return {
+            "success": False,
+            "error": "No items found in Zotero JSON"
+        }
+    return None
 
 
 def extract_library_info_from_session(session_dir: str) -> Dict:
@@ -91,6 +288,10 @@ def extract_library_info_from_session(session_dir: str) -> Dict:
     2. Legacy format: Parse item["uri"] to extract library info
     3. Fallback: Use ZOTERO_USER_ID or ZOTERO_GROUP_ID from .env
 
+    A "uri" field in the first 32 KiB of the file is used directly, without parsing it.
+    Otherwise only the first LIBRARY_INFO_PROBE_LIMIT items are inspected. The result
+    is cached until the file changes (is_zotero_export shares it).
+
     Args:
         session_dir: Path to the session directory (e.g., "uploads/<session>/")
 
@@ -120,81 +321,10 @@ def extract_library_info_from_session(session_dir: str) -> Dict:
             "error": "No Zotero JSON file found in session directory"
         }
 
-    # Parse the JSON
-    try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception as e:
-        logger.error(f"Error reading JSON file {json_path}: {e}")
-        return {
-            "success": False,
-            "error": f"Failed to read JSON file: {str(e)}"
-        }
-
-    # Normalize the data structure
-    # Zotero exports can be either:
-    # 1. Direct array: [{item1}, {item2}, ...]
-    # 2. Object with items key: {"items": [{item1}, {item2}, ...]}
-    if isinstance(data, list):
-        # Format 1: Direct array
-        items = data
-        logger.info(f"Detected Zotero JSON format: direct array with {len(items)} items")
-    elif isinstance(data, dict) and "items" in data:
-        # Format 2: Object with items key
-        items = data["items"]
-        logger.info(f"Detected Zotero JSON format: object with 'items' key, {len(items)} items")
-    else:
-        return {
-            "success": False,
-            "error": f"Invalid Zotero JSON format: expected array or object with 'items' key, got {type(data).__name__}"
-        }
-
-    # Validate items
-    if not isinstance(items, list):
-        return {
-            "success": False,
-            "error": "Invalid Zotero JSON format: 'items' is not an array"
-        }
-
-    if not items:
-        return {
-            "success": False,
-            "error": "No items found in Zotero JSON"
-        }
-
-    # Extract library info from items (try multiple methods)
-    for item in items:
-        # Method 1: Modern format - check "library" field
-        library_field = item.get("library")
-        if library_field and isinstance(library_field, dict):
-            lib_type = library_field.get("type")  # "user" or "group"
-            lib_id = library_field.get("id")
-
-            if lib_type and lib_id:
-                # Convert "user" → "users", "group" → "groups" for API compatibility
-                library_type = "users" if lib_type == "user" else "groups" if lib_type == "group" else lib_type
-                library_id = str(lib_id)
-                logger.info(f"Extracted library info from 'library' field: type={library_type}, id={library_id}")
-                return {
-                    "success": True,
-                    "library_type": library_type,
-                    "library_id": library_id,
-                    "json_path": json_path
-                }
-
-        # Method 2: Legacy format - extract from URI
-        uri = item.get("uri")
-        if uri:
-            lib_info = extract_library_info_from_uri(uri)
-            if lib_info:
-                library_type, library_id, _ = lib_info
-                logger.info(f"Extracted library info from URI: type={library_type}, id={library_id}")
-                return {
-                    "success": True,
-                    "library_type": library_type,
-                    "library_id": library_id,
-                    "json_path": json_path
-                }
+    stat = os.stat(json_path)
+    result = _library_info_from_json(json_path, stat.st_mtime_ns, stat.st_size)
+    if result is not None:
+        return dict(result)
 
     # Method 3: Fallback to credentials from .env
     logger.warning("Could not extract library info from JSON items, checking .env credentials")
@@ -226,6 +356,45 @@ def extract_library_info_from_session(session_dir: str) -> Dict:
     }
 
 
+def iter_item_keys_from_json(json_path: str) -> Iterator[Dict]:
+    """
+    Yield the item keys and basic metadata of a Zotero JSON file, item by item.
+
+    Same items as extract_item_keys_from_json, without building the list: a caller
+    that stops early (e.g. a preview) only reads the start of a streamed export.
+
+    Raises:
+        ZoteroExportFormatError: If the top-level structure is not a Zotero export
+        OSError, ValueError: If the file cannot be read or is not valid JSON
+    """
+    uri_search = URI_PATTERN.search
+
+    for item in iter_export_items(json_path):
+        # Skip attachments, notes and annotations (we only want parent items)
+        item_type = item.get("itemType", "")
+        if item_type in SKIPPED_ITEM_TYPES:
+            continue
+
+        # Extract itemKey (try multiple field names)
+        item_key = item.get("itemKey") or item.get("key")  # Modern exports use "key", legacy use "itemKey"
+
+        if not item_key:
+            # Try to extract from URI as last resort (only the item key is needed)
+            match = uri_search(item.get("uri") or "")
+            if match:
+                item_key = match.group(3)
+
+        if item_key:
+            yield {
+                "itemKey": item_key,
+                "title": item.get("title", "Untitled"),
+                "itemType": item_type,
+                "uri": item.get("uri", "")
+            }
+        else:
+            logger.warning(f"Could not extract itemKey for item: {item.get('title', 'Untitled')}")
+
+
 def extract_item_keys_from_json(json_path: str) -> List[Dict]:
     """
     Extract all item keys and basic metadata from a Zotero JSON file.
@@ -248,51 +417,14 @@ def extract_item_keys_from_json(json_path: str) -> List[Dict]:
         ...     print(f"{item['itemKey']}: {item['title']}")
     """
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        items_info = list(iter_item_keys_from_json(json_path))
+    except ZoteroExportFormatError as e:
+        logger.error(f"Invalid JSON structure in {json_path}: {e}")
+        return []
     except Exception as e:
         logger.error(f"Error reading JSON file {json_path}: {e}")
         return []
 
-    # Normalize the data structure (same as extract_library_info_from_session)
-    if isinstance(data, list):
-        # Format 1: Direct array
-        items = data
-    elif isinstance(data, dict) and "items" in data:
-        # Format 2: Object with items key
-        items = data["items"]
-    else:
-        logger.error(f"Invalid JSON structure: expected array or object with 'items' key, got {type(data).__name__}")
-        return []
-
-    items_info = []
-
-    for item in items:
-        # Skip attachments and notes (we only want parent items)
-        item_type = item.get("itemType", "")
-        if item_type in ("attachment", "note"):
-            continue
-
-        # Extract itemKey (try multiple field names)
-        item_key = item.get("itemKey") or item.get("key")  # Modern exports use "key", legacy use "itemKey"
-
-        if not item_key:
-            # Try to extract from URI as last resort
-            uri = item.get("uri", "")
-            lib_info = extract_library_info_from_uri(uri)
-            if lib_info:
-                item_key = lib_info[2]
-
-        if item_key:
-            items_info.append({
-                "itemKey": item_key,
-                "title": item.get("title", "Untitled"),
-                "itemType": item_type,
-                "uri": item.get("uri", "")
-            })
-        else:
-            logger.warning(f"Could not extract itemKey for item: {item.get('title', 'Untitled')}")
-
     logger.info(f"Extracted {len(items_info)} item keys from {json_path}")
     return items_info
 
@@ -4,6 +4,6 @@ Package core - Structures de données communes
 Contient les classes et utilitaires partagés par tous les modules du pipeline RAGpy.
 """
 
-from .document import Document
+from .document import Document, document_batch_timestamp
 
-__all__ = ["Document"]
+__all__ = ["Document", "document_batch_timestamp"]
@@ -5,14 +5,47 @@ Définit la structure de données commune à toutes les sources d'ingestion
 (PDF/OCR, CSV, futures sources). Garantit l'uniformité du pipeline.
 """
 
-from dataclasses import dataclass, field
-from typing import Dict, Any, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Any, Iterator, Optional
 import logging
+import re
+
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# Équivaut à len(texte.strip()) >= 10 sans copier le texte : un caractère non blanc
+# suivi, 9 caractères plus loin ou au-delà, d'un autre (s'arrête dès qu'il le trouve)
+_MIN_TEXT_PATTERN = re.compile(r"\s*\S[\s\S]{8}\s*\S")
+
+# Horodatage partagé par les Documents créés dans document_batch_timestamp()
+_batch_timestamp: ContextVar[Optional[str]] = ContextVar("document_batch_timestamp", default=None)
+
+
+@contextmanager
+def document_batch_timestamp() -> Iterator[str]:
+    """
+    Donne le même 'ingested_at' à tous les Documents créés dans le bloc.
+
+    Évite un appel à datetime.now().isoformat() par Document lors d'une
+    ingestion en masse.
+
+    Exemple:
+        >>> with document_batch_timestamp():
+        ...     docs = [Document(texteocr=t) for t in textes]
+    """
+    timestamp = datetime.now().isoformat()
+    token = _batch_timestamp.set(timestamp)
+    try:
+        yield timestamp
+    finally:
+        _batch_timestamp.reset(token)
+
 
-@dataclass
+@dataclass(init=False)
 class Document:
     """
     Représentation unifiée d'un document dans le pipeline RAGpy.
@@ -58,9 +91,19 @@ class Document:
         ... )
     """
 
+    # __slots__ explicites (dataclass(slots=True) demande Python 3.10) : pas de __dict__
+    # par Document. Les valeurs par défaut sont donc dans __init__, pas sur la classe.
+    __slots__ = ("texteocr", "meta", "source_type")
+
     texteocr: str
-    meta: Dict[str, Any] = field(default_factory=dict)
-    source_type: Optional[str] = None
+    meta: Dict[str, Any]
+    source_type: Optional[str]
+
+    def __init__(self, texteocr: str, meta: Optional[Dict[str, Any]] = None, source_type: Optional[str] = None):
+        self.texteocr = texteocr
+        self.meta = {} if meta is None else meta
+        self.source_type = source_type
+        self.__post_init__()
 
     def __post_init__(self):
         """
@@ -93,7 +136,7 @@ class Document:
             )
 
         # Avertir si texteocr est très court (possiblement une erreur)
-        if len(self.texteocr.strip()) < 10:
+        if not _MIN_TEXT_PATTERN.match(self.texteocr):
             logger.warning(
                 f"Document avec texteocr très court ({len(self.texteocr)} caractères). "
                 f"Métadonnées: {self.meta.get('filename', self.meta.get('title', 'N/A'))}"
@@ -105,17 +148,16 @@ class Document:
 
         Ajoute:
         - source_type: si fourni à l'initialisation
-        - ingested_at: timestamp ISO de création du Document
+        - ingested_at: timestamp ISO de création du Document (ou du lot,
+          voir document_batch_timestamp)
         """
-        from datetime import datetime
-
         # Ajouter source_type dans meta s'il est fourni
         if self.source_type and "source_type" not in self.meta:
             self.meta["source_type"] = self.source_type
 
         # Ajouter timestamp d'ingestion s'il n'existe pas
         if "ingested_at" not in self.meta:
-            self.meta["ingested_at"] = datetime.now().isoformat()
+            self.meta["ingested_at"] = _batch_timestamp.get() or datetime.now().isoformat()
 
     def to_dict(self) -> Dict[str, Any]:
         """
@@ -129,6 +171,15 @@ class Document:
             **self.meta
         }
 
+    def to_orjson(self) -> bytes:
+        """
+        Sérialise le Document en JSON (bytes UTF-8), par exemple pour une ligne JSONL.
+
+        Returns:
+            JSON de to_dict(), sérialisé par orjson
+        """
+        return orjson.dumps(self.to_dict())
+
     @classmethod
     def from_dict(cls, data: Dict[str, Any], text_field: str = "texteocr") -> "Document":
         """
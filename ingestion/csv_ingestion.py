@@ -23,7 +23,7 @@ except ImportError:
         "d'encodage ne sera pas disponible. Installez-le via: pip install chardet"
     )
 
-from core.document import Document
+from core.document import Document, document_batch_timestamp
 
 logger = logging.getLogger(__name__)
 
@@ -251,6 +251,11 @@ def csv_row_to_document(
     # Nettoyer les noms de colonnes
     meta_dict = {sanitize_column_name(k): sanitize_metadata_value(v) for k, v in meta_dict.items()}
 
+    return _csv_document(texteocr, meta_dict, row_index)
+
+
+def _csv_document(texteocr: str, meta_dict: Dict[str, Any], row_index: Optional[int]) -> Document:
+    """Complète les métadonnées nettoyées d'une ligne CSV et crée son Document."""
     # Ajouter row_index si fourni
     if row_index is not None:
         meta_dict["row_index"] = row_index
@@ -354,32 +359,46 @@ def ingest_csv(
     # Mise à jour du text_column si nécessaire
     config.text_column = sanitize_column_name(config.text_column)
 
-    # Conversion en Documents
+    # Conversion en Documents : les valeurs sont lues une seule fois (df.values, comme
+    # iterrows) au lieu de construire une Series par ligne ; mêmes règles que csv_row_to_document
     documents = []
     skipped_count = 0
 
-    for idx, row in df.iterrows():
-        try:
-            doc = csv_row_to_document(
-                row,
-                text_column=config.text_column,
-                meta_columns=config.meta_columns,
-                row_index=idx if config.add_row_index else None,
-            )
-            documents.append(doc)
-
-        except ValueError as e:
-            # Texte vide
-            if config.skip_empty:
-                skipped_count += 1
-                logger.debug(f"Ligne {idx} ignorée (texte vide): {e}")
-            else:
-                logger.error(f"Ligne {idx} échouée: {e}")
-                raise
-
-        except Exception as e:
-            logger.error(f"Erreur lors du traitement de la ligne {idx}: {e}")
-            raise CSVIngestionError(f"Échec ligne {idx}: {e}")
+    columns = list(df.columns)
+    text_position = columns.index(config.text_column)
+    if config.meta_columns:
+        meta_positions = [columns.index(col) for col in config.meta_columns if col in columns]
+    else:
+        meta_positions = [j for j, col in enumerate(columns) if col != config.text_column]
+    meta_names = [(sanitize_column_name(columns[j]), j) for j in meta_positions]
+
+    # Un seul horodatage d'ingestion pour tout le fichier
+    with document_batch_timestamp():
+        for idx, values in zip(df.index, df.values):
+            row_index = idx if config.add_row_index else None
+            try:
+                texteocr = str(values[text_position]).strip()
+                if not texteocr:
+                    raise ValueError(
+                        f"Texte vide pour la ligne (index={row_index}). "
+                        f"Contenu: {dict(zip(columns, values))}"
+                    )
+
+                meta_dict = {name: sanitize_metadata_value(values[j]) for name, j in meta_names}
+                documents.append(_csv_document(texteocr, meta_dict, row_index))
+
+            except ValueError as e:
+                # Texte vide
+                if config.skip_empty:
+                    skipped_count += 1
+                    logger.debug(f"Ligne {idx} ignorée (texte vide): {e}")
+                else:
+                    logger.error(f"Ligne {idx} échouée: {e}")
+                    raise
+
+            except Exception as e:
+                logger.error(f"Erreur lors du traitement de la ligne {idx}: {e}")
+                raise CSVIngestionError(f"Échec ligne {idx}: {e}")
 
     logger.info(
         f"Ingestion CSV terminée: {len(documents)} documents créés, "
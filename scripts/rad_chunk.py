@@ -1,8 +1,10 @@
 import os
+import base64
 import json
 import random
 import time
 import threading
+import numpy as np
 import pandas as pd
 import argparse
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -13,6 +15,7 @@ from collections import Counter
 from dotenv import load_dotenv, find_dotenv, set_key
 import subprocess # Added for spacy download subprocess
 import logging
+from contextlib import contextmanager
 
 # Attempt to import RecursiveCharacterTextSplitter from langchain_text_splitters
 try:
@@ -358,6 +361,15 @@ def get_embeddings_batch(texts, model="text-embedding-3-large"):
             print(f"Échec du calcul des embeddings pour le lot après nouvelle tentative: {e_retry}")
             return [None] * len(texts) # Retourne None pour les embeddings échoués
 
+# Les vecteurs denses sont stockés en float16 little-endian encodé en base64 : deux fois
+# moins d'octets que du float32 brut et bien moins que des listes JSON à parser.
+# Relus par rad_vectordb.dense_embedding().
+EMBEDDING_F16_KEY = "embedding_f16_b64"
+
+def encode_embedding(embedding):
+    """Encode un vecteur dense (liste de flottants) en float16 base64."""
+    return base64.b64encode(np.asarray(embedding, dtype="<f2").tobytes()).decode("ascii")
+
 def process_chunks_for_embedding(chunks_batch):
     """
     Traite un lot de chunks pour y ajouter les embeddings denses.
@@ -368,7 +380,7 @@ def process_chunks_for_embedding(chunks_batch):
     
     for i, embedding in enumerate(embeddings):
         if embedding is not None:
-            chunks_batch[i]["embedding"] = embedding
+            chunks_batch[i][EMBEDDING_F16_KEY] = encode_embedding(embedding)
         else:
             # Marquer l'échec ou laisser vide, selon la stratégie souhaitée
             chunks_batch[i]["embedding"] = None 
@@ -383,6 +395,23 @@ def save_processed_chunks_to_json_overwrite(all_chunks, json_file):
         json.dump(all_chunks, f, ensure_ascii=False, indent=2)
     print(f"Tous les chunks ({len(all_chunks)}) ont été sauvegardés dans {json_file}")
 
+def embed_chunks_by_length(chunks, temp_output_file=None):
+    """
+    Ajoute les embeddings denses à `chunks`, par lots qui mélangent tous les documents.
+    Tri par longueur de texte : chaque lot regroupe des textes de taille voisine. Les chunks
+    sont modifiés en place, la liste `chunks` garde donc son ordre; elle est retournée.
+    Si `temp_output_file` est donné, les chunks déjà traités y sont sauvegardés environ
+    tous les 1000 chunks.
+    """
+    by_length = sorted(chunks, key=lambda chunk: len(chunk.get("text", "") or ""))
+    for start in tqdm(range(0, len(by_length), DEFAULT_EMBEDDING_BATCH_SIZE), desc="Génération Embeddings (lots)"):
+        end = start + DEFAULT_EMBEDDING_BATCH_SIZE
+        process_chunks_for_embedding(by_length[start:end])
+        if temp_output_file and end < len(by_length) and end % 1000 < DEFAULT_EMBEDDING_BATCH_SIZE: # Approx every 1000
+            save_processed_chunks_to_json_overwrite(by_length[:end], temp_output_file)
+            print(f"Sauvegarde temporaire de {end} chunks avec embeddings dans '{temp_output_file}'.")
+    return chunks
+
 def generate_and_save_embeddings(input_json_file, output_json_file=None):
     """
     Charge les chunks depuis `input_json_file`, génère les embeddings denses,
@@ -400,44 +429,9 @@ def generate_and_save_embeddings(input_json_file, output_json_file=None):
         all_chunks_from_file = json.load(f)
     
     print(f"Chargement de {len(all_chunks_from_file)} chunks depuis '{input_json_file}' pour génération d'embeddings.")
-    
-    # Regrouper par doc_id pour le suivi, bien que le traitement soit par lot global de chunks
-    chunks_by_doc = {}
-    for chunk in all_chunks_from_file:
-        doc_id = chunk.get("doc_id", "unknown_doc")
-        if doc_id not in chunks_by_doc:
-            chunks_by_doc[doc_id] = []
-        chunks_by_doc[doc_id].append(chunk)
-        
-    all_chunks_with_embeddings = []
-    
-    # Traiter tous les chunks en lots, indépendamment de leur document d'origine pour l'embedding
-    # La structure de tqdm est modifiée pour refléter le traitement par lots de chunks plutôt que par documents.
-    
-    # Flatten list of chunks if it's grouped by doc (it's already flat from file load)
-    # all_chunks_flat = [chunk for doc_chunks in chunks_by_doc.values() for chunk in doc_chunks]
-    # The master code iterates through chunks_by_doc.items(), then batches within each doc.
-    # This is less efficient for API calls if docs are small. Let's follow master code structure.
-
-    processed_chunk_count = 0
-    for doc_id, doc_chunks_list in tqdm(chunks_by_doc.items(), desc="Génération Embeddings (par document)"):
-        print(f"  Traitement du document {doc_id} ({len(doc_chunks_list)} chunks) pour embeddings...")
-        
-        embedded_doc_chunks = []
-        for i in range(0, len(doc_chunks_list), DEFAULT_EMBEDDING_BATCH_SIZE):
-            batch = doc_chunks_list[i : i + DEFAULT_EMBEDDING_BATCH_SIZE]
-            processed_batch = process_chunks_for_embedding(batch) # Modifies batch in-place
-            embedded_doc_chunks.extend(processed_batch)
-            # print(f"    Lot {i // DEFAULT_EMBEDDING_BATCH_SIZE + 1} traité pour doc {doc_id}")
-        
-        all_chunks_with_embeddings.extend(embedded_doc_chunks)
-        processed_chunk_count += len(embedded_doc_chunks)
 
-        # Sauvegarde intermédiaire (optionnelle)
-        if processed_chunk_count > 0 and processed_chunk_count % 1000 < DEFAULT_EMBEDDING_BATCH_SIZE : # Approx every 1000
-            temp_output_file = f"{os.path.splitext(output_json_file)[0]}_temp_embeddings.json"
-            save_processed_chunks_to_json_overwrite(all_chunks_with_embeddings, temp_output_file)
-            print(f"Sauvegarde temporaire de {len(all_chunks_with_embeddings)} chunks avec embeddings dans '{temp_output_file}'.")
+    temp_output_file = f"{os.path.splitext(output_json_file)[0]}_temp_embeddings.json"
+    all_chunks_with_embeddings = embed_chunks_by_length(all_chunks_from_file, temp_output_file)
 
     save_processed_chunks_to_json_overwrite(all_chunks_with_embeddings, output_json_file)
     print(f"Tous les embeddings denses ont été générés. Total {len(all_chunks_with_embeddings)} chunks sauvegardés dans '{output_json_file}'.")
@@ -529,158 +523,257 @@ def generate_sparse_embeddings(input_json_file=DEFAULT_INPUT_JSON_WITH_EMBEDDING
     print(f"Traitement des embeddings sparses terminé. Fichier sauvegardé: {output_json_file}")
     return output_json_file
 
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description="Process text data through chunking and embedding phases.")
-    parser.add_argument("--input", required=True, help="Path to the input file (CSV for 'initial' phase, JSON for 'dense' and 'sparse' phases).")
-    parser.add_argument("--output", required=True, help="Directory to save the output JSON files.")
-    parser.add_argument("--phase", choices=['initial', 'dense', 'sparse', 'all'], default='all',
-                        help="Specify processing phase: 'initial' (chunking), 'dense' (dense embeddings), 'sparse' (sparse embeddings), or 'all'.")
-    parser.add_argument("--model", type=str, default="gpt-4o-mini",
-                        help="LLM model for text recoding. Use 'gpt-4o-mini' (OpenAI) or 'openai/gemini-2.5-flash' (OpenRouter). Default: gpt-4o-mini")
-
-    args = parser.parse_args()
-
-    # Setup logging for chunking phase
-    chunking_log_path = os.path.join(args.output, "chunking.log")
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.FileHandler(chunking_log_path, mode='a', encoding='utf-8'),
-            logging.StreamHandler()
-        ]
-    )
-    logger = logging.getLogger("chunking")
+# ----------------------------------------------------------------------
+# Phase entrypoints (importable by app.main, also used by the CLI below)
+# ----------------------------------------------------------------------
+logger = logging.getLogger("chunking")
+logger.setLevel(logging.INFO)
 
-    # Ensure output directory exists
-    if not os.path.exists(args.output):
-        try:
-            os.makedirs(args.output, exist_ok=True)
-            print(f"Output directory '{args.output}' created.")
-            logger.info(f"Output directory '{args.output}' created.")
-        except Exception as e:
-            print(f"Error creating output directory '{args.output}': {e}")
-            logger.error(f"Error creating output directory '{args.output}': {e}")
-            exit(1)
+_LOG_HANDLERS = {}  # chemin du log -> [handler, nombre de phases en cours]
+_LOG_HANDLERS_LOCK = threading.Lock()
 
-    # Determine filenames based on the phase and input.
+@contextmanager
+def chunking_log(output_dir):
+    """
+    Ajoute `chunking.log` dans `output_dir` au logger "chunking" le temps d'une phase.
+    Des phases simultanées sur le même dossier (voir run_both) partagent le même handler.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    log_path = os.path.abspath(os.path.join(output_dir, "chunking.log"))
+    with _LOG_HANDLERS_LOCK:
+        entry = _LOG_HANDLERS.get(log_path)
+        if entry is None:
+            handler = logging.FileHandler(log_path, mode='a', encoding='utf-8')
+            handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+            logger.addHandler(handler)
+            entry = _LOG_HANDLERS[log_path] = [handler, 0]
+        entry[1] += 1
+    try:
+        yield
+    finally:
+        with _LOG_HANDLERS_LOCK:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _LOG_HANDLERS[log_path]
+                logger.removeHandler(entry[0])
+                entry[0].close()
+
+def _report(message, level=logging.INFO):
+    print(message)
+    logger.log(level, message)
+
+def output_paths(input_path, output_dir, phase):
+    """
+    Retourne les chemins (chunks initiaux, embeddings denses, embeddings sparses) d'une phase.
+    """
     base_name_for_outputs = "output" # Consistent with main.py's expectation for intermediate files
-    if args.phase == "dense" or args.phase == "sparse":
-        input_basename = os.path.splitext(os.path.basename(args.input))[0]
+    if phase in ("dense", "sparse", "both"):
+        input_basename = os.path.splitext(os.path.basename(input_path))[0]
         if input_basename.endswith("_chunks_with_embeddings"):
             base_name_for_outputs = input_basename.replace("_chunks_with_embeddings", "")
         elif input_basename.endswith("_chunks"):
             base_name_for_outputs = input_basename.replace("_chunks", "")
 
-    initial_chunks_json = os.path.join(args.output, f"{base_name_for_outputs}_chunks.json")
-    chunks_with_dense_json = os.path.join(args.output, f"{base_name_for_outputs}_chunks_with_embeddings.json")
-    chunks_with_sparse_json = os.path.join(args.output, f"{base_name_for_outputs}_chunks_with_embeddings_sparse.json")
+    return (
+        os.path.join(output_dir, f"{base_name_for_outputs}_chunks.json"),
+        os.path.join(output_dir, f"{base_name_for_outputs}_chunks_with_embeddings.json"),
+        os.path.join(output_dir, f"{base_name_for_outputs}_chunks_with_embeddings_sparse.json"),
+    )
 
-    print(f"rad_chunk.py - Phase: {args.phase}")
-    print(f"  Input File: {args.input}")
-    print(f"  Output Directory: {args.output}")
-    print(f"  Initial Chunks JSON: {initial_chunks_json}")
-    print(f"  Dense Embeddings JSON: {chunks_with_dense_json}")
-    print(f"  Sparse Embeddings JSON: {chunks_with_sparse_json}")
-    logger.info(f"rad_chunk.py - Phase: {args.phase}")
-    logger.info(f"  Input File: {args.input}")
-    logger.info(f"  Output Directory: {args.output}")
-    logger.info(f"  Initial Chunks JSON: {initial_chunks_json}")
-    logger.info(f"  Dense Embeddings JSON: {chunks_with_dense_json}")
-    logger.info(f"  Sparse Embeddings JSON: {chunks_with_sparse_json}")
-    
+def _ensure_initialized():
     if TEXT_SPLITTER is None:
-        print("Erreur critique: TEXT_SPLITTER n'est pas initialisé (langchain_text_splitters manquant?). Arrêt.")
-        logger.error("Erreur critique: TEXT_SPLITTER n'est pas initialisé (langchain_text_splitters manquant?). Arrêt.")
-        exit(1)
+        raise RuntimeError("TEXT_SPLITTER n'est pas initialisé (langchain_text_splitters manquant?).")
     if nlp is None:
-        print("Erreur critique: Modèle spaCy (nlp) n'est pas initialisé. Arrêt.")
-        logger.error("Erreur critique: Modèle spaCy (nlp) n'est pas initialisé. Arrêt.")
-        exit(1)
+        raise RuntimeError("Modèle spaCy (nlp) n'est pas initialisé.")
     if client is None:
-        print("Erreur critique: Client OpenAI non initialisé (OPENAI_API_KEY manquante?). Arrêt.")
-        logger.error("Erreur critique: Client OpenAI non initialisé (OPENAI_API_KEY manquante?). Arrêt.")
-        exit(1)
+        raise RuntimeError("Client OpenAI non initialisé (OPENAI_API_KEY manquante?).")
 
-    # Phase-specific execution
-    if args.phase == 'initial' or args.phase == 'all':
-        print("\n--- Phase 3.1 : Découpage initial (initial chunk) ---")
-        logger.info("=== Phase 3.1 : Découpage initial (initial chunk) ===")
-        if not args.input.lower().endswith(".csv"):
-            print(f"Erreur: La phase 'initial' attend un fichier CSV en entrée, reçu: {args.input}")
-            logger.error(f"Erreur: La phase 'initial' attend un fichier CSV en entrée, reçu: {args.input}")
-            exit(1)
-        try:
-            df = pd.read_csv(args.input)
-            print(f"Chargement de {len(df)} lignes depuis '{args.input}'.")
-            logger.info(f"Chargement de {len(df)} lignes depuis '{args.input}'.")
-        except FileNotFoundError:
-            print(f"Erreur: Le fichier d'entrée CSV '{args.input}' n'a pas été trouvé.")
-            logger.error(f"Erreur: Le fichier d'entrée CSV '{args.input}' n'a pas été trouvé.")
-            exit(1)
-        except Exception as e:
-            print(f"Erreur lors du chargement du fichier CSV '{args.input}': {e}")
-            logger.error(f"Erreur lors du chargement du fichier CSV '{args.input}': {e}")
-            exit(1)
+def _ensure_output(path, description):
+    if path is None or not os.path.exists(path) or os.path.getsize(path) == 0:
+        raise RuntimeError(f"Le fichier {description} '{path}' n'a pas été généré ou est vide.")
+
+def run_initial(input_csv, output_dir, model="gpt-4o-mini"):
+    """
+    Phase 'initial' : découpe les documents de `input_csv` en chunks recodés.
+    Retourne le chemin du JSON de chunks; lève une exception en cas d'échec.
+    """
+    initial_chunks_json, _, _ = output_paths(input_csv, output_dir, "initial")
+    with chunking_log(output_dir):
+        _ensure_initialized()
+        _report("\n--- Phase 3.1 : Découpage initial (initial chunk) ---")
+        if not input_csv.lower().endswith(".csv"):
+            raise ValueError(f"La phase 'initial' attend un fichier CSV en entrée, reçu: {input_csv}")
+        df = pd.read_csv(input_csv)
+        _report(f"Chargement de {len(df)} lignes depuis '{input_csv}'.")
 
         if os.path.exists(initial_chunks_json):
-            print(f"Nettoyage du fichier de chunks existant: {initial_chunks_json}")
-            logger.info(f"Nettoyage du fichier de chunks existant: {initial_chunks_json}")
+            _report(f"Nettoyage du fichier de chunks existant: {initial_chunks_json}")
             try:
                 os.remove(initial_chunks_json)
             except OSError as e:
-                print(f"Avertissement: Impossible de supprimer {initial_chunks_json}: {e}. Le contenu pourrait être ajouté.")
-                logger.warning(f"Avertissement: Impossible de supprimer {initial_chunks_json}: {e}. Le contenu pourrait être ajouté.")
-
-        process_all_documents(df, json_file=initial_chunks_json, model=args.model)
-        if not os.path.exists(initial_chunks_json) or os.path.getsize(initial_chunks_json) == 0:
-            print(f"Erreur: Aucun chunk n'a été généré dans '{initial_chunks_json}'.")
-            logger.error(f"Erreur: Aucun chunk n'a été généré dans '{initial_chunks_json}'.")
-            exit(1)
-        print(f"Phase 'initial' terminée. Output: {initial_chunks_json}")
-        logger.info(f"Phase 'initial' terminée. Output: {initial_chunks_json}")
-
-    if args.phase == 'dense' or args.phase == 'all':
-        print("\n--- Phase: Dense Embedding Generation ---")
-        logger.info("--- Phase: Dense Embedding Generation ---")
-        input_for_dense = initial_chunks_json if args.phase == 'all' else args.input
-        if not input_for_dense.lower().endswith("_chunks.json") and args.phase != 'all':
-             if not input_for_dense.lower().endswith(".json"):
-                print(f"Erreur: La phase 'dense' attend un fichier JSON de chunks en entrée (ex: ..._chunks.json), reçu: {input_for_dense}")
-                logger.error(f"Erreur: La phase 'dense' attend un fichier JSON de chunks en entrée (ex: ..._chunks.json), reçu: {input_for_dense}")
-                exit(1)
+                _report(f"Avertissement: Impossible de supprimer {initial_chunks_json}: {e}. Le contenu pourrait être ajouté.", logging.WARNING)
+
+        process_all_documents(df, json_file=initial_chunks_json, model=model)
+        _ensure_output(initial_chunks_json, "de chunks")
+        _report(f"Phase 'initial' terminée. Output: {initial_chunks_json}")
+    return initial_chunks_json
+
+def run_dense(input_json, output_dir):
+    """
+    Phase 'dense' : ajoute les embeddings denses aux chunks de `input_json`.
+    Retourne le chemin du JSON produit; lève une exception en cas d'échec.
+    """
+    _, chunks_with_dense_json, _ = output_paths(input_json, output_dir, "dense")
+    with chunking_log(output_dir):
+        _ensure_initialized()
+        _report("\n--- Phase: Dense Embedding Generation ---")
+        if not input_json.lower().endswith(".json"):
+            raise ValueError(f"La phase 'dense' attend un fichier JSON de chunks en entrée (ex: ..._chunks.json), reçu: {input_json}")
 
         dense_output_file = generate_and_save_embeddings(
-            input_json_file=input_for_dense,
+            input_json_file=input_json,
             output_json_file=chunks_with_dense_json
         )
-        if dense_output_file is None or not os.path.exists(dense_output_file) or os.path.getsize(dense_output_file) == 0:
-            print(f"Erreur: Le fichier d'embeddings denses '{chunks_with_dense_json}' n'a pas été généré ou est vide.")
-            logger.error(f"Erreur: Le fichier d'embeddings denses '{chunks_with_dense_json}' n'a pas été généré ou est vide.")
-            exit(1)
-        print(f"Phase 'dense' terminée. Output: {chunks_with_dense_json}")
-        logger.info(f"Phase 'dense' terminée. Output: {chunks_with_dense_json}")
-
-    if args.phase == 'sparse' or args.phase == 'all':
-        print("\n--- Phase: Sparse Embedding Generation ---")
-        logger.info("--- Phase: Sparse Embedding Generation ---")
-        input_for_sparse = chunks_with_dense_json if args.phase == 'all' else args.input
-        if not input_for_sparse.lower().endswith("_chunks_with_embeddings.json") and args.phase != 'all':
-            if not input_for_sparse.lower().endswith(".json"):
-                print(f"Erreur: La phase 'sparse' attend un fichier JSON avec embeddings denses (ex: ..._chunks_with_embeddings.json), reçu: {input_for_sparse}")
-                logger.error(f"Erreur: La phase 'sparse' attend un fichier JSON avec embeddings denses (ex: ..._chunks_with_embeddings.json), reçu: {input_for_sparse}")
-                exit(1)
+        _ensure_output(dense_output_file, "d'embeddings denses")
+        _report(f"Phase 'dense' terminée. Output: {chunks_with_dense_json}")
+    return chunks_with_dense_json
+
+def run_dense_batch(jobs):
+    """
+    Phase 'dense' pour plusieurs requêtes à la fois : les chunks de tous les `jobs`
+    (liste de (input_json, output_dir)) sont embeddés ensemble par lots, puis
+    sauvegardés dans le fichier de sortie de chaque job.
+    Retourne, pour chaque job, le chemin du JSON produit ou l'exception levée.
+    """
+    _ensure_initialized()
+    results = [None] * len(jobs)
+    loaded = []
+    for idx, (input_json, output_dir) in enumerate(jobs):
+        try:
+            with chunking_log(output_dir):
+                _report("\n--- Phase: Dense Embedding Generation ---")
+                if not input_json.lower().endswith(".json"):
+                    raise ValueError(f"La phase 'dense' attend un fichier JSON de chunks en entrée (ex: ..._chunks.json), reçu: {input_json}")
+                with open(input_json, 'r', encoding='utf-8') as f:
+                    chunks = json.load(f)
+                _report(f"Chargement de {len(chunks)} chunks depuis '{input_json}' pour génération d'embeddings.")
+            loaded.append((idx, chunks))
+        except Exception as e:
+            results[idx] = e
+
+    # Les lots mélangent aussi les chunks de toutes les requêtes
+    embed_chunks_by_length([chunk for _, chunks in loaded for chunk in chunks])
+
+    for idx, chunks in loaded:
+        input_json, output_dir = jobs[idx]
+        _, chunks_with_dense_json, _ = output_paths(input_json, output_dir, "dense")
+        try:
+            with chunking_log(output_dir):
+                save_processed_chunks_to_json_overwrite(chunks, chunks_with_dense_json)
+                _ensure_output(chunks_with_dense_json, "d'embeddings denses")
+                _report(f"Phase 'dense' terminée. Output: {chunks_with_dense_json}")
+            results[idx] = chunks_with_dense_json
+        except Exception as e:
+            results[idx] = e
+    return results
+
+def run_sparse(input_json, output_dir):
+    """
+    Phase 'sparse' : ajoute les embeddings sparses aux chunks de `input_json`.
+    Retourne le chemin du JSON produit; lève une exception en cas d'échec.
+    """
+    _, _, chunks_with_sparse_json = output_paths(input_json, output_dir, "sparse")
+    with chunking_log(output_dir):
+        _ensure_initialized()
+        _report("\n--- Phase: Sparse Embedding Generation ---")
+        if not input_json.lower().endswith(".json"):
+            raise ValueError(f"La phase 'sparse' attend un fichier JSON avec embeddings denses (ex: ..._chunks_with_embeddings.json), reçu: {input_json}")
 
         sparse_output_file = generate_sparse_embeddings(
-            input_json_file=input_for_sparse,
+            input_json_file=input_json,
             output_json_file=chunks_with_sparse_json
         )
-        if sparse_output_file is None or not os.path.exists(sparse_output_file) or os.path.getsize(sparse_output_file) == 0:
-            print(f"Erreur: Le fichier d'embeddings sparses '{chunks_with_sparse_json}' n'a pas été généré ou est vide.")
-            logger.error(f"Erreur: Le fichier d'embeddings sparses '{chunks_with_sparse_json}' n'a pas été généré ou est vide.")
-            exit(1)
-        print(f"Phase 'sparse' terminée. Output: {chunks_with_sparse_json}")
-        logger.info(f"Phase 'sparse' terminée. Output: {chunks_with_sparse_json}")
-        
+        _ensure_output(sparse_output_file, "d'embeddings sparses")
+        _report(f"Phase 'sparse' terminée. Output: {chunks_with_sparse_json}")
+    return chunks_with_sparse_json
+
+def run_merge(dense_json, sparse_json):
+    """
+    Phase 'merge' : recopie les embeddings denses de `dense_json` dans `sparse_json`,
+    quand les phases 'dense' et 'sparse' ont tourné en parallèle sur les mêmes chunks.
+    Retourne le chemin de `sparse_json`; lève une exception en cas d'échec.
+    """
+    with open(dense_json, 'r', encoding='utf-8') as f:
+        dense_by_id = {
+            chunk.get("id"): {key: chunk[key] for key in ("embedding", EMBEDDING_F16_KEY) if key in chunk}
+            for chunk in json.load(f)
+        }
+    with open(sparse_json, 'r', encoding='utf-8') as f:
+        all_chunks = json.load(f)
+
+    missing = [chunk.get("id") for chunk in all_chunks if chunk.get("id") not in dense_by_id]
+    if missing:
+        raise RuntimeError(f"{len(missing)} chunks de '{sparse_json}' sont absents de '{dense_json}' (ex: {missing[0]}).")
+    for chunk in all_chunks:
+        chunk.update(dense_by_id[chunk.get("id")])
+
+    save_processed_chunks_to_json_overwrite(all_chunks, sparse_json)
+    return sparse_json
+
+def run_both(input_json, output_dir):
+    """
+    Phases 'dense' et 'sparse' en parallèle sur les chunks de `input_json`, puis 'merge'.
+    Les embeddings denses attendent l'API et les sparses occupent le CPU (spaCy) : les deux
+    se recouvrent dans deux threads, pour une durée proche de max(dense, sparse).
+    Retourne le chemin du JSON final (embeddings denses et sparses); lève une exception en cas d'échec.
+    """
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        dense_future = executor.submit(run_dense, input_json, output_dir)
+        sparse_future = executor.submit(run_sparse, input_json, output_dir)
+        chunks_with_dense_json = dense_future.result()
+        chunks_with_sparse_json = sparse_future.result()
+    run_merge(chunks_with_dense_json, chunks_with_sparse_json)
+    with chunking_log(output_dir):
+        _report(f"Phases 'dense' et 'sparse' fusionnées. Output: {chunks_with_sparse_json}")
+    return chunks_with_sparse_json
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Process text data through chunking and embedding phases.")
+    parser.add_argument("--input", required=True, help="Path to the input file (CSV for 'initial' phase, JSON for 'dense' and 'sparse' phases).")
+    parser.add_argument("--output", required=True, help="Directory to save the output JSON files.")
+    parser.add_argument("--phase", choices=['initial', 'dense', 'sparse', 'both', 'all'], default='all',
+                        help="Specify processing phase: 'initial' (chunking), 'dense' (dense embeddings), 'sparse' (sparse embeddings), 'both' (dense and sparse side by side from the chunks JSON), or 'all'.")
+    parser.add_argument("--model", type=str, default="gpt-4o-mini",
+                        help="LLM model for text recoding. Use 'gpt-4o-mini' (OpenAI) or 'openai/gemini-2.5-flash' (OpenRouter). Default: gpt-4o-mini")
+
+    args = parser.parse_args()
+
+    # Console output for the CLI; each phase also appends to <output>/chunking.log
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    initial_chunks_json, chunks_with_dense_json, chunks_with_sparse_json = output_paths(args.input, args.output, args.phase)
+
+    print(f"rad_chunk.py - Phase: {args.phase}")
+    print(f"  Input File: {args.input}")
+    print(f"  Output Directory: {args.output}")
+    print(f"  Initial Chunks JSON: {initial_chunks_json}")
+    print(f"  Dense Embeddings JSON: {chunks_with_dense_json}")
+    print(f"  Sparse Embeddings JSON: {chunks_with_sparse_json}")
+
+    try:
+        next_input = args.input
+        if args.phase == 'initial' or args.phase == 'all':
+            next_input = run_initial(next_input, args.output, model=args.model)
+        if args.phase == 'both' or args.phase == 'all':
+            run_both(next_input, args.output)
+        if args.phase == 'dense':
+            run_dense(next_input, args.output)
+        if args.phase == 'sparse':
+            run_sparse(next_input, args.output)
+    except Exception as e:
+        print(f"Erreur: {e}")
+        logger.error(f"Erreur: {e}")
+        exit(1)
+
     print(f"\nTraitement ({args.phase}) terminé.")
     logger.info(f"Traitement ({args.phase}) terminé.")
@@ -5,15 +5,20 @@ from __future__ import annotations
 
 ##  BASE VECTORIELLE - Pinecone
 
+import atexit
+import base64
 import os
+import threading
 import warnings
 # Suppress ResourceWarning, often related to unclosed SSL sockets by HTTP client libraries at script exit.
 # Using simplefilter as the more specific filterwarnings might be more effective if message matching was an issue.
 warnings.simplefilter("ignore", ResourceWarning)
 import json
 import time
+import numpy as np
 from tqdm import tqdm
 import traceback # Ajout pour traceback.print_exc()
+from collections import OrderedDict
 
 try:
     from pinecone import Pinecone  # Reverted import
@@ -21,6 +26,154 @@ try:
 except ImportError as exc:  # pragma: no cover - only triggered when dependency missing
     Pinecone = None
     _pinecone_import_error = exc
+
+# Optional: stream chunk files instead of loading the whole list (and all embeddings) at once
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+    JSON_DECODE_ERRORS = (json.JSONDecodeError, ijson.JSONError)
+except ImportError:
+    IJSON_AVAILABLE = False
+    JSON_DECODE_ERRORS = (json.JSONDecodeError,)
+
+# SDK clients are cached per credentials, so consecutive uploads reuse their HTTP
+# connection pools instead of paying a new TLS handshake each time.
+_CLIENT_CACHE = {}
+_CLIENT_CACHE_LOCK = threading.Lock()
+
+def _cached_client(key, factory):
+    """Returns the cached client for `key`, creating it with `factory()` on first use."""
+    with _CLIENT_CACHE_LOCK:
+        client = _CLIENT_CACHE.get(key)
+        if client is None:
+            client = factory()
+            _CLIENT_CACHE[key] = client
+        return client
+
+def _close_client(client):
+    close = getattr(client, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception:
+            pass
+
+def _evict_client(key):
+    """Drops and closes a cached client whose connection is no longer usable."""
+    with _CLIENT_CACHE_LOCK:
+        client = _CLIENT_CACHE.pop(key, None)
+    if client is not None:
+        _close_client(client)
+
+def close_cached_clients():
+    """Closes every cached client (called at interpreter exit)."""
+    with _CLIENT_CACHE_LOCK:
+        clients = list(_CLIENT_CACHE.values())
+        _CLIENT_CACHE.clear()
+    for client in clients:
+        _close_client(client)
+
+atexit.register(close_cached_clients)
+
+# rad_chunk écrit les vecteurs denses en float16 little-endian encodé en base64
+# ("embedding_f16_b64"); les listes de flottants ("embedding") restent acceptées.
+EMBEDDING_F16_KEY = "embedding_f16_b64"
+VECTOR_KEYS = ("id", "embedding", EMBEDDING_F16_KEY, "sparse_embedding")
+
+def dense_embedding(chunk):
+    """Retourne le vecteur dense d'un chunk (liste de flottants), ou None s'il n'en a pas."""
+    encoded = chunk.get(EMBEDDING_F16_KEY)
+    if encoded is not None:
+        return np.frombuffer(base64.b64decode(encoded), dtype="<f2").astype(np.float32).tolist()
+    return chunk.get("embedding")
+
+# Quand une insertion échoue et que l'utilisateur relance /upload_db, le même fichier de
+# chunks est relu. Les chunks lus par une insertion sont donc gardés (clé : chemin,
+# mtime, taille) et, si elle échoue, conservés jusqu'à une insertion réussie : la
+# nouvelle tentative ne reparse pas le fichier. Seuls les fichiers lus en entier et
+# tenant dans CHUNKS_CACHE_MAX_BYTES (RAGPY_CHUNKS_CACHE_MB, au total) sont gardés.
+CHUNKS_CACHE_MAX_BYTES = int(os.getenv("RAGPY_CHUNKS_CACHE_MB", "1024")) * 1024 * 1024
+_CHUNKS_CACHE = OrderedDict()  # path -> ((mtime_ns, size), chunks), du moins au plus récent
+_READ_CHUNKS = {}  # path -> ((mtime_ns, size), chunks) de la dernière lecture complète
+_CHUNKS_CACHE_LOCK = threading.Lock()
+
+def _file_version(st):
+    return (st.st_mtime_ns, st.st_size)
+
+def keep_chunks_for_retry(embeddings_json_file):
+    """Caches the chunks read by an insertion that failed, so that a retry does not parse the file again.
+
+    The least recently used files are dropped until the cached files fit in
+    CHUNKS_CACHE_MAX_BYTES.
+    """
+    path = os.path.abspath(embeddings_json_file)
+    with _CHUNKS_CACHE_LOCK:
+        read = _READ_CHUNKS.pop(path, None)
+        if read is None:
+            return  # Not read in full, or larger than the cache
+        version, chunks = read
+        _CHUNKS_CACHE.pop(path, None)
+        cached_bytes = sum(size for (_, size), _ in _CHUNKS_CACHE.values())
+        while _CHUNKS_CACHE and cached_bytes + version[1] > CHUNKS_CACHE_MAX_BYTES:
+            _, ((_, size), _) = _CHUNKS_CACHE.popitem(last=False)
+            cached_bytes -= size
+        _CHUNKS_CACHE[path] = (version, chunks)
+
+def evict_chunks(embeddings_json_file):
+    """Drops the kept chunks of a file, once they have been inserted successfully."""
+    path = os.path.abspath(embeddings_json_file)
+    with _CHUNKS_CACHE_LOCK:
+        _CHUNKS_CACHE.pop(path, None)
+        _READ_CHUNKS.pop(path, None)
+
+def iter_chunks(embeddings_json_file):
+    """Yields the chunks of a JSON list file one at a time.
+
+    Chunks kept by keep_chunks_for_retry() come from the cache. Otherwise, with ijson
+    installed only the current chunk is parsed at a time; without it the file is loaded
+    with json.load and its items are yielded. The chunks of a file that fits in
+    CHUNKS_CACHE_MAX_BYTES are collected for keep_chunks_for_retry(), and must not be
+    modified.
+    """
+    path = os.path.abspath(embeddings_json_file)
+    try:
+        st = os.stat(path)
+    except OSError:
+        st = None  # open() below reports the error
+    if st is not None:
+        with _CHUNKS_CACHE_LOCK:
+            cached = _CHUNKS_CACHE.get(path)
+            if cached is not None and cached[0] == _file_version(st):
+                _CHUNKS_CACHE.move_to_end(path)
+                chunks = cached[1]
+            else:
+                chunks = None
+        if chunks is not None:
+            yield from chunks
+            return
+
+    collected = [] if st is not None and st.st_size <= CHUNKS_CACHE_MAX_BYTES else None
+    with open(path, 'rb') as f:
+        chunks = ijson.items(f, 'item', use_float=True) if IJSON_AVAILABLE else json.load(f)
+        for chunk in chunks:
+            if collected is not None:
+                collected.append(chunk)
+            yield chunk
+    if collected is not None:
+        with _CHUNKS_CACHE_LOCK:
+            _READ_CHUNKS[path] = (_file_version(st), collected)
+
+def iter_chunk_batches(embeddings_json_file, batch_size):
+    """Yields lists of up to `batch_size` consecutive chunks from a JSON list file."""
+    batch = []
+    for chunk in iter_chunks(embeddings_json_file):
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 # Configuration des tailles de lots et du parallélisme
 PINECONE_BATCH_SIZE = 100  # Nombre de vecteurs à upserter en une seule requête Pinecone
 # MAX_WORKERS = os.cpu_count() - 1 # Défini mais non utilisé dans ce script pour le parallélisme d'upsert direct.
@@ -76,15 +229,15 @@ def prepare_vectors_for_pinecone(chunks):
     vectors = []
     for chunk in chunks:
         # Vérifier que l'embedding dense existe et n'est pas None
-        dense_embedding = chunk.get("embedding")
+        dense_vector = dense_embedding(chunk)
 
-        if dense_embedding is not None:
+        if dense_vector is not None:
             # Construction dynamique des métadonnées
             # Injecte TOUTES les clés du chunk (compatibilité CSV et autres sources)
             metadata = {}
             for key, value in chunk.items():
                 # Exclure les champs techniques (vecteurs et identifiants)
-                if key not in ("id", "embedding", "sparse_embedding", "values"):
+                if key not in VECTOR_KEYS and key != "values":
                     metadata[key] = value
 
             # S'assurer que "text" est présent (backward compatibility)
@@ -93,7 +246,7 @@ def prepare_vectors_for_pinecone(chunks):
 
             vector_data = {
                 "id": chunk["id"],
-                "values": dense_embedding,  # Vecteur dense
+                "values": dense_vector,  # Vecteur dense
                 "metadata": metadata
             }
             
@@ -168,7 +321,7 @@ def insert_to_pinecone(embeddings_json_file, index_name="articles", pinecone_api
         return {"status": "error", "message": msg, "inserted_count": 0}
 
     try:
-        pc = Pinecone(api_key=pinecone_api_key) # Reverted to Pinecone
+        pc = _cached_client(("pinecone", pinecone_api_key), lambda: Pinecone(api_key=pinecone_api_key))
     except Exception as e:
         msg = f"Erreur lors de l'initialisation du client Pinecone: {e}"
         print(msg)
@@ -183,6 +336,7 @@ def insert_to_pinecone(embeddings_json_file, index_name="articles", pinecone_api
         msg = f"Failed to connect to Pinecone or list indexes: {e}"
         print(msg)
         traceback.print_exc()
+        _evict_client(("pinecone", pinecone_api_key))
         return {"status": "error", "message": msg, "inserted_count": 0}
 
     if index_list_response is None:
@@ -260,51 +414,42 @@ def insert_to_pinecone(embeddings_json_file, index_name="articles", pinecone_api
         traceback.print_exc()
         return {"status": "error", "message": msg, "inserted_count": 0}
     
-    all_chunks = []
-    try:
-        with open(embeddings_json_file, 'r', encoding='utf-8') as f:
-            all_chunks = json.load(f)
-        print(f"Chargement des embeddings depuis {embeddings_json_file} réussi. {len(all_chunks)} chunks chargés.")
-    except json.JSONDecodeError as e:
-        msg = f"Erreur de décodage JSON dans le fichier {embeddings_json_file}: {e}"
-        print(msg)
-        traceback.print_exc()
-        return {"status": "error", "message": msg, "inserted_count": 0}
-    except Exception as e:
-        msg = f"Erreur lors du chargement du fichier {embeddings_json_file}: {e}"
-        print(msg)
-        traceback.print_exc()
-        return {"status": "error", "message": msg, "inserted_count": 0}
-        
-    chunks_by_doc = {}
-    for chunk_data in all_chunks: # Renamed 'chunk' to 'chunk_data' to avoid conflict if 'chunk' is a key in the dict
-        doc_id = chunk_data.get("doc_id", "unknown_document") 
-        if doc_id not in chunks_by_doc:
-            chunks_by_doc[doc_id] = []
-        chunks_by_doc[doc_id].append(chunk_data)
-    
     total_inserted_count = 0
     total_processed_chunks = 0
     any_batch_failed = False
 
-    for doc_id, doc_chunks in tqdm(chunks_by_doc.items(), desc="Insertion des documents dans Pinecone"):
-        print(f"\nTraitement du document {doc_id} ({len(doc_chunks)} chunks)")
-        
-        for i in range(0, len(doc_chunks), PINECONE_BATCH_SIZE):
-            batch_chunks = doc_chunks[i:i+PINECONE_BATCH_SIZE]
+    print(f"Lecture des embeddings depuis {embeddings_json_file} par lots de {PINECONE_BATCH_SIZE}.")
+    try:
+        batches = iter_chunk_batches(embeddings_json_file, PINECONE_BATCH_SIZE)
+        for batch_number, batch_chunks in enumerate(tqdm(batches, desc="Insertion des lots dans Pinecone"), start=1):
             vectors_to_upsert = prepare_vectors_for_pinecone(batch_chunks)
-            total_processed_chunks += len(batch_chunks) 
-            
+            total_processed_chunks += len(batch_chunks)
+
             if vectors_to_upsert:
                 success_upsert = upsert_batch_to_pinecone(index, vectors_to_upsert, namespace=namespace)
                 if success_upsert:
                     total_inserted_count += len(vectors_to_upsert)
-                    print(f"Lot {i//PINECONE_BATCH_SIZE + 1}: {len(vectors_to_upsert)} vecteurs insérés avec succès pour le document {doc_id}.")
+                    print(f"Lot {batch_number}: {len(vectors_to_upsert)} vecteurs insérés avec succès.")
                 else:
                     any_batch_failed = True
-                    print(f"Lot {i//PINECONE_BATCH_SIZE + 1}: Échec de l'insertion du lot pour le document {doc_id}.")
-            elif batch_chunks: 
-                 print(f"Lot {i//PINECONE_BATCH_SIZE + 1}: Aucun vecteur valide à insérer pour le document {doc_id}.")
+                    print(f"Lot {batch_number}: Échec de l'insertion du lot.")
+            else:
+                print(f"Lot {batch_number}: Aucun vecteur valide à insérer.")
+    except JSON_DECODE_ERRORS as e:
+        msg = f"Erreur de décodage JSON dans le fichier {embeddings_json_file}: {e}"
+        print(msg)
+        traceback.print_exc()
+        return {"status": "error", "message": msg, "inserted_count": total_inserted_count}
+    except OSError as e:
+        msg = f"Erreur lors du chargement du fichier {embeddings_json_file}: {e}"
+        print(msg)
+        traceback.print_exc()
+        return {"status": "error", "message": msg, "inserted_count": total_inserted_count}
+
+    if any_batch_failed:
+        keep_chunks_for_retry(embeddings_json_file)
+    else:
+        evict_chunks(embeddings_json_file)
 
     final_message_parts = ["Insertion terminée."]
     if namespace:
@@ -312,14 +457,14 @@ def insert_to_pinecone(embeddings_json_file, index_name="articles", pinecone_api
     final_message_parts.extend([
         f"Total de chunks traités (tentative de préparation): {total_processed_chunks}.",
         f"Total de chunks effectivement préparés et insérés avec succès dans Pinecone: {total_inserted_count}",
-        f"(sur {len(all_chunks)} chunks initialement chargés si tous étaient valides)."
+        f"(sur {total_processed_chunks} chunks lus si tous étaient valides)."
     ])
     final_message = " ".join(final_message_parts)
     print(f"\n{final_message}")
 
     if any_batch_failed:
         return {"status": "partial_error", "message": f"{final_message} Au moins un lot n'a pas pu être inséré.", "inserted_count": total_inserted_count}
-    elif total_inserted_count == 0 and len(all_chunks) > 0: # Processed chunks but none inserted
+    elif total_inserted_count == 0 and total_processed_chunks > 0: # Processed chunks but none inserted
          return {"status": "error", "message": f"{final_message} Aucun chunk n'a été inséré.", "inserted_count": total_inserted_count}
     elif total_inserted_count < total_processed_chunks and not any_batch_failed: # Some chunks were invalid but all valid upserted
         return {"status": "success_partial_data", "message": f"{final_message} Certains chunks étaient invalides et n'ont pas été préparés pour l'insertion.", "inserted_count": total_inserted_count}
@@ -465,7 +610,7 @@ def insert_to_weaviate_hybrid(embeddings_json_file, url, api_key, class_name="Ar
         print(f"Le fichier {embeddings_json_file} n'existe pas.")
         return 0
 
-    client = None  # Initialiser client à None
+    client_key = ("weaviate", url, api_key)
     
     if not url:
         raise ValueError("Weaviate Cluster URL (url) is required.")
@@ -474,14 +619,14 @@ def insert_to_weaviate_hybrid(embeddings_json_file, url, api_key, class_name="Ar
 
     try:
         # Connexion à Weaviate Cloud
-        client = weaviate.connect_to_weaviate_cloud(
+        client = _cached_client(client_key, lambda: weaviate.connect_to_weaviate_cloud(
             cluster_url=url,
             auth_credentials=Auth.api_key(api_key),
-        )
+        ))
         
         if not client.is_ready():
             print("Le serveur Weaviate n'est pas prêt.")
-            if client: client.close()
+            _evict_client(client_key)
             return 0
             
         print("Connexion réussie à Weaviate Cloud")
@@ -515,29 +660,25 @@ def insert_to_weaviate_hybrid(embeddings_json_file, url, api_key, class_name="Ar
                 print(f"Tenant '{tenant_name}' créé avec succès (après fallback).")
             except Exception as e_create:
                 print(f"Impossible de créer le tenant '{tenant_name}' même en fallback: {e_create}")
-                if client: client.close()
                 return 0
         
-        # Charger les chunks avec embeddings
-        print(f"Chargement des embeddings depuis {embeddings_json_file}")
-        with open(embeddings_json_file, 'r', encoding='utf-8') as f:
-            all_chunks = json.load(f)
-        
-        print(f"Chargement de {len(all_chunks)} chunks avec embeddings")
+        # Lire les chunks avec embeddings par lots
+        print(f"Lecture des embeddings depuis {embeddings_json_file}")
         
-        # Traiter les chunks par lots
         total_inserted = 0
+        total_chunks = 0
+        any_batch_failed = False
         
         # Utiliser la collection spécifique au tenant pour le batching
         collection_with_tenant = collection.with_tenant(tenant_name)
 
-        for i in range(0, len(all_chunks), WEAVIATE_BATCH_SIZE):
+        for batch_number, current_batch_chunks in enumerate(iter_chunk_batches(embeddings_json_file, WEAVIATE_BATCH_SIZE), start=1):
             batch_data_objects = [] # Liste pour stocker les objets à insérer dans ce lot
-            
-            current_batch_chunks = all_chunks[i:i+WEAVIATE_BATCH_SIZE]
+            total_chunks += len(current_batch_chunks)
             
             for chunk in current_batch_chunks:
-                if chunk.get("embedding") is not None:
+                dense_vector = dense_embedding(chunk)
+                if dense_vector is not None:
                     uuid_str = generate_uuid(chunk["id"]) # Ensure this is a string for DataObject
 
                     # Construction dynamique des properties
@@ -545,7 +686,7 @@ def insert_to_weaviate_hybrid(embeddings_json_file, url, api_key, class_name="Ar
                     properties = {}
                     for key, value in chunk.items():
                         # Exclure les champs techniques (vecteurs et identifiants)
-                        if key not in ("id", "embedding", "sparse_embedding"):
+                        if key not in VECTOR_KEYS:
                             # Normaliser les dates pour Weaviate (RFC3339)
                             if key in ("date", "created_at", "updated_at", "published_at") and value:
                                 properties[key] = normalize_date_to_rfc3339(str(value))
@@ -560,7 +701,7 @@ def insert_to_weaviate_hybrid(embeddings_json_file, url, api_key, class_name="Ar
                         weaviate.classes.data.DataObject(
                             properties=properties,
                             uuid=uuid_str, # uuid parameter expects a string or UUID object
-                            vector=chunk["embedding"]
+                            vector=dense_vector
                         )
                     )
             
@@ -570,6 +711,7 @@ def insert_to_weaviate_hybrid(embeddings_json_file, url, api_key, class_name="Ar
                     
                     num_successful_in_batch = 0
                     if results.has_errors: # Check this first
+                        any_batch_failed = True
                         num_failed_in_batch = len(results.errors)
                         num_successful_in_batch = len(batch_data_objects) - num_failed_in_batch
                         
@@ -582,26 +724,27 @@ def insert_to_weaviate_hybrid(embeddings_json_file, url, api_key, class_name="Ar
                         num_successful_in_batch = len(batch_data_objects)
                     
                     total_inserted += num_successful_in_batch
-                    print(f"Lot {i//WEAVIATE_BATCH_SIZE + 1}/{(len(all_chunks) + WEAVIATE_BATCH_SIZE - 1)//WEAVIATE_BATCH_SIZE}: {num_successful_in_batch}/{len(batch_data_objects)} objets insérés avec succès.")
+                    print(f"Lot {batch_number}: {num_successful_in_batch}/{len(batch_data_objects)} objets insérés avec succès.")
 
                 except Exception as e_batch:
-                    print(f"Erreur majeure lors de l'insertion du lot {i//WEAVIATE_BATCH_SIZE + 1}: {e_batch}")
+                    any_batch_failed = True
+                    print(f"Erreur majeure lors de l'insertion du lot {batch_number}: {e_batch}")
                     traceback.print_exc() 
             else:
-                print(f"Lot {i//WEAVIATE_BATCH_SIZE + 1}: Aucun objet valide à insérer.")
+                print(f"Lot {batch_number}: Aucun objet valide à insérer.")
 
-        print(f"Insertion terminée. {total_inserted}/{len(all_chunks)} chunks insérés avec succès dans Weaviate (tenant: {tenant_name}).")
-        if client: client.close()
+        if any_batch_failed:
+            keep_chunks_for_retry(embeddings_json_file)
+        else:
+            evict_chunks(embeddings_json_file)
+        print(f"Insertion terminée. {total_inserted}/{total_chunks} chunks insérés avec succès dans Weaviate (tenant: {tenant_name}).")
         return total_inserted
         
     except Exception as e:
         print(f"Erreur globale lors du traitement Weaviate: {e}")
         traceback.print_exc() # Imprime le traceback complet
-        if client: 
-            try:
-                client.close()
-            except:
-                pass
+        _evict_client(client_key) # La connexion est peut-être inutilisable
+        keep_chunks_for_retry(embeddings_json_file)
         return 0
 
 
@@ -631,9 +774,9 @@ def prepare_points_for_qdrant(chunks):
 
     points = []
     for chunk in chunks:
-        dense_embedding = chunk.get("embedding")
+        dense_vector = dense_embedding(chunk)
 
-        if dense_embedding is not None:
+        if dense_vector is not None:
             # Utiliser l'ID du chunk comme ID du point Qdrant.
             # Qdrant accepte les UUIDs (chaînes ou objets UUID) ou les entiers comme ID.
             # Générer un UUID v5 stable à partir de l'ID original du chunk pour assurer la compatibilité.
@@ -645,7 +788,7 @@ def prepare_points_for_qdrant(chunks):
 
             for key, value in chunk.items():
                 # Exclure les champs techniques (vecteurs et identifiants)
-                if key not in ("id", "embedding", "sparse_embedding"):
+                if key not in VECTOR_KEYS:
                     payload[key] = value
 
             # S'assurer que "text" est présent (backward compatibility)
@@ -655,7 +798,7 @@ def prepare_points_for_qdrant(chunks):
             # Créer l'objet PointStruct
             point = models.PointStruct(
                 id=point_id,
-                vector=dense_embedding,
+                vector=dense_vector,
                 payload=payload
             )
             points.append(point)
@@ -746,13 +889,13 @@ def insert_to_qdrant(embeddings_json_file, collection_name, qdrant_url=None, qdr
         raise ValueError("Qdrant URL (qdrant_url) is required.")
     # qdrant_api_key can be None for local unsecured instances.
 
-    client = None
+    client_key = ("qdrant", qdrant_url, qdrant_api_key)
     try:
         print(f"Connexion à Qdrant à l'URL: {qdrant_url}")
-        client = qdrant_client.QdrantClient(
+        client = _cached_client(client_key, lambda: qdrant_client.QdrantClient(
             url=qdrant_url, 
             api_key=qdrant_api_key # This can be None
-        )
+        ))
         # Vérifier la connexion en listant les collections (ou une autre opération légère)
         client.get_collections() 
         print("Connexion à Qdrant réussie.")
@@ -760,7 +903,7 @@ def insert_to_qdrant(embeddings_json_file, collection_name, qdrant_url=None, qdr
     except Exception as e:
         print(f"Erreur lors de la connexion à Qdrant: {e}")
         traceback.print_exc()
-        if client: client.close()
+        _evict_client(client_key)
         return 0
 
     # Vérifier si la collection existe, la créer si nécessaire
@@ -780,17 +923,14 @@ def insert_to_qdrant(embeddings_json_file, collection_name, qdrant_url=None, qdr
         try:
             # Déterminer la taille du vecteur à partir du premier chunk valide
             vector_size = None
-            temp_chunks = []
-            with open(embeddings_json_file, 'r', encoding='utf-8') as f_temp:
-                 temp_chunks = json.load(f_temp)
-            for chunk in temp_chunks:
-                if chunk.get("embedding") is not None:
-                    vector_size = len(chunk["embedding"])
+            for chunk in iter_chunks(embeddings_json_file):
+                dense_vector = dense_embedding(chunk)
+                if dense_vector is not None:
+                    vector_size = len(dense_vector)
                     break
             
             if vector_size is None:
                  print("Erreur: Impossible de déterminer la taille du vecteur à partir du fichier JSON.")
-                 if client: client.close()
                  return 0
 
             print(f"Création de la collection '{collection_name}' avec des vecteurs de taille {vector_size} et distance Cosine.")
@@ -804,46 +944,44 @@ def insert_to_qdrant(embeddings_json_file, collection_name, qdrant_url=None, qdr
         except Exception as e_create:
             print(f"Erreur lors de la création de la collection '{collection_name}': {e_create}")
             traceback.print_exc()
-            if client: client.close()
             return 0
 
-    # Charger les chunks avec embeddings
-    print(f"Chargement des embeddings depuis {embeddings_json_file}")
-    try:
-        with open(embeddings_json_file, 'r', encoding='utf-8') as f:
-            all_chunks = json.load(f)
-    except Exception as e:
-        print(f"Erreur lors du chargement du fichier {embeddings_json_file}: {e}")
-        traceback.print_exc()
-        if client: client.close()
-        return 0
-        
-    print(f"Chargement de {len(all_chunks)} chunks avec embeddings")
+    # Lire les chunks avec embeddings par lots
+    print(f"Lecture des embeddings depuis {embeddings_json_file}")
 
     total_inserted_count = 0
     total_processed_chunks = 0
+    any_batch_failed = False
 
-    # Traiter les chunks par lots
-    for i in tqdm(range(0, len(all_chunks), QDRANT_BATCH_SIZE), desc=f"Insertion dans Qdrant collection '{collection_name}'"):
-        batch_chunks = all_chunks[i:i+QDRANT_BATCH_SIZE]
-        points_to_upsert = prepare_points_for_qdrant(batch_chunks)
-        total_processed_chunks += len(batch_chunks) 
-        
-        if points_to_upsert:
-            success, count_in_batch = upsert_batch_to_qdrant(client, collection_name, points_to_upsert)
-            if success:
-                total_inserted_count += count_in_batch
-                # print(f"Lot {i//QDRANT_BATCH_SIZE + 1}: {count_in_batch} points insérés/mis à jour avec succès.")
+    try:
+        batches = iter_chunk_batches(embeddings_json_file, QDRANT_BATCH_SIZE)
+        for batch_number, batch_chunks in enumerate(tqdm(batches, desc=f"Insertion dans Qdrant collection '{collection_name}'"), start=1):
+            points_to_upsert = prepare_points_for_qdrant(batch_chunks)
+            total_processed_chunks += len(batch_chunks)
+
+            if points_to_upsert:
+                success, count_in_batch = upsert_batch_to_qdrant(client, collection_name, points_to_upsert)
+                if success:
+                    total_inserted_count += count_in_batch
+                else:
+                    any_batch_failed = True
+                    print(f"Lot {batch_number}: Échec partiel ou total de l'insertion du lot.")
             else:
-                print(f"Lot {i//QDRANT_BATCH_SIZE + 1}: Échec partiel ou total de l'insertion du lot.")
-        elif batch_chunks: 
-             print(f"Lot {i//QDRANT_BATCH_SIZE + 1}: Aucun point valide à insérer.")
+                print(f"Lot {batch_number}: Aucun point valide à insérer.")
+    except (OSError,) + JSON_DECODE_ERRORS as e:
+        print(f"Erreur lors du chargement du fichier {embeddings_json_file}: {e}")
+        traceback.print_exc()
+        return total_inserted_count
+
+    if any_batch_failed:
+        keep_chunks_for_retry(embeddings_json_file)
+    else:
+        evict_chunks(embeddings_json_file)
 
     print(f"\nInsertion Qdrant terminée.")
     print(f"Total de chunks traités (tentative de préparation): {total_processed_chunks}")
-    print(f"Total de points effectivement insérés/mis à jour dans Qdrant: {total_inserted_count} (sur {len(all_chunks)} chunks initialement chargés si tous étaient valides).")
+    print(f"Total de points effectivement insérés/mis à jour dans Qdrant: {total_inserted_count} (sur {total_processed_chunks} chunks lus si tous étaient valides).")
 
-    if client: client.close()
     return total_inserted_count
 
 
@@ -1,9 +1,12 @@
 import unittest
 from unittest.mock import patch, MagicMock, mock_open
+import base64
 import os
 import json
+import numpy as np
 import time # Keep time for potential sleep in retries, though mocks might bypass it
 import sys
+import tempfile
 
 # Ensure rad_vectordb can be imported
 # Assuming this test script is in the same directory as rad_vectordb.py
@@ -25,6 +28,8 @@ except ModuleNotFoundError:
 class TestRadVectorDB(unittest.TestCase):
 
     def setUp(self):
+        # SDK clients are cached per credentials; start each test with the patched classes
+        rad_vectordb.close_cached_clients()
         # Common setup for tests, e.g., sample data
         self.sample_chunk_dense_only = {
             "id": "doc1_chunk1",
@@ -96,6 +101,43 @@ class TestRadVectorDB(unittest.TestCase):
         self.assertEqual(rad_vectordb.normalize_date_to_rfc3339("2023-01-15T10:20:30.123Z"), "2023-01-15T10:20:30+00:00Z")
 
 
+    # Test keep_chunks_for_retry / evict_chunks
+    def test_failed_insertion_keeps_chunks_until_evicted(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "chunks.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump([self.sample_chunk_dense_only], f)
+
+            first = list(rad_vectordb.iter_chunks(path))
+            self.assertEqual(first, [self.sample_chunk_dense_only])
+            self.assertNotIn(os.path.abspath(path), rad_vectordb._CHUNKS_CACHE) # First read is streamed
+
+            rad_vectordb.keep_chunks_for_retry(path) # After a failed insertion: no new parse
+            with patch.object(rad_vectordb, "open", side_effect=AssertionError("file parsed again"), create=True):
+                retried = list(rad_vectordb.iter_chunks(path))
+            self.assertIs(retried[0], first[0])
+
+            rad_vectordb.evict_chunks(path)
+            self.assertIsNot(list(rad_vectordb.iter_chunks(path))[0], first[0])
+            rad_vectordb.evict_chunks(path)
+
+    def test_chunks_cache_is_bounded_by_file_size(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+             patch.object(rad_vectordb, "CHUNKS_CACHE_MAX_BYTES", 2 * len(json.dumps([self.sample_chunk_dense_only]))):
+            paths = []
+            for name in ("a.json", "b.json", "c.json"):
+                path = os.path.join(tmp_dir, name)
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump([self.sample_chunk_dense_only], f)
+                paths.append(path)
+                list(rad_vectordb.iter_chunks(path))
+                rad_vectordb.keep_chunks_for_retry(path)
+
+            cached = [p for p in paths if os.path.abspath(p) in rad_vectordb._CHUNKS_CACHE]
+            self.assertEqual(cached, paths[1:]) # Least recently used file dropped
+            for path in paths:
+                rad_vectordb.evict_chunks(path)
+
     # --- Pinecone Tests ---
     def test_prepare_vectors_for_pinecone(self):
         chunks = [self.sample_chunk_dense_only, self.sample_chunk_with_sparse, self.sample_chunk_no_embedding, self.sample_chunk_bad_sparse]
@@ -121,6 +163,16 @@ class TestRadVectorDB(unittest.TestCase):
         self.assertEqual(vectors[2]["values"], self.sample_chunk_bad_sparse["embedding"])
         self.assertNotIn("sparse_values", vectors[2]) # Sparse should be ignored
 
+    def test_prepare_vectors_for_pinecone_float16_embedding(self):
+        encoded = base64.b64encode(np.array([0.5, -0.25, 1.0], dtype="<f2").tobytes()).decode("ascii")
+        chunk = {"id": "f16_chunk", "embedding_f16_b64": encoded, "title": "Float16"}
+        vectors = rad_vectordb.prepare_vectors_for_pinecone([chunk])
+
+        self.assertEqual(len(vectors), 1)
+        self.assertEqual(vectors[0]["values"], [0.5, -0.25, 1.0])
+        self.assertNotIn("embedding_f16_b64", vectors[0]["metadata"]) # The encoded vector is not metadata
+        self.assertEqual(vectors[0]["metadata"]["title"], "Float16")
+
     @patch('rad_vectordb.time.sleep') # Mock time.sleep to speed up tests
     @patch('pinecone.Index') # Mock the Pinecone Index object
     def test_upsert_batch_to_pinecone_success(self, MockPineconeIndex, mock_sleep):
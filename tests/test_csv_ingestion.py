@@ -9,6 +9,7 @@ Teste :
 4. Validation des métadonnées dynamiques
 """
 
+import json
 import sys
 import os
 from pathlib import Path
@@ -25,7 +26,7 @@ from ingestion.csv_ingestion import (
     CSVIngestionConfig,
     CSVIngestionError,
 )
-from core.document import Document
+from core.document import Document, document_batch_timestamp
 
 # Configuration du logging
 logging.basicConfig(
@@ -215,6 +216,11 @@ def test_document_class():
 
         logger.info("✓ Conversion to_dict() fonctionne")
 
+        # Tester la sérialisation JSON
+        assert json.loads(doc.to_orjson()) == doc_dict
+
+        logger.info("✓ Sérialisation to_orjson() fonctionne")
+
         # Tester la reconstruction from_dict()
         reconstructed = Document.from_dict(doc_dict)
         assert reconstructed.texteocr == doc.texteocr
@@ -222,6 +228,13 @@ def test_document_class():
 
         logger.info("✓ Reconstruction from_dict() fonctionne")
 
+        # Tester l'horodatage partagé d'un lot
+        with document_batch_timestamp() as batch_ts:
+            batch = [Document(texteocr=f"Document de lot numéro {i}") for i in range(3)]
+        assert all(d.meta["ingested_at"] == batch_ts for d in batch)
+
+        logger.info("✓ document_batch_timestamp() partage ingested_at")
+
         # Tester la validation (texte vide devrait échouer)
         try:
             invalid_doc = Document(texteocr="", meta={})
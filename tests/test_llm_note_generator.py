@@ -5,8 +5,9 @@ These tests use mocking to avoid real LLM API calls.
 Run with: pytest tests/test_llm_note_generator.py
 """
 
+import asyncio
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import AsyncMock, Mock, patch, MagicMock
 from app.utils import llm_note_generator
 
 
@@ -167,9 +168,10 @@ class TestBuildNoteHtml:
         assert "Test" in html
         assert "<!-- ragpy-note-id:" in html
 
-    @patch('app.utils.llm_note_generator.openai_client')
-    def test_llm_mode_openai(self, mock_client):
+    @patch('app.utils.llm_note_generator._get_openai_client')
+    def test_llm_mode_openai(self, mock_get_client):
         """Test building note with OpenAI LLM."""
+        mock_client = mock_get_client.return_value
         # Mock OpenAI response
         mock_response = Mock()
         mock_choice = Mock()
@@ -202,9 +204,10 @@ class TestBuildNoteHtml:
         assert "Test Article" in html
         assert sentinel in html
 
-    @patch('app.utils.llm_note_generator.openrouter_client')
-    def test_llm_mode_openrouter(self, mock_client):
+    @patch('app.utils.llm_note_generator._get_openrouter_client')
+    def test_llm_mode_openrouter(self, mock_get_client):
         """Test building note with OpenRouter LLM."""
+        mock_client = mock_get_client.return_value
         # Mock OpenRouter response
         mock_response = Mock()
         mock_choice = Mock()
@@ -252,13 +255,29 @@ class TestBuildNoteHtml:
         assert "Test" in html
         assert "Fiche de lecture" in html
 
+    @patch('app.utils.llm_note_generator._generate_with_llm', return_value="<p>Note</p>")
+    @patch('app.utils.llm_note_generator._get_openai_client')
+    def test_abstract_only_is_sent_once(self, mock_get_client, mock_generate):
+        """Test that an abstract-only item does not repeat the abstract as the full text."""
+        metadata = {
+            "title": "Test",
+            "abstract": "A distinctive abstract sentence.",
+            "language": "en"
+        }
+
+        llm_note_generator.build_note_html(metadata, text_content=None, model="gpt-4o-mini")
+
+        prompt = mock_generate.call_args[0][0]
+        assert prompt.count("A distinctive abstract sentence.") == 1
+
 
 class TestGenerateWithLlm:
     """Test LLM generation function."""
 
-    @patch('app.utils.llm_note_generator.openai_client')
-    def test_openai_generation(self, mock_client):
+    @patch('app.utils.llm_note_generator._get_openai_client')
+    def test_openai_generation(self, mock_get_client):
         """Test generation with OpenAI."""
+        mock_client = mock_get_client.return_value
         mock_response = Mock()
         mock_choice = Mock()
         mock_message = Mock()
@@ -276,9 +295,10 @@ class TestGenerateWithLlm:
         assert result == "Generated text"
         mock_client.chat.completions.create.assert_called_once()
 
-    @patch('app.utils.llm_note_generator.openrouter_client')
-    def test_openrouter_generation(self, mock_client):
+    @patch('app.utils.llm_note_generator._get_openrouter_client')
+    def test_openrouter_generation(self, mock_get_client):
         """Test generation with OpenRouter."""
+        mock_client = mock_get_client.return_value
         mock_response = Mock()
         mock_choice = Mock()
         mock_message = Mock()
@@ -297,5 +317,106 @@ class TestGenerateWithLlm:
         mock_client.chat.completions.create.assert_called_once()
 
 
+class TestBuildNoteHtmlAsync:
+    """Test the async note builder."""
+
+    @patch('app.utils.llm_note_generator._get_async_openai_client')
+    def test_concurrent_notes(self, mock_get_client):
+        """Test generating several notes concurrently with AsyncOpenAI."""
+        mock_message = Mock()
+        mock_message.content = "<p>Async content</p>"
+        mock_response = Mock(choices=[Mock(message=mock_message)])
+        mock_client = mock_get_client.return_value
+        mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+
+        async def build_all():
+            return await asyncio.gather(*(
+                llm_note_generator.build_note_html_async(
+                    {"title": f"Item {i}", "language": "en"},
+                    text_content="Full text",
+                    model="gpt-4o-mini"
+                )
+                for i in range(3)
+            ))
+
+        notes = asyncio.run(build_all())
+
+        assert mock_client.chat.completions.create.await_count == 3
+        sentinels = {sentinel for sentinel, _ in notes}
+        assert len(sentinels) == 3
+        for sentinel, html in notes:
+            assert sentinel in html
+            assert "Async content" in html
+
+
+class FakeNoteCache(dict):
+    """In-memory stand-in for diskcache.Cache."""
+
+    def set(self, key, value):
+        self[key] = value
+
+
+class TestNoteCache:
+    """Test reuse of LLM outputs for identical requests."""
+
+    @patch('app.utils.llm_note_generator._get_note_cache')
+    @patch('app.utils.llm_note_generator._get_openai_client')
+    def test_identical_request_is_served_from_cache(self, mock_get_client, mock_get_cache):
+        """Test that a repeated prompt does not call the API again."""
+        mock_get_cache.return_value = FakeNoteCache()
+        mock_message = Mock()
+        mock_message.content = "<p>Cached content</p>"
+        mock_client = mock_get_client.return_value
+        mock_client.chat.completions.create.return_value = Mock(choices=[Mock(message=mock_message)])
+
+        first = llm_note_generator._generate_with_llm("Same prompt", model="gpt-4o-mini")
+        second = llm_note_generator._generate_with_llm("Same prompt", model="gpt-4o-mini")
+        llm_note_generator._generate_with_llm("Other prompt", model="gpt-4o-mini")
+
+        assert first == second == "<p>Cached content</p>"
+        assert mock_client.chat.completions.create.call_count == 2
+
+    @patch('app.utils.llm_note_generator._get_note_cache')
+    @patch('app.utils.llm_note_generator._get_async_openai_client')
+    def test_concurrent_identical_requests_share_one_call(self, mock_get_client, mock_get_cache):
+        """Test that identical requests in flight at the same time make a single API call."""
+        mock_get_cache.return_value = FakeNoteCache()
+        mock_message = Mock()
+        mock_message.content = "<p>Shared content</p>"
+        mock_client = mock_get_client.return_value
+        mock_client.chat.completions.create = AsyncMock(return_value=Mock(choices=[Mock(message=mock_message)]))
+
+        async def generate_all():
+            return await asyncio.gather(*(
+                llm_note_generator._generate_with_llm_async("Same prompt", model="gpt-4o-mini")
+                for _ in range(3)
+            ))
+
+        results = asyncio.run(generate_all())
+
+        assert results == ["<p>Shared content</p>"] * 3
+        assert mock_client.chat.completions.create.await_count == 1
+        assert len(mock_get_cache.return_value) == 1
+
+
+class TestGetConfig:
+    """Test the cached LLM configuration."""
+
+    def test_config_is_read_once_until_cleared(self, monkeypatch):
+        """Test that env changes are only seen after the cache is cleared."""
+        monkeypatch.setenv("OPENROUTER_DEFAULT_MODEL", "model-a")
+        llm_note_generator.get_config.cache_clear()
+        try:
+            assert llm_note_generator.get_config().default_model == "model-a"
+
+            monkeypatch.setenv("OPENROUTER_DEFAULT_MODEL", "model-b")
+            assert llm_note_generator.get_config().default_model == "model-a"
+
+            llm_note_generator.get_config.cache_clear()
+            assert llm_note_generator.get_config().default_model == "model-b"
+        finally:
+            llm_note_generator.get_config.cache_clear()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
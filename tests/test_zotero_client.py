@@ -10,6 +10,17 @@ from unittest.mock import Mock, patch, MagicMock
 from app.utils import zotero_client
 
 
+@pytest.fixture(autouse=True)
+def clear_zotero_caches(monkeypatch):
+    """Each test starts without cached key information or library versions."""
+    monkeypatch.delenv(zotero_client.NOTES_DB_ENV, raising=False)
+    monkeypatch.delenv("RAGPY_HTTP2", raising=False)
+    zotero_client._get_http2_client.cache_clear()
+    zotero_client.clear_caches()
+    yield
+    zotero_client.clear_caches()
+
+
 class TestBuildHeaders:
     """Test header building function."""
 
@@ -18,8 +29,13 @@ class TestBuildHeaders:
         headers = zotero_client._build_headers("test_key")
 
         assert headers["Zotero-API-Key"] == "test_key"
-        assert headers["Zotero-API-Version"] == "3"
-        assert headers["Content-Type"] == "application/json"
+
+    def test_session_default_headers(self):
+        """Test headers shared by all requests are set on the session."""
+        session_headers = zotero_client.get_session().headers
+
+        assert session_headers["Zotero-API-Version"] == "3"
+        assert session_headers["Content-Type"] == "application/json"
 
     def test_additional_headers(self):
         """Test merging additional headers."""
@@ -54,7 +70,7 @@ class TestBuildLibraryPrefix:
 class TestVerifyApiKey:
     """Test API key verification."""
 
-    @patch('app.utils.zotero_client.requests.get')
+    @patch('app.utils.zotero_client._SESSION.get')
     def test_valid_key(self, mock_get):
         """Test successful key verification."""
         mock_response = Mock()
@@ -71,7 +87,7 @@ class TestVerifyApiKey:
         assert result["userID"] == "12345"
         mock_get.assert_called_once()
 
-    @patch('app.utils.zotero_client.requests.get')
+    @patch('app.utils.zotero_client._SESSION.get')
     def test_invalid_key(self, mock_get):
         """Test invalid key raises error."""
         mock_response = Mock()
@@ -88,7 +104,7 @@ class TestVerifyApiKey:
 class TestGetLibraryVersion:
     """Test library version retrieval."""
 
-    @patch('app.utils.zotero_client.requests.get')
+    @patch('app.utils.zotero_client._SESSION.get')
     def test_get_version(self, mock_get):
         """Test retrieving library version."""
         mock_response = Mock()
@@ -100,7 +116,7 @@ class TestGetLibraryVersion:
 
         assert version == "12345"
 
-    @patch('app.utils.zotero_client.requests.get')
+    @patch('app.utils.zotero_client._SESSION.get')
     def test_version_error(self, mock_get):
         """Test error when retrieving version."""
         mock_response = Mock()
@@ -111,11 +127,29 @@ class TestGetLibraryVersion:
         with pytest.raises(zotero_client.ZoteroAPIError):
             zotero_client.get_library_version("users", "123", "test_key")
 
+    @patch('app.utils.zotero_client._SESSION.get')
+    def test_version_is_cached(self, mock_get):
+        """Test a second lookup within the TTL does not hit the API."""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Last-Modified-Version": "12345"}
+        mock_get.return_value = mock_response
+
+        zotero_client.get_library_version("users", "123", "test_key")
+        version = zotero_client.get_library_version("users", "123", "test_key")
+
+        assert version == "12345"
+        assert mock_get.call_count == 1
+
+        zotero_client.invalidate_library_version("users", "123")
+        zotero_client.get_library_version("users", "123", "test_key")
+        assert mock_get.call_count == 2
+
 
 class TestCheckNoteExists:
     """Test note existence checking."""
 
-    @patch('app.utils.zotero_client.requests.get')
+    @patch('app.utils.zotero_client._SESSION.get')
     def test_note_exists(self, mock_get):
         """Test finding existing note with sentinel."""
         mock_response = Mock()
@@ -135,7 +169,7 @@ class TestCheckNoteExists:
 
         assert exists is True
 
-    @patch('app.utils.zotero_client.requests.get')
+    @patch('app.utils.zotero_client._SESSION.get')
     def test_note_not_exists(self, mock_get):
         """Test when note does not exist."""
         mock_response = Mock()
@@ -156,11 +190,100 @@ class TestCheckNoteExists:
         assert exists is False
 
 
+    @patch('app.utils.zotero_client._SESSION.get')
+    def test_repeated_check_revalidates_with_version(self, mock_get):
+        """Test a 304 on a repeated check reuses the previous answer."""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Last-Modified-Version": "42"}
+        mock_response.json.return_value = [
+            {"data": {"note": "<!-- ragpy-note-id:test-uuid --><p>Note content</p>"}}
+        ]
+        mock_not_modified = Mock()
+        mock_not_modified.status_code = 304
+        mock_get.side_effect = [mock_response, mock_not_modified]
+
+        args = ("users", "123", "ITEMKEY", "ragpy-note-id:test-uuid", "test_key")
+        assert zotero_client.check_note_exists(*args) is True
+        assert zotero_client.check_note_exists(*args) is True
+
+        second_headers = mock_get.call_args_list[1].kwargs["headers"]
+        assert second_headers["If-Modified-Since-Version"] == "42"
+        mock_not_modified.json.assert_not_called()
+
+
+class TestCheckNotesExist:
+    """Test concurrent note existence checks."""
+
+    @patch('app.utils.zotero_client.check_note_exists')
+    def test_results_keep_input_order(self, mock_check):
+        """Test answers and errors are returned in input order."""
+        def check(library_type, library_id, item_key, sentinel, api_key):
+            if item_key == "MISSING":
+                raise zotero_client.ZoteroAPIError(404, "Parent item MISSING not found")
+            return item_key == "HASNOTE"
+
+        mock_check.side_effect = check
+        checks = [("HASNOTE", "s1"), ("NONOTE", "s2"), ("MISSING", "s3")]
+
+        results = zotero_client.check_notes_exist("users", "123", checks, "test_key", max_workers=3)
+
+        assert results[0] is True
+        assert results[1] is False
+        assert isinstance(results[2], zotero_client.ZoteroAPIError)
+        assert results[2].status_code == 404
+
+
+class TestCheckTaggedNotesExist:
+    """Test checks for items that already have a tagged note."""
+
+    @patch('app.utils.zotero_client.check_tagged_note_exists')
+    @patch('app.utils.zotero_client._SESSION.get')
+    def test_tagged_notes_are_listed_once(self, mock_get, mock_check):
+        """Test the tagged notes are listed page by page and the items are not checked one by one."""
+        def page(parents, next_url=None):
+            return Mock(
+                status_code=200,
+                headers={"Total-Results": "101"},
+                links={"next": {"url": next_url}} if next_url else {},
+                json=Mock(return_value=[{"data": {"parentItem": parent, "note": "<p>Note</p>"}} for parent in parents]),
+            )
+
+        mock_get.side_effect = [
+            page(["A"], next_url="https://api.zotero.org/users/123/items?start=100"),
+            page(["B"]),
+        ]
+
+        results = zotero_client.check_tagged_notes_exist("users", "123", ["A", "B", "C"], "ragpy", "test_key")
+
+        assert results == [True, True, False]
+        assert mock_get.call_count == 2
+        assert mock_get.call_args_list[0].kwargs["params"]["tag"] == "ragpy"
+        assert mock_get.call_args_list[1].args[0].endswith("start=100")
+        mock_check.assert_not_called()
+
+    @patch('app.utils.zotero_client._SESSION.get')
+    def test_large_listing_falls_back_to_item_checks(self, mock_get):
+        """Test items are checked one by one when listing the tagged notes would take more requests."""
+        listing = Mock(status_code=200, headers={"Total-Results": "5000"}, links={}, json=Mock(return_value=[]))
+        with_note = Mock(status_code=200, text="NOTEKEY1\n")
+        without_note = Mock(status_code=200, text="")
+        mock_get.side_effect = lambda url, **kwargs: (
+            listing if url.endswith("/items") else with_note if "/items/A/" in url else without_note
+        )
+
+        results = zotero_client.check_tagged_notes_exist("users", "123", ["A", "B"], "ragpy", "test_key")
+
+        assert results == [True, False]
+        assert mock_get.call_count == 3
+        assert mock_get.call_args_list[1].kwargs["params"]["tag"] == "ragpy"
+
+
 class TestCreateChildNote:
     """Test child note creation."""
 
     @patch('app.utils.zotero_client.get_library_version')
-    @patch('app.utils.zotero_client.requests.post')
+    @patch('app.utils.zotero_client._SESSION.post')
     def test_successful_creation(self, mock_post, mock_get_version):
         """Test successful note creation."""
         mock_get_version.return_value = "100"
@@ -192,7 +315,7 @@ class TestCreateChildNote:
         assert result["new_version"] == "101"
 
     @patch('app.utils.zotero_client.get_library_version')
-    @patch('app.utils.zotero_client.requests.post')
+    @patch('app.utils.zotero_client._SESSION.post')
     def test_parent_not_found(self, mock_post, mock_get_version):
         """Test error when parent item not found."""
         mock_get_version.return_value = "100"
@@ -214,7 +337,7 @@ class TestCreateChildNote:
         assert exc_info.value.status_code == 404
 
     @patch('app.utils.zotero_client.get_library_version')
-    @patch('app.utils.zotero_client.requests.post')
+    @patch('app.utils.zotero_client._SESSION.post')
     def test_version_conflict_retry(self, mock_post, mock_get_version):
         """Test retry on version conflict (412)."""
         # First call returns old version, second returns new
@@ -224,6 +347,7 @@ class TestCreateChildNote:
         mock_response_412 = Mock()
         mock_response_412.status_code = 412
         mock_response_412.text = "Version conflict"
+        mock_response_412.headers = {}
 
         mock_response_success = Mock()
         mock_response_success.status_code = 201
@@ -248,6 +372,158 @@ class TestCreateChildNote:
         assert result["success"] is True
         assert mock_post.call_count == 2
 
+    @patch('app.utils.zotero_client.get_library_version')
+    @patch('app.utils.zotero_client._SESSION.post')
+    def test_version_conflict_uses_version_of_412(self, mock_post, mock_get_version):
+        """Test the retry after a 412 uses its Last-Modified-Version instead of a new GET."""
+        mock_response_412 = Mock(status_code=412, text="Library has been modified", headers={"Last-Modified-Version": "105"})
+        mock_response_success = Mock(status_code=200, headers={"Last-Modified-Version": "106"})
+        mock_response_success.json.return_value = {"successful": {"0": "NOTEKEY"}, "unchanged": {}, "failed": {}}
+        mock_post.side_effect = [mock_response_412, mock_response_success]
+
+        with patch('app.utils.zotero_client.time.sleep'):
+            result = zotero_client.create_child_note(
+                library_type="users",
+                library_id="123",
+                item_key="ITEM",
+                note_html="<p>Test</p>",
+                api_key="test_key",
+                library_version="100"
+            )
+
+        assert result["success"] is True
+        mock_get_version.assert_not_called()
+        assert mock_post.call_args_list[1].kwargs["headers"]["If-Unmodified-Since-Version"] == "105"
+
+
+class TestWriteToken:
+    """Test write token derivation."""
+
+    def test_token_is_stable_per_item_and_sentinel(self):
+        """Test the same notes get the same token and another sentinel a new one."""
+        note = {"item_key": "ITEM", "note_html": "<p>A</p>", "sentinel": "ragpy-note-id:aaa"}
+
+        token = zotero_client._write_token([note])
+
+        assert token == zotero_client._write_token([dict(note)])
+        assert len(token) == 32
+        assert token != zotero_client._write_token([dict(note, sentinel="ragpy-note-id:bbb")])
+
+
+class TestCreateChildNotesBulk:
+    """Test batched child note creation."""
+
+    @patch('app.utils.zotero_client.get_library_version')
+    @patch('app.utils.zotero_client._SESSION.post')
+    def test_notes_are_posted_in_batches(self, mock_post, mock_get_version):
+        """Test notes are split into requests of MAX_NOTES_PER_REQUEST and results keep input order."""
+        mock_get_version.return_value = "100"
+
+        def respond(url, headers, json, timeout):
+            response = Mock()
+            response.status_code = 200
+            response.headers = {"Last-Modified-Version": "101"}
+            response.json.return_value = {
+                "successful": {str(i): {"key": f"N{item['parentItem']}"} for i, item in enumerate(json) if item["parentItem"] != "P3"},
+                "unchanged": {},
+                "failed": {str(i): {"code": 400, "message": "Bad note"} for i, item in enumerate(json) if item["parentItem"] == "P3"},
+            }
+            return response
+
+        mock_post.side_effect = respond
+        notes = [{"item_key": f"P{i}", "note_html": "<p>Note</p>", "tags": ["ragpy"]} for i in range(51)]
+
+        results = zotero_client.create_child_notes_bulk("users", "123", notes, api_key="test_key")
+
+        assert mock_post.call_count == 2
+        assert len(mock_post.call_args_list[0].kwargs["json"]) == 50
+        assert len(mock_post.call_args_list[1].kwargs["json"]) == 1
+        # The second request reuses the version returned by the first one
+        assert mock_post.call_args_list[1].kwargs["headers"]["If-Unmodified-Since-Version"] == "101"
+        mock_get_version.assert_called_once()
+
+        assert len(results) == 51
+        assert results[0]["note_key"] == "NP0"
+        assert results[50]["note_key"] == "NP50"
+        assert results[3]["success"] is False
+        assert "Bad note" in results[3]["message"]
+
+
+class TestHttp2:
+    """Test the optional HTTP/2 transport."""
+
+    @patch('app.utils.zotero_client._SESSION.get')
+    @patch('app.utils.zotero_client._get_http2_client')
+    def test_requests_go_through_http2_client(self, mock_get_client, mock_session_get):
+        """Test API calls use the HTTP/2 client when it is enabled."""
+        client = mock_get_client.return_value
+        client.request.return_value = Mock(status_code=200, json=Mock(return_value={"userID": 1}))
+
+        assert zotero_client.verify_api_key("test_key") == {"userID": 1}
+
+        client.request.assert_called_once()
+        assert client.request.call_args.args == ("GET", f"{zotero_client.ZOTERO_API_BASE}/keys/current")
+        mock_session_get.assert_not_called()
+
+    def test_http2_is_disabled_by_default(self):
+        """Test the session is used unless RAGPY_HTTP2=1."""
+        assert zotero_client._get_http2_client() is None
+
+
+class TestNotesRecord:
+    """Test the on-disk record of created notes."""
+
+    @pytest.fixture(autouse=True)
+    def notes_db(self, tmp_path, monkeypatch):
+        monkeypatch.setenv(zotero_client.NOTES_DB_ENV, str(tmp_path / "notes.sqlite"))
+        yield
+        zotero_client.close_notes_db()
+
+    @patch('app.utils.zotero_client._SESSION.get')
+    @patch('app.utils.zotero_client._SESSION.post')
+    def test_created_note_is_not_checked_again(self, mock_post, mock_get):
+        """Test an item with a created note is found without a GET, even after reopening the record."""
+        mock_post.return_value = Mock(
+            status_code=200,
+            headers={"Last-Modified-Version": "101"},
+            json=Mock(return_value={"successful": {"0": {"key": "NOTE"}}, "unchanged": {}, "failed": {}}),
+        )
+        notes = [{"item_key": "ITEM", "note_html": "<p>A</p>", "sentinel": "ragpy-note-id:aaa"}]
+
+        zotero_client.create_child_notes_bulk("users", "123", notes, api_key="test_key", library_version="100")
+        zotero_client.close_notes_db()
+
+        assert zotero_client.check_tagged_notes_exist("users", "123", ["ITEM"], "ragpy", "test_key") == [True]
+        mock_get.assert_not_called()
+
+        # Another item, or another library, still asks the API
+        mock_get.return_value = Mock(status_code=200, headers={}, text="")
+        assert zotero_client.check_tagged_notes_exist("users", "123", ["OTHER"], "ragpy", "test_key") == [False]
+        assert zotero_client.check_tagged_notes_exist("groups", "123", ["ITEM"], "ragpy", "test_key") == [False]
+        assert mock_get.call_count == 2
+
+
+class TestBackoff:
+    """Test retry delays."""
+
+    def test_backoff_grows_and_is_capped(self):
+        """Test the jittered delay stays within [base, min(cap, base * 2**attempt)]."""
+        for attempt in range(10):
+            delay = zotero_client._backoff(attempt, base=0.5, cap=30)
+            assert 0.5 <= delay <= min(30, 0.5 * 2 ** attempt)
+
+    def test_retry_after_header_is_honored(self):
+        """Test a 429 Retry-After value is used, within the jitter margin."""
+        response = Mock(headers={"Retry-After": "10"})
+        delay = zotero_client._retry_after_delay(response, 0)
+        assert abs(delay - 10) <= zotero_client.RETRY_AFTER_JITTER
+
+    def test_retry_after_http_date_falls_back_to_backoff(self):
+        """Test a non-numeric Retry-After falls back to the backoff delay."""
+        response = Mock(headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+        delay = zotero_client._retry_after_delay(response, 0)
+        assert delay == zotero_client.BACKOFF_BASE
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
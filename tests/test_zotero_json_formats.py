@@ -93,6 +93,10 @@ def test_format1_direct_array():
         assert len(items) == 2, "Should extract 2 items"
         assert items[0]["itemKey"] == "ABC123XY", "Should extract correct itemKey"
 
+        # Test iter_item_keys_from_json (same items, one at a time)
+        first_item = next(zotero_parser.iter_item_keys_from_json(str(json_path)))
+        assert first_item == items[0], "Should yield the same items"
+
         print("\n✅ Format 1 test PASSED\n")
         return True
 
@@ -179,6 +183,30 @@ def test_empty_array():
         return True
 
 
+def test_library_info_cached_until_file_changes():
+    """Test that an unchanged export is parsed once and a rewritten one again."""
+    print("Testing Library Info Cache")
+    print("-" * 50)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        json_path = Path(tmpdir) / "zotero_export.json"
+        create_test_json_format1(json_path)
+
+        first = zotero_parser.extract_library_info_from_session(tmpdir)
+        hits = zotero_parser._library_info_from_json.cache_info().hits
+        assert zotero_parser.is_zotero_export(tmpdir), "Should detect the export"
+        assert zotero_parser._library_info_from_json.cache_info().hits == hits + 1, "Should reuse the cached result"
+
+        create_test_json_format2(json_path)
+        second = zotero_parser.extract_library_info_from_session(tmpdir)
+
+        assert first["library_id"] == "12345", "Should extract library ID"
+        assert second["library_id"] == "67890", "Should re-read the rewritten export"
+
+        print("\n✅ Library info cache test PASSED\n")
+        return True
+
+
 if __name__ == "__main__":
     print("=" * 70)
     print("ZOTERO JSON FORMAT COMPATIBILITY TESTS")
@@ -211,6 +239,12 @@ if __name__ == "__main__":
         print(f"❌ Empty array test failed: {e}\n")
         results.append(False)
 
+    try:
+        results.append(test_library_info_cached_until_file_changes())
+    except Exception as e:
+        print(f"❌ Library info cache test failed: {e}\n")
+        results.append(False)
+
     print("=" * 70)
     passed = sum(results)
     total = len(results)